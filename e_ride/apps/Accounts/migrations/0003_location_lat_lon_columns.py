@@ -0,0 +1,98 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:02
+
+from django.db import migrations, models
+
+
+def _lat_lon(value):
+    # LocationField decodes to a (lat, lon) tuple, or a dict on text-backed databases
+    if isinstance(value, dict):
+        return float(value["lat"]), float(value["lon"])
+    return float(value[0]), float(value[1])
+
+
+def copy_json_to_columns(apps, schema_editor):
+    for model_name in ("Client", "Driver"):
+        model = apps.get_model("Accounts", model_name)
+        batch = []
+        for obj in model.objects.exclude(location=None).only("pk", "location").iterator(chunk_size=2000):
+            obj.location_lat, obj.location_lon = _lat_lon(obj.location)
+            batch.append(obj)
+            if len(batch) >= 2000:
+                model.objects.bulk_update(batch, ["location_lat", "location_lon"])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ["location_lat", "location_lon"])
+
+
+def copy_columns_to_json(apps, schema_editor):
+    for model_name in ("Client", "Driver"):
+        model = apps.get_model("Accounts", model_name)
+        batch = []
+        queryset = model.objects.exclude(location_lat=None).exclude(location_lon=None)
+        for obj in queryset.only("pk", "location_lat", "location_lon").iterator(chunk_size=2000):
+            obj.location = (obj.location_lat, obj.location_lon)
+            batch.append(obj)
+            if len(batch) >= 2000:
+                model.objects.bulk_update(batch, ["location"])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ["location"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Accounts", "0002_alter_driver_nin"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="client",
+            name="location_lat",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="location latitude"
+            ),
+        ),
+        migrations.AddField(
+            model_name="client",
+            name="location_lon",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="location longitude"
+            ),
+        ),
+        migrations.AddField(
+            model_name="driver",
+            name="location_lat",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="location latitude"
+            ),
+        ),
+        migrations.AddField(
+            model_name="driver",
+            name="location_lon",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="location longitude"
+            ),
+        ),
+        migrations.RunPython(copy_json_to_columns, copy_columns_to_json),
+        migrations.RemoveField(
+            model_name="client",
+            name="location",
+        ),
+        migrations.RemoveField(
+            model_name="driver",
+            name="location",
+        ),
+        migrations.AddIndex(
+            model_name="client",
+            index=models.Index(
+                fields=["location_lat", "location_lon"], name="accounts_client_loc_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="driver",
+            index=models.Index(
+                fields=["location_lat", "location_lon"], name="accounts_driver_loc_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Accounts", "0003_location_lat_lon_columns"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="driver",
+            index=models.Index(
+                fields=["availability_status", "location_lat", "location_lon"],
+                name="accounts_driver_status_loc_idx",
+            ),
+        ),
+    ]
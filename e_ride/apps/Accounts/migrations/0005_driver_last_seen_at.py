@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Accounts", "0004_driver_status_location_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="driver",
+            name="last_seen_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,5 +1,9 @@
 from django.db import models
+from django.conf import settings
 from base.models import BaseUser, BaseProfile
+from base.spatial import GridIndex
+from base.location_buffer import LocationWriteBuffer, DeadBand
+from base.presence import PresenceTracker
 from enum import Enum
 from cloudinary.models import CloudinaryField
 
@@ -35,13 +39,44 @@ class Driver(BaseProfile):
     plate_number = models.CharField(max_length=250)
     availability_status = models.CharField(max_length=25, choices=[(choices.name, choices.value) for choices in AvailabityChoices])
     price_per_km = models.DecimalField(max_digits=10, decimal_places=2, default=120.00)
+    # Last heartbeat, written back in batches by `presence`
+    last_seen_at = models.DateTimeField(null=True, blank=True)
 
+    # In-memory grid of ONLINE driver positions used by find_nearest_instances
+    spatial_index = GridIndex(
+        cell_deg=settings.DRIVER_INDEX_CELL_DEG,
+        refresh_seconds=settings.DRIVER_INDEX_REFRESH_SECONDS,
+        status_field='availability_status',
+        active_status=AvailabityChoices.ONLINE.value,
+        enabled=settings.DRIVER_SPATIAL_INDEX,
+    )
+    # Coalesces GPS pings and writes them in bulk on a short interval
+    location_buffer = LocationWriteBuffer(
+        flush_interval=settings.DRIVER_LOCATION_FLUSH_SECONDS,
+        max_pending=settings.DRIVER_LOCATION_MAX_PENDING,
+        dead_band=DeadBand(settings.LOCATION_DEAD_BAND_METRES, settings.LOCATION_DEAD_BAND_SECONDS),
+    )
+    # Takes ONLINE drivers whose app stopped sending heartbeats offline
+    presence = PresenceTracker(
+        ttl=settings.DRIVER_PRESENCE_TTL_SECONDS,
+        sweep_interval=settings.DRIVER_PRESENCE_SWEEP_SECONDS,
+        status_field='availability_status',
+        active_status=AvailabityChoices.ONLINE.value,
+        offline_status=AvailabityChoices.OFFLINE.value,
+    )
+
+    class Meta(BaseProfile.Meta):
+        indexes = BaseProfile.Meta.indexes + [
+            # Serves within_box() on ONLINE drivers: equality on status, then the lat range
+            models.Index(fields=['availability_status', 'location_lat', 'location_lon'], name='accounts_driver_status_loc_idx'),
+        ]
 
     def price(self, distance):
         return self.price_per_km * distance
 
 class Client(BaseProfile):
-    pass
+    # Skips saving location updates that barely move from the stored one
+    location_dead_band = DeadBand(settings.LOCATION_DEAD_BAND_METRES, settings.LOCATION_DEAD_BAND_SECONDS)
 
     
 class Permissions(models.Model):
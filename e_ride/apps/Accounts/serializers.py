@@ -93,10 +93,11 @@ class DriverCreateSerializer(serializers.ModelSerializer):
 
 class DriverSerializer(serializers.ModelSerializer):
     user = UserSerializer()
+    location = serializers.ReadOnlyField()
     
     class Meta:
         model = Driver
-        fields = "__all__"
+        exclude = ["location_lat", "location_lon"]
 
 class ClientCreateSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
@@ -125,10 +126,16 @@ class ClientCreateSerializer(serializers.ModelSerializer):
     
 class ClientSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
+    location = serializers.ReadOnlyField()
 
     class Meta:
         model = Client
-        fields = "__all__"
+        exclude = ["location_lat", "location_lon"]
+
+class LocationPingSerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lon = serializers.FloatField(min_value=-180, max_value=180)
+    recorded_at = serializers.DateTimeField(required=False)
 
 class LoginSerializer(serializers.Serializer):
     email = serializers.CharField()
@@ -7,6 +7,8 @@ urlpatterns = [
     path('create/driver/', views.DriverRegisterView.as_view(), name="driver register"),
     path('create/client/', views.ClientRegisterView.as_view(), name='client register'),
     path('driver/profile/<uuid:id>', views.DriverProfileView.as_view(), name='driver profile'),
+    path('driver/location/', views.DriverLocationView.as_view(), name='driver location'),
+    path('driver/heartbeat/', views.DriverHeartbeatView.as_view(), name='driver heartbeat'),
     path('client/profile/<uuid:id>', views.ClientProfileView.as_view(), name='client profile'), 
     path('verify/<token>', views.VerifyMailView.as_view(), name='verify')
 ]
\ No newline at end of file
@@ -5,15 +5,21 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 from rest_framework.permissions import IsAuthenticated
 from django.core.signing import SignatureExpired, BadSignature
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
 from .models import User, Driver, Client
 from .serializers import (
     UserCreateSerializer, UserSerializer, LoginSerializer,
     LoginResponseSerializer, DriverCreateSerializer, DriverSerializer,
-    ClientCreateSerializer, ClientSerializer,
+    ClientCreateSerializer, ClientSerializer, LocationPingSerializer,
 )
 from .permissions import IsOwner, IsClient, IsDriver, IsAdmin
 from signals.auth_signals import send_mail
 from base.utils import UrlSign
+from apps.Rides.models import Ride
+from apps.Rides.notify import get_position_broker
+from apps.Rides.surge import surge_pricing
+from apps.Rides.tracks import ride_tracks
 
 encoder = UrlSign()
 
@@ -129,6 +135,101 @@ class DriverProfileView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
     
+class DriverLocationView(APIView):
+    # GPS pings from the driver app, either one {"lat", "lon"} object or a list of them
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        # The driver's STARTED ride, if any, comes back in the same query; its pings make up the ride's track
+        started = Ride.objects.filter(driver=OuterRef('pk'), status='STARTED').order_by('-created_at')
+        row = (
+            Driver.objects.filter(user=request.user)
+            .annotate(ride_id=Subquery(started.values('pk')[:1]), ride_started_at=Subquery(started.values('started_at')[:1]))
+            .values_list('id', 'availability_status', 'ride_id', 'ride_started_at')
+            .first()
+        )
+        if row is None:
+            return Response(
+                {
+                    "status": "failed",
+                    "details": "Driver profile not found"
+                },
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        driver_id, availability_status, ride_id, ride_started_at = row
+        many = isinstance(request.data, list)
+        serializer = LocationPingSerializer(data=request.data, many=many)
+        serializer.is_valid(raise_exception=True)
+        pings = serializer.validated_data if many else [serializer.validated_data]
+
+        # Untimed pings count as taken now; apply in time order so the newest one wins
+        received_at = timezone.now()
+        pings = sorted(pings, key=lambda ping: ping.get('recorded_at', received_at))
+        outcomes = [
+            Driver.location_buffer.add(driver_id, (ping['lat'], ping['lon']), ping.get('recorded_at', received_at))
+            for ping in pings
+        ]
+        # Any ping proves the app is alive, and places an ONLINE driver in the surge supply
+        Driver.presence.heartbeat(driver_id, received_at)
+        surge_pricing.record_driver(driver_id, (pings[-1]['lat'], pings[-1]['lon']), availability_status)
+        written = outcomes.count(Driver.location_buffer.QUEUED)
+        if ride_id is not None and written:
+            ride_tracks.add(ride_id, [
+                (ping['lat'], ping['lon'], ping.get('recorded_at', received_at))
+                for ping, outcome in zip(pings, outcomes)
+                if outcome == Driver.location_buffer.QUEUED
+                and (ride_started_at is None or ping.get('recorded_at', received_at) >= ride_started_at)
+            ])
+        if written:
+            # Live position streams for the driver's ride follow the newest queued ping. Taken from the
+            # request rather than the buffer, which may already have flushed it
+            newest = next(
+                ping for ping, outcome in zip(reversed(pings), reversed(outcomes))
+                if outcome == Driver.location_buffer.QUEUED
+            )
+            get_position_broker().publish(driver_id, (newest['lat'], newest['lon']))
+        return Response(
+            {
+                "status" : "success",
+                "data" : {"received": len(pings), "written": written, "skipped": len(pings) - written}
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
+
+class DriverHeartbeatView(APIView):
+    # Keeps an ONLINE driver searchable between GPS pings; the app sends one well within DRIVER_PRESENCE_TTL_SECONDS
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        driver = (
+            Driver.objects.filter(user=request.user)
+            .values('id', 'availability_status', 'location_lat', 'location_lon')
+            .first()
+        )
+        if driver is None:
+            return Response(
+                {
+                    "status": "failed",
+                    "details": "Driver profile not found"
+                },
+                status=status.HTTP_404_NOT_FOUND
+            )
+        Driver.presence.heartbeat(driver['id'])
+        # A ping still waiting in the write buffer is newer than the stored location
+        location = Driver.location_buffer.pending_location(driver['id'])
+        if location is None and driver['location_lat'] is not None:
+            location = (driver['location_lat'], driver['location_lon'])
+        surge_pricing.record_driver(driver['id'], location, driver['availability_status'])
+        # The app goes back online itself if it was expired while unreachable
+        return Response(
+            {
+                "status" : "success",
+                "data" : {"availability_status": driver['availability_status'], "ttl": Driver.presence.ttl}
+            },
+            status=status.HTTP_200_OK
+        )
+
 class ClientProfileView(APIView):
     # Only allow users to access their own profile or admins to access any profile
     permission_classes = [IsAuthenticated]
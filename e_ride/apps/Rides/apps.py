@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class RidesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.Rides'
+
+    def ready(self):
+        # Connect the driver change receivers that keep ride caches fresh
+        import signals.driver_signals  # noqa: F401
+        # Count ride requests for surge pricing
+        import signals.ride_signals  # noqa: F401
@@ -0,0 +1,183 @@
+import uuid
+from typing import Any, Iterable, Optional
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from apps.Accounts.models import Driver
+from apps.Accounts.serializers import DriverSerializer
+from apps.Rides.eta import speed_grid
+from base.geo import haversine_many
+from base.mixins import LocationMixin
+from base.routing import get_road_graph
+from base.spatial import KM_PER_DEGREE, NearestHeap, cell_center, geocell
+
+
+class NearestDriverCache:
+    """
+    Response cache for the nearest-driver search, keyed on a quantized geocell.
+
+    Each entry holds the serialized drivers near the centre of a cell: every
+    driver within the centre's `limit`-th nearest distance plus the cell's
+    diagonal. By the triangle inequality that includes the `limit` nearest
+    drivers of any point in the cell, so straight-line results match an
+    uncached search from the caller's own location. On a hit, distances are recomputed from the caller's exact
+    location in one vectorized pass and the candidates re-ranked, so only
+    the driver lookup and serialization are shared between callers. Each
+    driver also gets a pickup ETA from the speed grid.
+
+    Entries expire after `ttl` seconds and are invalidated through per-cell
+    version counters whenever a driver they list, or a driver in or next to
+    their cell, is saved. Hit and miss counts live in the same cache so they
+    are shared by every process using a shared backend.
+    """
+
+    prefix = 'nearest'
+
+    def __init__(self, alias: str = 'default', cell_deg: float = 0.005, ttl: float = 15, overfetch: int = 5) -> None:
+        self.alias = alias
+        self.cell_deg = cell_deg
+        self.ttl = ttl
+        self.overfetch = overfetch
+
+    @property
+    def cache(self) -> Any:
+        return caches[self.alias]
+
+    def _version_key(self, cell: tuple[int, int]) -> str:
+        return f'{self.prefix}:ver:{cell[0]}:{cell[1]}'
+
+    def _entry_key(self, cell: tuple[int, int], limit: int, max_distance_km: float, version: int) -> str:
+        return f'{self.prefix}:cell:{cell[0]}:{cell[1]}:{limit}:{max_distance_km}:v{version}'
+
+    def _driver_key(self, driver_id: Any) -> str:
+        return f'{self.prefix}:drv:{driver_id}'
+
+    def _count(self, name: str) -> None:
+        key = f'{self.prefix}:stats:{name}'
+        self.cache.add(key, 0, None)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # Evicted between add and incr
+            self.cache.set(key, 1, None)
+
+    def stats(self) -> dict[str, int]:
+        """Shared hit/miss counters"""
+        values = self.cache.get_many([f'{self.prefix}:stats:hits', f'{self.prefix}:stats:misses'])
+        hits = values.get(f'{self.prefix}:stats:hits', 0)
+        misses = values.get(f'{self.prefix}:stats:misses', 0)
+        return {'hits': hits, 'misses': misses}
+
+    def reset_stats(self) -> None:
+        self.cache.delete_many([f'{self.prefix}:stats:hits', f'{self.prefix}:stats:misses'])
+
+    def nearest(self, location: Any, limit: int = 7, max_distance_km: float = 50) -> list[dict]:
+        """
+        Serialized nearest drivers for `location`, closest first, in the same
+        shape as NearestInstanceSerializer with distances measured from
+        `location` itself.
+        """
+        if not location:
+            return []
+        cell = geocell(location, self.cell_deg)
+        version = self.cache.get(self._version_key(cell), 0)
+        key = self._entry_key(cell, limit, max_distance_km, version)
+
+        entry = self.cache.get(key)
+        if entry is None:
+            self._count('misses')
+            entry = self._compute(cell, limit, max_distance_km)
+            self.cache.set(key, entry, self.ttl)
+            self._remember(cell, [candidate['id'] for candidate in entry])
+        else:
+            self._count('hits')
+        return self._rank(entry, location, limit, max_distance_km)
+
+    def _compute(self, cell: tuple[int, int], limit: int, max_distance_km: float) -> list[dict]:
+        # Distances from the centre understate or overstate a caller's by at most the half diagonal
+        half_diagonal_km = self.cell_deg * KM_PER_DEGREE * 0.75
+        reach = max_distance_km + half_diagonal_km
+        origin = LocationMixin()
+        origin.location = cell_center(cell, self.cell_deg)
+        fetch = limit + self.overfetch
+        found = origin.find_nearest_instances(Driver, limit=fetch, max_distance_km=reach)
+        if len(found) >= limit:
+            # A caller's k-th nearest is within the centre's k-th distance plus the half diagonal, so its
+            # k nearest are within one more half diagonal of the centre (plus rounding of the distances)
+            reach = min(reach, found[limit - 1][1] + 2 * half_diagonal_km + 0.01)
+            while len(found) == fetch and found[-1][1] <= reach:
+                fetch *= 2
+                found = origin.find_nearest_instances(Driver, limit=fetch, max_distance_km=reach)
+        drivers = [driver for driver, distance in found if distance <= reach]
+        return [
+            {'id': str(driver.pk), 'lat': driver.location[0], 'lon': driver.location[1], 'data': data}
+            for driver, data in zip(drivers, DriverSerializer(drivers, many=True).data)
+        ]
+
+    def _rank(self, entry: list[dict], location: Any, limit: int, max_distance_km: float) -> list[dict]:
+        if not entry:
+            return []
+        # Prefer this process's live position (GPS pings move the index before they reach the database)
+        positions = [
+            Driver.spatial_index.position(uuid.UUID(candidate['id'])) or (candidate['lat'], candidate['lon'])
+            for candidate in entry
+        ]
+        distances = haversine_many(location, positions)
+        graph = get_road_graph()
+        if graph is not None:
+            # Rank by driving distance with one reverse search; drivers off the graph keep the straight line
+            driving = graph.distances_to(positions, location, max_km=max_distance_km)
+            distances = np.where(np.isfinite(driving), driving, distances)
+        best = NearestHeap(limit)
+        best.push_many(range(len(entry)), distances, max_distance_km)
+        ranked = best.items()
+        # Pickup ETAs for the winners in one vectorized pass over the speed grid
+        etas = speed_grid.durations_to([positions[i] for i, _ in ranked], location)
+        return [
+            {**entry[i]['data'], 'distance': f'{round(dist, 2)} miles', 'eta_seconds': int(round(eta))}
+            for (i, dist), eta in zip(ranked, etas)
+        ]
+
+    def _remember(self, cell: tuple[int, int], driver_ids: Iterable[str]) -> None:
+        """Record which cells list each driver so a change to the driver can invalidate them"""
+        keys = {self._driver_key(driver_id): driver_id for driver_id in driver_ids}
+        if not keys:
+            return
+        current = self.cache.get_many(list(keys))
+        updates = {}
+        for key in keys:
+            cells = set(current.get(key, ()))
+            cells.add(cell)
+            updates[key] = list(cells)
+        self.cache.set_many(updates, self.ttl)
+
+    def invalidate_cell(self, cell: tuple[int, int]) -> None:
+        key = self._version_key(cell)
+        self.cache.add(key, 0, None)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, 1, None)
+
+    def invalidate_driver(self, driver_id: Any, location: Optional[Any] = None) -> None:
+        """
+        Drop cached entries affected by a change to one driver: every cell
+        whose entry lists the driver, plus the 3x3 block of cells around the
+        driver's current location that it may now belong in.
+        """
+        cells = {tuple(cell) for cell in self.cache.get(self._driver_key(driver_id), ())}
+        if location:
+            row, col = geocell(location, self.cell_deg)
+            cells.update((row + d_row, col + d_col) for d_row in (-1, 0, 1) for d_col in (-1, 0, 1))
+        for cell in cells:
+            self.invalidate_cell(cell)
+        self.cache.delete(self._driver_key(driver_id))
+
+
+nearest_driver_cache = NearestDriverCache(
+    alias=settings.NEAREST_CACHE_ALIAS,
+    cell_deg=settings.NEAREST_CACHE_CELL_DEG,
+    ttl=settings.NEAREST_CACHE_TTL,
+)
@@ -0,0 +1,259 @@
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Hashable, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.Accounts.models import Driver
+from apps.Rides.notify import publish_on_commit
+from base.geo import coord_array, haversine_matrix
+from base.spatial import GridIndex
+
+logger = logging.getLogger(__name__)
+
+# Cost given to pairs beyond the pickup radius so the solver only uses them as a last resort
+UNREACHABLE = 1e9
+
+
+def optimal_assignment(cost: np.ndarray) -> list[tuple[int, int]]:
+    """
+    Minimum total cost assignment of rows to columns (Hungarian algorithm,
+    shortest augmenting path form). Every row is matched when there are at
+    least as many columns as rows, otherwise every column is. Runs in
+    O(n^2 m) with the inner loop vectorized over columns.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.size == 0:
+        return []
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+
+    # 1-based potentials and matching as in the textbook formulation; column 0 is a sentinel
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    match = np.zeros(m + 1, dtype=np.int64)  # match[j] = row assigned to column j
+    way = np.zeros(m + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        match[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = match[j0]
+            free = ~used[1:]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+
+            candidates = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+
+            u[match[used]] += delta
+            v[used] -= delta
+            minv[1:][free] -= delta
+            j0 = j1
+            if match[j0] == 0:
+                break
+        # Flip the augmenting path
+        while j0:
+            j1 = way[j0]
+            match[j0] = match[j1]
+            j0 = j1
+
+    pairs = [(int(match[j]) - 1, j - 1) for j in range(1, m + 1) if match[j]]
+    if transposed:
+        pairs = [(col, row) for row, col in pairs]
+    return sorted(pairs)
+
+
+def greedy_assignment(
+    ride_points: np.ndarray,
+    driver_points: np.ndarray,
+    max_distance_km: float,
+    candidates: int = 10,
+) -> list[tuple[int, int, float]]:
+    """
+    Fast approximate assignment for large batches. Each ride is offered its
+    `candidates` nearest drivers from a grid index; all offered pairs are
+    then taken shortest first, skipping rides and drivers already matched.
+    Rides whose candidates were all taken are retried with a wider list.
+    """
+    index = GridIndex(cell_deg=0.01)
+    index.rebuild((j, (lat, lon), None) for j, (lat, lon) in enumerate(driver_points.tolist()))
+
+    pairs: list[tuple[int, int, float]] = []
+    unmatched = list(range(len(ride_points)))
+    k = candidates
+    while unmatched and len(index):
+        edges = [
+            (dist, i, j)
+            for i in unmatched
+            for j, dist in index.nearest(tuple(ride_points[i]), limit=k, max_distance_km=max_distance_km)
+        ]
+        if not edges:
+            break
+        edges.sort()
+        matched_rides: set[int] = set()
+        for dist, i, j in edges:
+            if i in matched_rides or j not in index:
+                continue
+            pairs.append((i, j, dist))
+            matched_rides.add(i)
+            index.discard(j)
+        if not matched_rides:
+            break
+        unmatched = [i for i in unmatched if i not in matched_rides]
+        k *= 2
+    return sorted(pairs)
+
+
+@dataclass
+class DispatchResult:
+    rides: int = 0
+    drivers: int = 0
+    assigned: int = 0
+    method: str = ''
+    solve_seconds: float = 0.0
+    mean_pickup_km: Optional[float] = None
+    assignments: list[tuple[Hashable, Hashable, float]] = field(default_factory=list)
+
+
+class DispatchEngine:
+    """
+    Matches waiting rides to ONLINE drivers in batches.
+
+    Each tick collects the REQUESTED rides that have no driver yet and the
+    ONLINE drivers that are not already holding an offer, builds the
+    pickup-distance cost matrix and assigns them to minimise total pickup
+    distance. Batches up to `optimal_max` on the smaller side are solved
+    exactly; larger ones use `greedy_assignment`. The chosen drivers are
+    written to the rides, with their price and an 'assigned' RideEvent, in a
+    single transaction.
+    """
+
+    def __init__(self, max_pickup_km: float = 10, optimal_max: int = 500, batch_limit: int = 10000) -> None:
+        self.max_pickup_km = max_pickup_km
+        self.optimal_max = optimal_max
+        self.batch_limit = batch_limit
+
+    def match(
+        self,
+        ride_points: Sequence[Any],
+        driver_points: Sequence[Any],
+    ) -> tuple[list[tuple[int, int, float]], str]:
+        """Assign ride indices to driver indices; returns (ride, driver, km) triples and the method used"""
+        rides = coord_array(ride_points)
+        drivers = coord_array(driver_points)
+        if not len(rides) or not len(drivers):
+            return [], 'none'
+
+        if min(len(rides), len(drivers)) <= self.optimal_max:
+            cost = haversine_matrix(rides, drivers)
+            reachable = cost <= self.max_pickup_km
+            pairs = optimal_assignment(np.where(reachable, cost, UNREACHABLE))
+            return [(i, j, float(cost[i, j])) for i, j in pairs if reachable[i, j]], 'optimal'
+        return greedy_assignment(rides, drivers, self.max_pickup_km), 'greedy'
+
+    def _pending_rides(self) -> list[tuple[Hashable, float, float]]:
+        from apps.Rides.models import Ride
+
+        return list(
+            Ride.objects.filter(status='REQUESTED', driver__isnull=True)
+            .exclude(pickup_location_lat=None)
+            .order_by('created_at')
+            .values_list('pk', 'pickup_location_lat', 'pickup_location_lon')[:self.batch_limit]
+        )
+
+    def _available_drivers(self) -> Any:
+        """ONLINE drivers not named on an open ride"""
+        from apps.Rides.models import Ride
+
+        busy = Ride.objects.filter(status__in=['REQUESTED', 'ACCEPTED', 'STARTED'], driver__isnull=False).values('driver_id')
+        return Driver.objects.filter(availability_status='ONLINE').exclude(pk__in=busy)
+
+    def _free_drivers(self) -> list[tuple[Hashable, float, float]]:
+        rows = (
+            self._available_drivers()
+            .exclude(location_lat=None)
+            .values_list('pk', 'location_lat', 'location_lon')
+        )
+        # Prefer positions from GPS pings this process has seen but not yet written
+        result = []
+        for pk, lat, lon in rows:
+            live = Driver.spatial_index.position(pk)
+            result.append((pk, *(live or (lat, lon))))
+        return result
+
+    def tick(self) -> DispatchResult:
+        """Run one dispatch round against the database"""
+        from apps.Rides.models import Ride, RideEvent
+
+        rides = self._pending_rides()
+        drivers = self._free_drivers()
+        result = DispatchResult(rides=len(rides), drivers=len(drivers))
+        if not rides or not drivers:
+            return result
+
+        started = time.perf_counter()
+        pairs, result.method = self.match([r[1:] for r in rides], [d[1:] for d in drivers])
+        result.solve_seconds = time.perf_counter() - started
+        if not pairs:
+            return result
+
+        with transaction.atomic():
+            ride_ids = [rides[i][0] for i, _, _ in pairs]
+            # Lock the rides and drop any that were cancelled or claimed since they were read
+            locked = Ride.objects.select_for_update().filter(
+                pk__in=ride_ids, status='REQUESTED', driver__isnull=True
+            ).in_bulk()
+            # Likewise the drivers: any that went offline, were deleted or were named on a ride meanwhile are left out
+            driver_objs = (
+                self._available_drivers().select_for_update()
+                .filter(pk__in=[drivers[j][0] for _, j, _ in pairs])
+                .in_bulk()
+            )
+
+            # bulk_update skips pre_save, so auto_now fields are not set for us
+            now = timezone.now()
+            updated = []
+            for i, j, dist in pairs:
+                ride = locked.get(rides[i][0])
+                driver = driver_objs.get(drivers[j][0])
+                if ride is None or driver is None:
+                    continue
+                ride.driver = driver
+                ride.calculate_price()
+                ride.updated_at = now
+                updated.append(ride)
+                result.assignments.append((ride.pk, ride.driver_id, dist))
+            Ride.objects.bulk_update(updated, ['driver', 'price', 'surge_multiplier', 'updated_at'])
+            RideEvent.objects.bulk_create(
+                RideEvent(ride=ride, kind='assigned', status=ride.status, driver_id=ride.driver_id, created_at=now)
+                for ride in updated
+            )
+            # bulk_create skips post_save, so wake long-poll waiters here
+            publish_on_commit(ride.pk for ride in updated)
+
+        result.assigned = len(result.assignments)
+        if result.assignments:
+            result.mean_pickup_km = sum(a[2] for a in result.assignments) / result.assigned
+        logger.info(
+            'Dispatched %s of %s rides to %s drivers (%s, %.3fs)',
+            result.assigned, result.rides, result.drivers, result.method, result.solve_seconds,
+        )
+        return result
+
+
+dispatch_engine = DispatchEngine(
+    max_pickup_km=settings.DISPATCH_MAX_PICKUP_KM,
+    optimal_max=settings.DISPATCH_OPTIMAL_MAX,
+)
@@ -0,0 +1,230 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from base.geo import coord_array, haversine, haversine_many, lat_lon
+from base.spatial import geocell
+
+HOURS_PER_WEEK = 168
+
+# Samples outside this range (km/h of straight-line progress) are GPS or bookkeeping noise
+MIN_SAMPLE_KMH = 1.0
+MAX_SAMPLE_KMH = 150.0
+
+
+def hour_of_week(at: Optional[datetime] = None) -> int:
+    """0 for Monday 00:00-00:59 local time up to 167 for Sunday 23:00-23:59"""
+    at = timezone.localtime(at or timezone.now())
+    return at.weekday() * 24 + at.hour
+
+
+class SpeedGrid:
+    """
+    Average travel speeds per geocell and hour of the week, learned from
+    completed rides.
+
+    Speeds are measured as straight-line km per hour between pickup and
+    dropoff, so the road network's detours are already baked in and an
+    estimate is just haversine distance over the looked-up speed.
+
+    The SpeedCell table holds running totals and is extended incrementally
+    by `ingest()`, which only reads rides completed more than `lag_seconds`
+    ago so that every ride stamped before its cutoff has committed. Each process keeps a dense copy: a float32 matrix with
+    one row per cell and 168 hour-of-week columns. A lookup is then a dict
+    hit plus an array index. Slots with fewer than `min_samples` fall back
+    to the cell's all-week average, then the city-wide average for that
+    hour, then `default_kmh`.
+    """
+
+    def __init__(
+        self,
+        cell_deg: float = 0.02,
+        default_kmh: float = 25.0,
+        min_samples: int = 3,
+        refresh_seconds: float = 300.0,
+        lag_seconds: float = 120.0,
+    ) -> None:
+        self.cell_deg = cell_deg
+        self.default_kmh = default_kmh
+        self.min_samples = min_samples
+        self.refresh_seconds = refresh_seconds
+        self.lag_seconds = lag_seconds
+        self._lock = threading.Lock()
+        self._rows: dict[tuple[int, int], int] = {}
+        self._speeds = np.empty((0, HOURS_PER_WEEK), dtype=np.float32)
+        self._hour_speeds = np.full(HOURS_PER_WEEK, default_kmh, dtype=np.float32)
+        self._loaded_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def load(self, rows: Optional[Sequence[tuple[int, int, int, float, float, int]]] = None) -> None:
+        """
+        Build the lookup table from (cell_row, cell_col, hour, total_km,
+        total_hours, samples) totals, read from SpeedCell when not given.
+        """
+        from apps.Rides.models import SpeedCell
+
+        if rows is None:
+            rows = list(SpeedCell.objects.values_list(
+                'cell_row', 'cell_col', 'hour_of_week', 'total_km', 'total_hours', 'samples'
+            ))
+        cells = {(row[0], row[1]) for row in rows}
+        index = {cell: i for i, cell in enumerate(sorted(cells))}
+        km = np.zeros((len(index), HOURS_PER_WEEK))
+        hours = np.zeros((len(index), HOURS_PER_WEEK))
+        samples = np.zeros((len(index), HOURS_PER_WEEK), dtype=np.int64)
+        for cell_row, cell_col, how, total_km, total_hours, count in rows:
+            i = index[(cell_row, cell_col)]
+            km[i, how], hours[i, how], samples[i, how] = total_km, total_hours, count
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Fallbacks first: whole week per cell, then each hour across the city
+            cell_kmh = km.sum(axis=1) / hours.sum(axis=1)
+            enough_cell = samples.sum(axis=1) >= self.min_samples
+            cell_kmh = np.where(enough_cell, cell_kmh, np.nan)
+
+            hour_kmh = km.sum(axis=0) / hours.sum(axis=0)
+            hour_kmh = np.where(samples.sum(axis=0) >= self.min_samples, hour_kmh, self.default_kmh)
+
+            speeds = np.where(samples >= self.min_samples, km / hours, np.nan)
+        speeds = np.where(np.isnan(speeds), cell_kmh[:, None], speeds)
+        speeds = np.where(np.isnan(speeds), hour_kmh[None, :], speeds)
+
+        with self._lock:
+            self._rows = index
+            self._speeds = speeds.astype(np.float32)
+            self._hour_speeds = hour_kmh.astype(np.float32)
+            self._loaded_at = time.monotonic()
+
+    def clear(self) -> None:
+        """Forget the loaded table so the next lookup reloads it"""
+        with self._lock:
+            self._rows = {}
+            self._speeds = np.empty((0, HOURS_PER_WEEK), dtype=np.float32)
+            self._hour_speeds = np.full(HOURS_PER_WEEK, self.default_kmh, dtype=np.float32)
+            self._loaded_at = None
+
+    def ensure_fresh(self) -> None:
+        """Reload from the database on first use and after `refresh_seconds`"""
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.refresh_seconds:
+            self.load()
+
+    def speed(self, location: Any, at: Optional[datetime] = None) -> float:
+        """Expected km/h for a trip starting at `location` at time `at`"""
+        self.ensure_fresh()
+        how = hour_of_week(at)
+        row = self._rows.get(geocell(location, self.cell_deg))
+        if row is None:
+            return float(self._hour_speeds[how])
+        return float(self._speeds[row, how])
+
+    def duration(self, origin: Any, destination: Any, at: Optional[datetime] = None) -> float:
+        """Estimated seconds to travel from `origin` to `destination`"""
+        lat1, lon1 = lat_lon(origin)
+        lat2, lon2 = lat_lon(destination)
+        return haversine(lat1, lon1, lat2, lon2) / self.speed(origin, at) * 3600
+
+    def durations_to(self, origins: Any, destination: Any, at: Optional[datetime] = None) -> np.ndarray:
+        """Estimated seconds from each of `origins` (e.g. drivers) to one `destination` (e.g. a pickup)"""
+        self.ensure_fresh()
+        points = coord_array(origins)
+        if not len(points):
+            return np.empty(0)
+        how = hour_of_week(at)
+        rows = np.array([self._rows.get(geocell(point, self.cell_deg), -1) for point in points.tolist()])
+        known = rows >= 0
+        speeds = np.full(len(points), self._hour_speeds[how], dtype=np.float64)
+        speeds[known] = self._speeds[rows[known], how]
+        return haversine_many(destination, points) / speeds * 3600
+
+    def ingest(self, batch_size: int = 5000, now: Optional[datetime] = None) -> int:
+        """
+        Fold rides completed since the last ingest into the SpeedCell totals.
+        Each ride contributes one sample to its pickup cell at the hour it
+        started. Returns the number of rides used.
+
+        Rides are read up to a cutoff `lag_seconds` before `now`, and the
+        cutoff, not the newest ride, becomes the watermark. A ride stamped
+        before the cutoff but committed after the read, or one sharing the
+        newest ride's timestamp, is therefore still ahead of the watermark
+        next time, as long as no transaction takes longer than the lag.
+        """
+        from apps.Rides.models import Ride, SpeedCell
+
+        cutoff = (now or timezone.now()) - timedelta(seconds=self.lag_seconds)
+        watermark = SpeedCell.objects.aggregate(latest=Max('last_sample_at'))['latest']
+        rides = Ride.objects.filter(
+            status='COMPLETED', started_at__isnull=False, completed_at__isnull=False, completed_at__lte=cutoff,
+        )
+        if watermark is not None:
+            rides = rides.filter(completed_at__gt=watermark)
+        rows = rides.exclude(pickup_location_lat=None).exclude(dropoff_location_lat=None).order_by('completed_at').values_list(
+            'pickup_location_lat', 'pickup_location_lon', 'dropoff_location_lat', 'dropoff_location_lon',
+            'started_at', 'completed_at',
+        )
+
+        totals: dict[tuple[int, int, int], list] = defaultdict(lambda: [0.0, 0.0, 0])
+        used = 0
+        for lat, lon, end_lat, end_lon, started_at, completed_at in rows.iterator(chunk_size=batch_size):
+            hours = (completed_at - started_at).total_seconds() / 3600
+            if hours <= 0:
+                continue
+            # Straight-line, not the stored (possibly road) distance, to match how estimates are made
+            km = haversine(lat, lon, end_lat, end_lon)
+            if not MIN_SAMPLE_KMH <= km / hours <= MAX_SAMPLE_KMH:
+                continue
+            entry = totals[(*geocell((lat, lon), self.cell_deg), hour_of_week(started_at))]
+            entry[0] += km
+            entry[1] += hours
+            entry[2] += 1
+            used += 1
+        if not totals:
+            return 0
+
+        with transaction.atomic():
+            existing = {
+                (cell.cell_row, cell.cell_col, cell.hour_of_week): cell
+                for cell in SpeedCell.objects.select_for_update().filter(
+                    cell_row__in={key[0] for key in totals},
+                    cell_col__in={key[1] for key in totals},
+                )
+            }
+            updated, created = [], []
+            for (cell_row, cell_col, how), (km, hours, samples) in totals.items():
+                cell = existing.get((cell_row, cell_col, how))
+                if cell is None:
+                    created.append(SpeedCell(
+                        cell_row=cell_row, cell_col=cell_col, hour_of_week=how,
+                        total_km=km, total_hours=hours, samples=samples, last_sample_at=cutoff,
+                    ))
+                    continue
+                cell.total_km += km
+                cell.total_hours += hours
+                cell.samples += samples
+                cell.last_sample_at = max(cell.last_sample_at, cutoff)
+                updated.append(cell)
+            SpeedCell.objects.bulk_create(created, batch_size=batch_size)
+            SpeedCell.objects.bulk_update(
+                updated, ['total_km', 'total_hours', 'samples', 'last_sample_at'], batch_size=batch_size
+            )
+        self.clear()
+        return used
+
+
+speed_grid = SpeedGrid(
+    cell_deg=settings.ETA_CELL_DEG,
+    default_kmh=settings.ETA_DEFAULT_SPEED_KMH,
+    min_samples=settings.ETA_MIN_SAMPLES,
+    refresh_seconds=settings.ETA_REFRESH_SECONDS,
+    lag_seconds=settings.ETA_INGEST_LAG_SECONDS,
+)
@@ -0,0 +1,100 @@
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from django.db import transaction
+
+from apps.Rides.models import RideEvent, RideEventCursor
+
+
+def read_events(after: int = 0, limit: int = 500, ride_id: Optional[Any] = None) -> list[RideEvent]:
+    """Up to `limit` events with a sequence above `after`, oldest first, optionally for one ride"""
+    events = RideEvent.objects.filter(sequence__gt=after)
+    if ride_id is not None:
+        events = events.filter(ride_id=ride_id)
+    return list(events.order_by('sequence')[:limit])
+
+
+def latest_sequence() -> int:
+    """Sequence of the newest event, 0 for an empty log"""
+    return RideEvent.objects.order_by('-sequence').values_list('sequence', flat=True).first() or 0
+
+
+class EventConsumer:
+    """
+    Named, resumable reader over the ride event log.
+
+    `poll()` returns the next batch after the consumer's committed position
+    (an index range scan on the primary key) and `commit()` stores how far
+    it got in RideEventCursor, so a restarted consumer carries on where it
+    left off. Delivery is at least once: a batch handled but not yet
+    committed is handed out again.
+
+    Sequence values are allocated when a row is inserted, not when its
+    transaction commits, so a later event can become visible before an
+    earlier one. A batch therefore stops at the first hole in the sequence
+    until the hole is `gap_timeout` seconds old, after which it is taken to
+    be a rolled back insert and skipped.
+    """
+
+    def __init__(self, name: str, batch_size: int = 500, gap_timeout: float = 5.0) -> None:
+        self.name = name
+        self.batch_size = batch_size
+        self.gap_timeout = gap_timeout
+        self._position: Optional[int] = None
+        self._gaps: dict[int, float] = {}
+
+    @property
+    def position(self) -> int:
+        if self._position is None:
+            cursor, _ = RideEventCursor.objects.get_or_create(name=self.name)
+            self._position = cursor.position
+        return self._position
+
+    def _gap_expired(self, sequence: int) -> bool:
+        first_seen = self._gaps.setdefault(sequence, time.monotonic())
+        return time.monotonic() - first_seen >= self.gap_timeout
+
+    def poll(self) -> list[RideEvent]:
+        """The next batch of events after the committed position"""
+        position = self.position
+        batch = []
+        expected = position + 1
+        for event in read_events(position, self.batch_size):
+            if event.sequence != expected and not self._gap_expired(expected):
+                break
+            batch.append(event)
+            expected = event.sequence + 1
+        return batch
+
+    def commit(self, sequence: int) -> None:
+        """Record that every event up to and including `sequence` has been handled"""
+        RideEventCursor.objects.update_or_create(name=self.name, defaults={'position': sequence})
+        self._position = sequence
+        self._gaps = {gap: seen for gap, seen in self._gaps.items() if gap > sequence}
+
+    def reset(self, sequence: int = 0) -> None:
+        """Move the consumer to `sequence`, e.g. 0 to replay the whole log"""
+        self.commit(sequence)
+
+    def run(
+        self,
+        handler: Callable[[list[RideEvent]], None],
+        idle_seconds: float = 1.0,
+        stop: Optional[threading.Event] = None,
+    ) -> None:
+        """
+        Hand each batch to `handler` and commit it once the handler returns,
+        sleeping `idle_seconds` whenever the log is drained. Commits happen in
+        the handler's transaction, so database side effects and the cursor
+        move together.
+        """
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            batch = self.poll()
+            if not batch:
+                stop.wait(idle_seconds)
+                continue
+            with transaction.atomic():
+                handler(batch)
+                self.commit(batch[-1].sequence)
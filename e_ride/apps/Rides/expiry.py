@@ -0,0 +1,109 @@
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.Rides.models import Ride, RideEvent
+from apps.Rides.notify import publish_on_commit
+from base.worker import PeriodicWorker
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ExpiryResult:
+    expired: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+
+class RideExpirySweeper:
+    """
+    Expires ride requests nobody accepted within `timeout_seconds`.
+
+    Each batch locks up to `batch_size` of the oldest stale REQUESTED rides
+    (a range scan on the (status, created_at) index, skipping rows that
+    dispatch or an accept holds), sets them EXPIRED with one UPDATE that
+    re-checks the status, and appends an 'expired' RideEvent for each, all
+    in one short transaction. Batches repeat until nothing stale is left.
+    Scheduled rides released to matching are stale once `timeout_seconds`
+    have passed since their pickup time.
+
+    Run it with `manage.py expire_rides`, or in-process with
+    RIDE_EXPIRY_IN_PROCESS, where a background thread is started on the
+    first ride request and sweeps every `interval` seconds.
+    """
+
+    def __init__(
+        self,
+        timeout_seconds: float = 300,
+        batch_size: int = 500,
+        interval: float = 30,
+        background: bool = False,
+    ) -> None:
+        self.timeout_seconds = timeout_seconds
+        self.batch_size = batch_size
+        self.interval = interval
+        self.background = background
+        self._worker = PeriodicWorker(self.sweep, interval, name='ride-expiry')
+
+    def _expire_batch(self, cutoff: datetime, now: datetime) -> int:
+        with transaction.atomic():
+            ids = list(
+                Ride.objects.select_for_update(skip_locked=True)
+                .filter(status='REQUESTED', created_at__lt=cutoff)
+                # Released bookings were created long ago; they wait from their pickup time instead
+                .filter(Q(scheduled_for=None) | Q(scheduled_for__lt=cutoff))
+                .order_by('created_at')
+                .values_list('pk', flat=True)[:self.batch_size]
+            )
+            if not ids:
+                return 0
+            Ride.objects.filter(pk__in=ids, status='REQUESTED').update(status='EXPIRED', updated_at=now)
+            # Locked above, so every selected row was updated
+            RideEvent.objects.bulk_create(
+                RideEvent(ride_id=pk, kind='expired', status='EXPIRED', created_at=now) for pk in ids
+            )
+            publish_on_commit(ids)
+        return len(ids)
+
+    def sweep(self, now: Optional[datetime] = None) -> ExpiryResult:
+        """Expire every stale request in bounded batches"""
+        now = now or timezone.now()
+        cutoff = now - timedelta(seconds=self.timeout_seconds)
+        result = ExpiryResult()
+        started = time.perf_counter()
+        while True:
+            expired = self._expire_batch(cutoff, now)
+            if not expired:
+                break
+            result.expired += expired
+            result.batches += 1
+            if expired < self.batch_size:
+                break
+        result.seconds = time.perf_counter() - started
+        if result.expired:
+            logger.info('Expired %s ride requests in %s batches (%.3fs)', result.expired, result.batches, result.seconds)
+        return result
+
+    def ensure_running(self) -> None:
+        """Start the in-process sweeper thread if enabled and not already running"""
+        if self.background:
+            self._worker.ensure_running()
+
+    def stop(self) -> None:
+        self._worker.stop()
+
+
+ride_expiry = RideExpirySweeper(
+    timeout_seconds=settings.RIDE_REQUEST_TIMEOUT_SECONDS,
+    batch_size=settings.RIDE_EXPIRY_BATCH_SIZE,
+    interval=settings.RIDE_EXPIRY_INTERVAL_SECONDS,
+    background=settings.RIDE_EXPIRY_IN_PROCESS,
+)
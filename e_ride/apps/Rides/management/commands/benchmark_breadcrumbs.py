@@ -0,0 +1,82 @@
+import json
+import math
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from base import breadcrumbs
+
+# Postgres heap tuple header plus its line pointer
+ROW_OVERHEAD = 28
+# bigint id, uuid ride id and a timestamp, as one row per point would store them
+POINT_ROW_COLUMNS = 8 + 16 + 8
+# bigint id, uuid ride id, point count, first and last timestamps and the bytea length word
+CHUNK_ROW_COLUMNS = 8 + 16 + 4 + 8 + 8 + 4
+
+
+def synthetic_trip(rng: random.Random, minutes: float, interval: float) -> list[tuple[float, float, float]]:
+    """A drive around Lagos: ~30 km/h with turns, GPS noise of a few metres and jittery ping times"""
+    lat, lon, at = 6.52 + rng.uniform(-0.1, 0.1), 3.38 + rng.uniform(-0.1, 0.1), 1.76e9
+    heading = rng.uniform(0, 2 * math.pi)
+    points = []
+    for _ in range(int(minutes * 60 / interval)):
+        heading += rng.gauss(0, 0.15)
+        step_deg = rng.uniform(0, 16) * interval / 111_320
+        lat += step_deg * math.cos(heading)
+        lon += step_deg * math.sin(heading)
+        at += interval * rng.uniform(0.9, 1.1)
+        # Phones report about six decimal places
+        points.append((round(lat + rng.gauss(0, 3e-5), 6), round(lon + rng.gauss(0, 3e-5), 6), round(at, 3)))
+    return points
+
+
+class Command(BaseCommand):
+    help = 'Compare the size and speed of packed breadcrumb chunks against one JSON location row per GPS point'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trips', type=int, default=20)
+        parser.add_argument('--minutes', type=float, default=120, help='Length of each trip')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds between GPS pings')
+        parser.add_argument('--chunk-points', type=int, default=64)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        size = options['chunk_points']
+        trips = [synthetic_trip(rng, options['minutes'], options['interval']) for _ in range(options['trips'])]
+        total = sum(len(trip) for trip in trips)
+
+        json_payload = json_rows = 0
+        for trip in trips:
+            for lat, lon, _ in trip:
+                # What the JSON LocationField stored for one point
+                point = len(json.dumps({'lat': lat, 'lon': lon}))
+                json_payload += point + 8
+                json_rows += ROW_OVERHEAD + POINT_ROW_COLUMNS + point + 1
+
+        started = time.perf_counter()
+        chunks = [breadcrumbs.encode(trip[i:i + size]) for trip in trips for i in range(0, len(trip), size)]
+        encode_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        decoded = sum(1 for _ in breadcrumbs.iter_points(chunks))
+        decode_seconds = time.perf_counter() - started
+        assert decoded == total
+
+        packed_payload = sum(len(chunk) for chunk in chunks)
+        packed_rows = packed_payload + len(chunks) * (ROW_OVERHEAD + CHUNK_ROW_COLUMNS)
+
+        self.stdout.write(f'{total} points in {len(chunks)} chunks of up to {size}')
+        self.stdout.write(f'{"storage":<22} {"bytes":>12} {"per point":>10}')
+        for name, nbytes in [
+            ('json payload', json_payload), ('json rows', json_rows),
+            ('packed payload', packed_payload), ('packed rows', packed_rows),
+        ]:
+            self.stdout.write(f'{name:<22} {nbytes:>12} {nbytes / total:>10.2f}')
+        self.stdout.write(
+            f'packed rows are {json_rows / packed_rows:.1f}x smaller than json rows '
+            f'({json_payload / packed_payload:.1f}x on payload alone)'
+        )
+        self.stdout.write(
+            f'encode {encode_seconds * 1e6 / total:.2f} us/point, decode {decode_seconds * 1e6 / total:.2f} us/point'
+        )
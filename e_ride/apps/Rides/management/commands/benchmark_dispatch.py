@@ -0,0 +1,58 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from apps.Rides.dispatch import DispatchEngine
+from base.geo import coord_array, haversine_many
+
+
+def first_come_nearest(rides: np.ndarray, drivers: np.ndarray, max_distance_km: float) -> list[float]:
+    """The old behaviour: each ride, in arrival order, takes the closest driver still free"""
+    taken = np.zeros(len(drivers), dtype=bool)
+    distances = []
+    for ride in rides:
+        row = np.where(taken, np.inf, haversine_many(ride, drivers))
+        j = int(np.argmin(row))
+        if row[j] <= max_distance_km:
+            taken[j] = True
+            distances.append(float(row[j]))
+    return distances
+
+
+class Command(BaseCommand):
+    help = 'Compare pickup distance and solve time of first-come, optimal and approximate dispatch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+        parser.add_argument('--drivers-per-ride', type=float, default=1.2)
+        parser.add_argument('--radius-deg', type=float, default=0.15, help='Spread of the synthetic city around Lagos')
+        parser.add_argument('--optimal-max', type=int, default=2000, help='Largest batch to solve exactly')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        spread = options['radius_deg']
+        optimal = DispatchEngine(max_pickup_km=50, optimal_max=options['optimal_max'])
+        approximate = DispatchEngine(max_pickup_km=50, optimal_max=0)
+
+        def points(n):
+            return coord_array([(6.52 + rng.uniform(-spread, spread), 3.38 + rng.uniform(-spread, spread)) for _ in range(n)])
+
+        self.stdout.write(f'{"rides":>7} {"method":<12} {"assigned":>8} {"mean km":>8} {"seconds":>8}')
+        for size in options['sizes']:
+            rides = points(size)
+            drivers = points(int(size * options['drivers_per_ride']))
+
+            runs = [('first-come', lambda: first_come_nearest(rides, drivers, optimal.max_pickup_km))]
+            if size <= options['optimal_max']:
+                runs.append(('optimal', lambda: [d for _, _, d in optimal.match(rides, drivers)[0]]))
+            runs.append(('approximate', lambda: [d for _, _, d in approximate.match(rides, drivers)[0]]))
+
+            for name, run in runs:
+                started = time.perf_counter()
+                distances = run()
+                elapsed = time.perf_counter() - started
+                mean = sum(distances) / len(distances) if distances else 0.0
+                self.stdout.write(f'{size:>7} {name:<12} {len(distances):>8} {mean:>8.3f} {elapsed:>8.3f}')
@@ -0,0 +1,49 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from base.geo import haversine
+from base.routing import RoadGraph, build_graph
+
+
+class Command(BaseCommand):
+    help = 'Preprocess a road network into the memory-mapped graph used for driving distances (ROAD_GRAPH_PATH)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('nodes', help='CSV with id,lat,lon columns')
+        parser.add_argument('edges', help='CSV with source,target columns and optional length_m and oneway columns')
+        parser.add_argument('output', help='Directory to write the graph to')
+        parser.add_argument('--landmarks', type=int, default=16, help='Landmarks for the ALT heuristic')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        ids = {}
+        coords = []
+        try:
+            with open(options['nodes'], newline='') as f:
+                for row in csv.DictReader(f):
+                    ids[row['id']] = len(coords)
+                    coords.append((float(row['lat']), float(row['lon'])))
+
+            edges = []
+            with open(options['edges'], newline='') as f:
+                for row in csv.DictReader(f):
+                    source, target = ids[row['source']], ids[row['target']]
+                    length = row.get('length_m')
+                    if length:
+                        length = float(length)
+                    else:
+                        length = haversine(*coords[source], *coords[target]) * 1000
+                    edges.append((source, target, length))
+                    if row.get('oneway', '').strip().lower() not in ('1', 'true', 'yes'):
+                        edges.append((target, source, length))
+        except (OSError, KeyError, ValueError) as e:
+            raise CommandError(f'Could not read road network: {e!r}')
+
+        build_graph(coords, edges, options['output'], landmarks=options['landmarks'])
+        graph = RoadGraph(options['output'])
+        self.stdout.write(
+            f'Wrote {len(graph)} nodes, {graph.meta["edges"]} edges and {graph.meta["landmarks"]} landmarks '
+            f'to {options["output"]} in {time.perf_counter() - started:.1f}s'
+        )
@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.Rides.dispatch import dispatch_engine
+from apps.Rides.scheduling import ride_scheduler
+
+
+class Command(BaseCommand):
+    help = 'Release scheduled rides as they come due and assign drivers to waiting requests every dispatch window'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run a single dispatch tick and exit')
+        parser.add_argument(
+            '--window', type=float, default=settings.DISPATCH_WINDOW_SECONDS,
+            help='Seconds to collect ride requests between ticks',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            scheduled = ride_scheduler.tick()
+            if scheduled.released:
+                self.stdout.write(f'{scheduled.released} scheduled rides released, {scheduled.waiting} waiting')
+            result = dispatch_engine.tick()
+            if result.rides:
+                self.stdout.write(
+                    f'{result.assigned}/{result.rides} rides assigned from {result.drivers} drivers '
+                    f'({result.method}, {result.solve_seconds * 1000:.1f} ms)'
+                )
+            if options['once']:
+                return
+            close_old_connections()
+            time.sleep(max(0.0, options['window'] - (time.monotonic() - started)))
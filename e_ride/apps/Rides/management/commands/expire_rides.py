@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.Rides.expiry import RideExpirySweeper
+
+
+class Command(BaseCommand):
+    help = 'Expire ride requests that no driver accepted in time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run a single sweep and exit')
+        parser.add_argument(
+            '--interval', type=float, default=settings.RIDE_EXPIRY_INTERVAL_SECONDS,
+            help='Seconds between sweeps',
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=settings.RIDE_REQUEST_TIMEOUT_SECONDS,
+            help='Seconds a request may wait before it expires',
+        )
+
+    def handle(self, *args, **options):
+        sweeper = RideExpirySweeper(timeout_seconds=options['timeout'], batch_size=settings.RIDE_EXPIRY_BATCH_SIZE)
+        while True:
+            started = time.monotonic()
+            result = sweeper.sweep()
+            if result.expired or options['once']:
+                self.stdout.write(
+                    f'{result.expired} rides expired in {result.batches} batches ({result.seconds * 1000:.1f} ms)'
+                )
+            if options['once']:
+                return
+            close_old_connections()
+            time.sleep(max(0.0, options['interval'] - (time.monotonic() - started)))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from apps.Rides.eta import speed_grid
+
+
+class Command(BaseCommand):
+    help = 'Fold rides completed since the last run into the ETA speed grid'
+
+    def handle(self, *args, **options):
+        used = speed_grid.ingest()
+        speed_grid.load()
+        self.stdout.write(f'Added {used} completed rides; speed grid covers {len(speed_grid)} cells')
@@ -0,0 +1,101 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:02
+
+from django.db import migrations, models
+
+LOCATION_FIELDS = ("pickup_location", "dropoff_location")
+
+
+def _lat_lon(value):
+    # LocationField decodes to a (lat, lon) tuple, or a dict on text-backed databases
+    if isinstance(value, dict):
+        return float(value["lat"]), float(value["lon"])
+    return float(value[0]), float(value[1])
+
+
+def copy_json_to_columns(apps, schema_editor):
+    Ride = apps.get_model("Rides", "Ride")
+    columns = [f"{name}_{axis}" for name in LOCATION_FIELDS for axis in ("lat", "lon")]
+    batch = []
+    for ride in Ride.objects.only("pk", *LOCATION_FIELDS).iterator(chunk_size=2000):
+        for name in LOCATION_FIELDS:
+            value = getattr(ride, name)
+            if value:
+                lat, lon = _lat_lon(value)
+                setattr(ride, f"{name}_lat", lat)
+                setattr(ride, f"{name}_lon", lon)
+        batch.append(ride)
+        if len(batch) >= 2000:
+            Ride.objects.bulk_update(batch, columns)
+            batch = []
+    if batch:
+        Ride.objects.bulk_update(batch, columns)
+
+
+def copy_columns_to_json(apps, schema_editor):
+    Ride = apps.get_model("Rides", "Ride")
+    columns = [f"{name}_{axis}" for name in LOCATION_FIELDS for axis in ("lat", "lon")]
+    batch = []
+    for ride in Ride.objects.only("pk", *columns).iterator(chunk_size=2000):
+        for name in LOCATION_FIELDS:
+            lat, lon = getattr(ride, f"{name}_lat"), getattr(ride, f"{name}_lon")
+            setattr(ride, name, None if lat is None or lon is None else (lat, lon))
+        batch.append(ride)
+        if len(batch) >= 2000:
+            Ride.objects.bulk_update(batch, list(LOCATION_FIELDS))
+            batch = []
+    if batch:
+        Ride.objects.bulk_update(batch, list(LOCATION_FIELDS))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Rides", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ride",
+            name="pickup_location_lat",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="pickup location latitude"
+            ),
+        ),
+        migrations.AddField(
+            model_name="ride",
+            name="pickup_location_lon",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="pickup location longitude"
+            ),
+        ),
+        migrations.AddField(
+            model_name="ride",
+            name="dropoff_location_lat",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="dropoff location latitude"
+            ),
+        ),
+        migrations.AddField(
+            model_name="ride",
+            name="dropoff_location_lon",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="dropoff location longitude"
+            ),
+        ),
+        migrations.RunPython(copy_json_to_columns, copy_columns_to_json),
+        migrations.RemoveField(
+            model_name="ride",
+            name="pickup_location",
+        ),
+        migrations.RemoveField(
+            model_name="ride",
+            name="dropoff_location",
+        ),
+        migrations.AddIndex(
+            model_name="ride",
+            index=models.Index(
+                fields=["pickup_location_lat", "pickup_location_lon"],
+                name="rides_pickup_loc_idx",
+            ),
+        ),
+    ]
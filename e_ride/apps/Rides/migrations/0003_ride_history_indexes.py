@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Accounts", "0004_driver_status_location_index"),
+        ("Rides", "0002_ride_location_lat_lon_columns"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="ride",
+            index=models.Index(fields=["client", "status", "created_at"], name="rides_client_status_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="ride",
+            index=models.Index(fields=["driver", "status", "created_at"], name="rides_driver_status_idx"),
+        ),
+    ]
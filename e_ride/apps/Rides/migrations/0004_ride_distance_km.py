@@ -0,0 +1,54 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:40
+
+import math
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    # Copied rather than imported, so later changes to base.geo cannot change this backfill
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * math.asin(math.sqrt(a)) * 6371
+
+
+def backfill_distance(apps, schema_editor):
+    Ride = apps.get_model("Rides", "Ride")
+    rides = (
+        Ride.objects.filter(distance_km__isnull=True)
+        .exclude(pickup_location_lat=None)
+        .exclude(dropoff_location_lat=None)
+        .select_related("driver")
+    )
+    batch = []
+    for ride in rides.iterator(chunk_size=2000):
+        distance = haversine(
+            ride.pickup_location_lat, ride.pickup_location_lon, ride.dropoff_location_lat, ride.dropoff_location_lon
+        )
+        ride.distance_km = Decimal(distance).quantize(Decimal("0.001"))
+        # Rides saved before a driver was priced in keep their price otherwise
+        if not ride.price and ride.driver and ride.driver.price_per_km:
+            ride.price = (ride.distance_km * ride.driver.price_per_km).quantize(Decimal("0.01"))
+        batch.append(ride)
+        if len(batch) >= 2000:
+            Ride.objects.bulk_update(batch, ["distance_km", "price"])
+            batch = []
+    if batch:
+        Ride.objects.bulk_update(batch, ["distance_km", "price"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Rides", "0003_ride_history_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ride",
+            name="distance_km",
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=9, null=True),
+        ),
+        migrations.RunPython(backfill_distance, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Rides", "0004_ride_distance_km"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ride",
+            name="started_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="ride",
+            name="completed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="SpeedCell",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("cell_row", models.IntegerField()),
+                ("cell_col", models.IntegerField()),
+                ("hour_of_week", models.PositiveSmallIntegerField()),
+                ("total_km", models.FloatField(default=0)),
+                ("total_hours", models.FloatField(default=0)),
+                ("samples", models.PositiveIntegerField(default=0)),
+                ("last_sample_at", models.DateTimeField()),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("cell_row", "cell_col", "hour_of_week"), name="rides_speedcell_unique"
+                    )
+                ],
+            },
+        ),
+    ]
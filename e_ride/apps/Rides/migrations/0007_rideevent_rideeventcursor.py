@@ -0,0 +1,89 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Accounts", "0004_driver_status_location_index"),
+        ("Rides", "0006_ride_surge_multiplier"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RideEventCursor",
+            fields=[
+                ("name", models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ("position", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="RideEvent",
+            fields=[
+                ("sequence", models.BigAutoField(primary_key=True, serialize=False)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("requested", "Ride Requested"),
+                            ("assigned", "Driver Assigned"),
+                            ("accepted", "Ride Accepted"),
+                            ("started", "Ride Started"),
+                            ("completed", "Ride Completed"),
+                            ("cancelled", "Ride Cancelled"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("REQUESTED", "Ride Requested"),
+                            ("ACCEPTED", "Ride Accepted"),
+                            ("STARTED", "Ride Started"),
+                            ("COMPLETED", "Ride Completed"),
+                            ("CANCELLED", "Ride Cancelled"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "actor",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "driver",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="Accounts.driver",
+                    ),
+                ),
+                (
+                    "ride",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="events",
+                        to="Rides.ride",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [models.Index(fields=["ride", "sequence"], name="rides_event_ride_seq_idx")],
+            },
+        ),
+    ]
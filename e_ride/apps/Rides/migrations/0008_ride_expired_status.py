@@ -0,0 +1,52 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+RIDE_STATUS = [
+    ("REQUESTED", "Ride Requested"),
+    ("ACCEPTED", "Ride Accepted"),
+    ("STARTED", "Ride Started"),
+    ("COMPLETED", "Ride Completed"),
+    ("CANCELLED", "Ride Cancelled"),
+    ("EXPIRED", "Ride Expired"),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Rides", "0007_rideevent_rideeventcursor"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="ride",
+            name="status",
+            field=models.CharField(choices=RIDE_STATUS, default="REQUESTED", max_length=20),
+        ),
+        migrations.AlterField(
+            model_name="rideevent",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("requested", "Ride Requested"),
+                    ("assigned", "Driver Assigned"),
+                    ("accepted", "Ride Accepted"),
+                    ("started", "Ride Started"),
+                    ("completed", "Ride Completed"),
+                    ("cancelled", "Ride Cancelled"),
+                    ("expired", "Ride Expired"),
+                ],
+                max_length=20,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="rideevent",
+            name="status",
+            field=models.CharField(choices=RIDE_STATUS, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name="ride",
+            index=models.Index(fields=["status", "created_at"], name="rides_status_created_idx"),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:25
+
+from django.db import migrations, models
+
+RIDE_STATUS = [
+    ("SCHEDULED", "Ride Scheduled"),
+    ("REQUESTED", "Ride Requested"),
+    ("ACCEPTED", "Ride Accepted"),
+    ("STARTED", "Ride Started"),
+    ("COMPLETED", "Ride Completed"),
+    ("CANCELLED", "Ride Cancelled"),
+    ("EXPIRED", "Ride Expired"),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Rides", "0008_ride_expired_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ride",
+            name="scheduled_for",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="ride",
+            name="status",
+            field=models.CharField(choices=RIDE_STATUS, default="REQUESTED", max_length=20),
+        ),
+        migrations.AlterField(
+            model_name="rideevent",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("scheduled", "Ride Scheduled"),
+                    ("requested", "Ride Requested"),
+                    ("assigned", "Driver Assigned"),
+                    ("accepted", "Ride Accepted"),
+                    ("started", "Ride Started"),
+                    ("completed", "Ride Completed"),
+                    ("cancelled", "Ride Cancelled"),
+                    ("expired", "Ride Expired"),
+                ],
+                max_length=20,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="rideevent",
+            name="status",
+            field=models.CharField(choices=RIDE_STATUS, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name="ride",
+            index=models.Index(fields=["status", "scheduled_for"], name="rides_status_scheduled_idx"),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-18 21:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Rides", "0009_ride_scheduled_for"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RideTrackChunk",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("points", models.PositiveIntegerField()),
+                ("started_at", models.DateTimeField()),
+                ("ended_at", models.DateTimeField()),
+                ("data", models.BinaryField()),
+                (
+                    "ride",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="track_chunks",
+                        to="Rides.ride",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["ride", "started_at"], name="rides_track_ride_start_idx"),
+                ],
+            },
+        ),
+    ]
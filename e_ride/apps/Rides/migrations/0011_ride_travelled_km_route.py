@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 21:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Rides", "0010_ridetrackchunk"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ride",
+            name="travelled_km",
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=9, null=True),
+        ),
+        migrations.AddField(
+            model_name="ride",
+            name="route",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
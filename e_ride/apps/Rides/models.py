@@ -1,77 +1,228 @@
-from django.db import models
+from decimal import Decimal
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+from base import breadcrumbs
 from base.models import BaseModel
 from apps.Accounts.models import Client, Driver
-from base.fields import LocationField
+from base.fields import PointField
+from base.geo import haversine
+from base.routing import road_distance
 
 class Ride(BaseModel):
     RIDE_STATUS = (
+        ('SCHEDULED', 'Ride Scheduled'),
         ('REQUESTED', 'Ride Requested'),
         ('ACCEPTED', 'Ride Accepted'),
         ('STARTED', 'Ride Started'),
         ('COMPLETED', 'Ride Completed'),
         ('CANCELLED', 'Ride Cancelled'),
+        ('EXPIRED', 'Ride Expired'),
     )
 
     driver = models.ForeignKey(Driver, on_delete=models.SET_NULL, null=True) 
     client = models.ForeignKey(Client, on_delete=models.SET_NULL, null=True)
-    pickup_location = LocationField()
-    dropoff_location = LocationField()
+    pickup_location = PointField()
+    dropoff_location = PointField()
     status = models.CharField(max_length=20, choices=RIDE_STATUS, default='REQUESTED')
     price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    # Pickup to dropoff in km, stored on save so listings and totals need no per-row haversine
+    distance_km = models.DecimalField(max_digits=9, decimal_places=3, null=True, blank=True)
+    # Surge multiplier the price was locked in with
+    surge_multiplier = models.DecimalField(max_digits=4, decimal_places=2, default=1)
+    # Distance actually driven and the simplified route, from the GPS track at completion
+    travelled_km = models.DecimalField(max_digits=9, decimal_places=3, null=True, blank=True)
+    route = models.BinaryField(null=True, blank=True)
+    # Pickup time of a booking made in advance; the ride stays SCHEDULED until apps.Rides.scheduling releases it
+    scheduled_for = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    POINT_COLUMNS = ('pickup_location_lat', 'pickup_location_lon', 'dropoff_location_lat', 'dropoff_location_lon')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pickup_location_lat', 'pickup_location_lon'], name='rides_pickup_loc_idx'),
+            # Ride history per participant, filtered by status and paged on created_at
+            models.Index(fields=['client', 'status', 'created_at'], name='rides_client_status_idx'),
+            models.Index(fields=['driver', 'status', 'created_at'], name='rides_driver_status_idx'),
+            # Oldest requests first, for dispatch and the expiry sweeper
+            models.Index(fields=['status', 'created_at'], name='rides_status_created_idx'),
+            # Upcoming bookings in pickup order, loaded a window at a time by the scheduler
+            models.Index(fields=['status', 'scheduled_for'], name='rides_status_scheduled_idx'),
+        ]
     
-    @property
-    def ride_distance(self):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_points = instance._points()
+        return instance
+
+    def _points(self):
+        return tuple(self.__dict__.get(column) for column in self.POINT_COLUMNS)
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        # Distance and price are fixed when the ride is created and whenever a location changes
+        if adding or self._points() != getattr(self, '_saved_points', None):
+            self.distance_km = self.trip_distance()
+            self.calculate_price()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'distance_km', 'price', 'surge_multiplier'}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                RideEvent.objects.create(
+                    ride=self, kind='scheduled' if self.status == 'SCHEDULED' else 'requested',
+                    status=self.status, driver_id=self.driver_id,
+                    actor_id=self.client.user_id if self.client_id else None,
+                )
+        self._saved_points = self._points()
+
+    def trip_distance(self):
+        """Pickup to dropoff distance in km, by road when a road graph is configured, rounded to the metre"""
         if not (self.pickup_location and self.dropoff_location):
             return None
-        
-        from base.mixins import LocationMixin
-        # Create a temporary instance to calculate distance
-        temp_instance = LocationMixin()
-        temp_instance.location = self.pickup_location
-        return temp_instance.distance(self.dropoff_location)
-    
+        return Decimal(road_distance(self.pickup_location, self.dropoff_location)).quantize(Decimal('0.001'))
+
+    @property
+    def ride_distance(self):
+        """Trip distance in km; the stored value when there is one"""
+        if self.distance_km is not None:
+            return self.distance_km
+        return self.trip_distance()
+
+    @property
+    def route_points(self):
+        """The stored route as (lat, lon) pairs, empty before completion"""
+        if not self.route:
+            return []
+        return [(lat, lon) for lat, lon, _ in breadcrumbs.decode(self.route)]
+
     @property
     def driver_to_pickup_distance(self):
         """Calculate distance from driver to pickup location"""
         if not (self.driver.location and self.pickup_location):
             return None
-        
-        from base.mixins import LocationMixin
-        temp_instance = LocationMixin()
-        temp_instance.location = self.driver.location
-        return temp_instance.distance(self.pickup_location)
-    
+        (lat1, lon1), (lat2, lon2) = self.driver.location, self.pickup_location
+        return haversine(lat1, lon1, lat2, lon2)
+
     @property
     def client_to_driver_distance(self):
         """Calculate current distance between client and driver"""
         if not (self.client.location and self.driver.location):
             return None
-        
-        from base.mixins import LocationMixin
-        temp_instance = LocationMixin()
-        temp_instance.location = self.client.location
-        return temp_instance.distance_to(self.driver)
-    
+        (lat1, lon1), (lat2, lon2) = self.client.location, self.driver.location
+        return haversine(lat1, lon1, lat2, lon2)
+
     @property
     def ride_duration(self):
-        """Calculate the total ride duration in seconds"""
-        # Placeholder implementation - would need actual duration calculation
-        # This could be calculated based on distance and average speed
+        """Ride duration in seconds: the actual one once completed, otherwise estimated from the speed grid"""
+        if self.started_at and self.completed_at:
+            return (self.completed_at - self.started_at).total_seconds()
         if not (self.pickup_location and self.dropoff_location):
             return None
-        
-        # For now, return None until proper duration calculation is implemented
-        # This could use a mapping service API for accurate duration
-        return None
-    
+
+        from apps.Rides.eta import speed_grid
+        return speed_grid.duration(self.pickup_location, self.dropoff_location, self.started_at)
+
 
     def calculate_price(self):
         """Calculate the total price of the ride"""
-        from decimal import Decimal
-        if not (self.ride_distance and self.driver.price_per_km):
+        if not (self.driver and self.ride_distance and self.driver.price_per_km):
             return None
-       
-        self.price = Decimal(str(self.ride_distance)) * self.driver.price_per_km
+
+        from apps.Rides.surge import surge_pricing
+        self.surge_multiplier = surge_pricing.multiplier(self.pickup_location)
+        self.price = (self.ride_distance * self.driver.price_per_km * self.surge_multiplier).quantize(Decimal('0.01'))
     
     
+
+
+class RideEvent(models.Model):
+    """
+    Append-only log of ride changes, written in the same transaction as the
+    change itself. `sequence` only grows; consumers tail it, see
+    apps.Rides.events.
+    """
+    EVENT_KINDS = (
+        ('scheduled', 'Ride Scheduled'),
+        ('requested', 'Ride Requested'),
+        ('assigned', 'Driver Assigned'),
+        ('accepted', 'Ride Accepted'),
+        ('started', 'Ride Started'),
+        ('completed', 'Ride Completed'),
+        ('cancelled', 'Ride Cancelled'),
+        ('expired', 'Ride Expired'),
+    )
+
+    sequence = models.BigAutoField(primary_key=True)
+    ride = models.ForeignKey(Ride, on_delete=models.CASCADE, related_name='events')
+    kind = models.CharField(max_length=20, choices=EVENT_KINDS)
+    # Ride status and driver right after the change
+    status = models.CharField(max_length=20, choices=Ride.RIDE_STATUS)
+    driver = models.ForeignKey(Driver, on_delete=models.SET_NULL, null=True, blank=True)
+    # User who made the change; empty for changes made by the system, such as dispatch
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ride', 'sequence'], name='rides_event_ride_seq_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Ride events are append-only')
+        super().save(*args, **kwargs)
+
+
+class RideEventCursor(models.Model):
+    """Last ride event sequence processed by each named consumer"""
+    name = models.CharField(max_length=100, primary_key=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class RideTrackChunk(models.Model):
+    """
+    Up to RIDE_TRACK_CHUNK_POINTS GPS breadcrumbs of a STARTED ride, packed
+    by base.breadcrumbs. Chunks are only ever added; see apps.Rides.tracks.
+    """
+    id = models.BigAutoField(primary_key=True)
+    ride = models.ForeignKey(Ride, on_delete=models.CASCADE, related_name='track_chunks')
+    points = models.PositiveIntegerField()
+    # Times of the first and last point, so a time range needs no decoding
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField()
+    data = models.BinaryField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ride', 'started_at'], name='rides_track_ride_start_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Ride track chunks are append-only')
+        super().save(*args, **kwargs)
+
+
+class SpeedCell(models.Model):
+    """Running travel speed totals for one geocell and hour of the week, see apps.Rides.eta"""
+    cell_row = models.IntegerField()
+    cell_col = models.IntegerField()
+    hour_of_week = models.PositiveSmallIntegerField()
+    total_km = models.FloatField(default=0)
+    total_hours = models.FloatField(default=0)
+    samples = models.PositiveIntegerField(default=0)
+    # Ingest cutoff when the cell was last updated; every ride completed by then had been read
+    last_sample_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cell_row', 'cell_col', 'hour_of_week'], name='rides_speedcell_unique'),
+        ]
+
 # Create your models here.
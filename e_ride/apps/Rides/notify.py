@@ -0,0 +1,47 @@
+import threading
+from functools import partial
+from typing import Any, Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from base.pubsub import LocalBroker
+
+
+class LocalNotifier(LocalBroker):
+    """
+    Wakes long-poll waiters in this process when a ride changes. Channels
+    are ride ids and messages carry nothing; waiters re-read the ride.
+    """
+
+
+_brokers: dict[str, LocalBroker] = {}
+_brokers_lock = threading.Lock()
+
+
+def _broker(setting: str) -> LocalBroker:
+    broker = _brokers.get(setting)
+    if broker is None:
+        with _brokers_lock:
+            broker = _brokers.get(setting)
+            if broker is None:
+                broker = _brokers[setting] = import_string(getattr(settings, setting))()
+    return broker
+
+
+def get_notifier() -> LocalBroker:
+    """The ride change notifier configured by RIDE_NOTIFIER, created on first use"""
+    return _broker('RIDE_NOTIFIER')
+
+
+def get_position_broker() -> LocalBroker:
+    """The driver position broker configured by DRIVER_POSITION_BROKER, created on first use"""
+    return _broker('DRIVER_POSITION_BROKER')
+
+
+def publish_on_commit(ride_ids: Iterable[Any]) -> None:
+    """Wake waiters on each ride once the current transaction commits"""
+    notifier = get_notifier()
+    for ride_id in set(ride_ids):
+        transaction.on_commit(partial(notifier.publish, ride_id))
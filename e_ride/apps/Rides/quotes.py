@@ -0,0 +1,49 @@
+from decimal import Decimal
+from typing import Any, Sequence
+
+import numpy as np
+
+from apps.Rides.cache import nearest_driver_cache
+from apps.Rides.eta import speed_grid
+from apps.Rides.models import Ride
+from apps.Rides.surge import surge_pricing
+
+
+def fares(distance_km: Decimal, prices_per_km: Sequence[Any], multiplier: Decimal) -> list[Decimal]:
+    """
+    Fares for one trip at each of `prices_per_km`, in one vectorized pass.
+
+    Works in integer metres, cents and hundredths of the multiplier so every
+    fare rounds exactly like Ride.calculate_price (half to even, to the
+    cent) and a quote matches the price locked in when the ride is created.
+    """
+    if not len(prices_per_km):
+        return []
+    metres = int(Decimal(distance_km).scaleb(3).to_integral_value())
+    surge = int(Decimal(multiplier).scaleb(2).to_integral_value())
+    cents = np.array([int(Decimal(price).scaleb(2).to_integral_value()) for price in prices_per_km], dtype=np.int64)
+    # metres * cents * hundredths is the fare in units of 1e-5 cents
+    quotient, remainder = np.divmod(cents * (metres * surge), 100_000)
+    round_up = (remainder > 50_000) | ((remainder == 50_000) & (quotient % 2 == 1))
+    return [Decimal(int(value)).scaleb(-2) for value in quotient + round_up]
+
+
+def quote(pickup: Any, dropoff: Any, limit: int = 7) -> dict:
+    """
+    Price a trip with every driver near `pickup` without creating a ride.
+
+    The trip distance, duration and surge multiplier are looked up once; the
+    candidates come from the nearest-driver cache with their pickup ETAs.
+    Decimals are rendered as strings, the way the ride serializers show them.
+    """
+    trip = Ride(pickup_location=pickup, dropoff_location=dropoff)
+    distance_km = trip.trip_distance()
+    multiplier = surge_pricing.multiplier(pickup)
+    drivers = nearest_driver_cache.nearest(pickup, limit=limit)
+    prices = fares(distance_km, [driver['price_per_km'] for driver in drivers], multiplier)
+    return {
+        'distance_km': str(distance_km),
+        'duration_seconds': int(round(speed_grid.duration(pickup, dropoff))),
+        'surge_multiplier': str(multiplier),
+        'drivers': [{**driver, 'price': str(price)} for driver, price in zip(drivers, prices)],
+    }
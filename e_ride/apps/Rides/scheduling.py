@@ -0,0 +1,162 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone as dt_timezone
+from typing import Hashable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.Rides.events import EventConsumer, latest_sequence
+from apps.Rides.models import Ride, RideEvent
+from apps.Rides.notify import publish_on_commit
+from apps.Rides.surge import surge_pricing
+from base.timerwheel import TimerWheel
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ScheduleResult:
+    loaded: int = 0
+    released: int = 0
+    waiting: int = 0
+
+
+class RideScheduler:
+    """
+    Hands SCHEDULED rides to matching `lead_seconds` before their pickup.
+
+    Upcoming bookings wait in a TimerWheel keyed by release time, so a tick
+    costs one wheel bucket plus the rides that fall due, however many
+    bookings are waiting. The wheel only holds the next `slots *
+    tick_seconds` seconds: whenever half of that has turned, the next stretch
+    is loaded with one range scan on the (status, scheduled_for) index, and
+    bookings further out stay in the table until then. Bookings made,
+    cancelled or expired inside the loaded stretch arrive through the ride
+    event log rather than by rescanning it.
+
+    Released rides become REQUESTED with a 'requested' RideEvent, so the
+    dispatch engine and the expiry sweeper pick them up like any other
+    request. Run it from `manage.py dispatch_rides`, which ticks it before
+    every dispatch round; there should be one scheduler at a time.
+    """
+
+    def __init__(
+        self,
+        lead_seconds: float = 900,
+        tick_seconds: float = 1.0,
+        slots: int = 3600,
+        batch_size: int = 1000,
+        consumer_name: str = 'ride-scheduler',
+    ) -> None:
+        self.lead_seconds = lead_seconds
+        self.tick_seconds = tick_seconds
+        self.slots = slots
+        self.batch_size = batch_size
+        self.consumer_name = consumer_name
+        self.wheel: Optional[TimerWheel] = None
+        self._consumer: Optional[EventConsumer] = None
+        # Release times before this have been loaded into the wheel
+        self._loaded_until: Optional[float] = None
+
+    def _release_time(self, scheduled_for: datetime) -> float:
+        return scheduled_for.timestamp() - self.lead_seconds
+
+    def _as_datetime(self, seconds: float) -> datetime:
+        return datetime.fromtimestamp(seconds + self.lead_seconds, tz=dt_timezone.utc)
+
+    def _start(self, now: float) -> None:
+        self.wheel = TimerWheel(self.tick_seconds, self.slots, start=now)
+        self._consumer = EventConsumer(self.consumer_name, batch_size=self.batch_size)
+        # Changes from here on come through the log; everything before is in the table
+        self._consumer.reset(latest_sequence())
+        self._loaded_until = None
+
+    def _load(self) -> int:
+        """Add the bookings released between the loaded stretch and the wheel's horizon"""
+        until = self.wheel.until
+        bookings = Ride.objects.filter(status='SCHEDULED', scheduled_for__lt=self._as_datetime(until))
+        if self._loaded_until is not None:
+            bookings = bookings.filter(scheduled_for__gte=self._as_datetime(self._loaded_until))
+        loaded = 0
+        rows = bookings.order_by('scheduled_for').values_list('pk', 'scheduled_for')
+        for pk, scheduled_for in rows.iterator(chunk_size=self.batch_size):
+            loaded += self.wheel.add(pk, self._release_time(scheduled_for))
+        self._loaded_until = until
+        return loaded
+
+    def _follow_log(self) -> int:
+        """Apply bookings and cancellations made since the last tick; returns the rides added"""
+        added = 0
+        while True:
+            batch = self._consumer.poll()
+            if not batch:
+                return added
+            booked = [event.ride_id for event in batch if event.kind == 'scheduled']
+            for event in batch:
+                if event.kind in ('cancelled', 'expired'):
+                    self.wheel.discard(event.ride_id)
+            if booked:
+                rows = Ride.objects.filter(
+                    pk__in=booked, status='SCHEDULED', scheduled_for__lt=self._as_datetime(self._loaded_until)
+                ).values_list('pk', 'scheduled_for')
+                for pk, scheduled_for in rows:
+                    added += self.wheel.add(pk, self._release_time(scheduled_for))
+            self._consumer.commit(batch[-1].sequence)
+
+    def release(self, ride_ids: list[Hashable], now: Optional[datetime] = None) -> int:
+        """Turn the given SCHEDULED rides into requests; returns how many were still SCHEDULED"""
+        now = now or timezone.now()
+        with transaction.atomic():
+            rows = list(
+                Ride.objects.select_for_update()
+                .filter(pk__in=ride_ids, status='SCHEDULED')
+                .values_list('pk', 'driver_id', 'pickup_location_lat', 'pickup_location_lon')
+            )
+            if not rows:
+                return 0
+            Ride.objects.filter(pk__in=[row[0] for row in rows]).update(status='REQUESTED', updated_at=now)
+            RideEvent.objects.bulk_create(
+                RideEvent(ride_id=pk, kind='requested', status='REQUESTED', driver_id=driver_id, created_at=now)
+                for pk, driver_id, _, _ in rows
+            )
+            publish_on_commit(row[0] for row in rows)
+        # update() skips post_save, so count the demand here
+        for _, _, lat, lon in rows:
+            if lat is not None:
+                surge_pricing.record_request((lat, lon))
+        return len(rows)
+
+    def tick(self, now: Optional[datetime] = None) -> ScheduleResult:
+        """Load, follow the log and release whatever has come due"""
+        now = now or timezone.now()
+        seconds = now.timestamp()
+        result = ScheduleResult()
+        if self.wheel is None:
+            self._start(seconds)
+            result.loaded += self._load()
+        else:
+            result.loaded += self._follow_log()
+        due = self.wheel.advance(seconds)
+        if self.wheel.until - self._loaded_until >= self.wheel.horizon / 2:
+            result.loaded += self._load()
+        for start in range(0, len(due), self.batch_size):
+            result.released += self.release(due[start:start + self.batch_size], now)
+        result.waiting = len(self.wheel)
+        if result.released:
+            logger.info('Released %s scheduled rides, %s waiting', result.released, result.waiting)
+        return result
+
+    def reset(self) -> None:
+        """Forget the wheel; the next tick reloads it from the table"""
+        self.wheel = None
+        self._consumer = None
+        self._loaded_until = None
+
+
+ride_scheduler = RideScheduler(
+    lead_seconds=settings.SCHEDULED_RIDE_LEAD_SECONDS,
+    tick_seconds=settings.SCHEDULER_TICK_SECONDS,
+    slots=settings.SCHEDULER_SLOTS,
+)
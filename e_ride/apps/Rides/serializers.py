@@ -1,3 +1,7 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 from apps.Accounts.serializers import DriverSerializer, ClientSerializer
 from apps.Accounts.models import Client, Driver
@@ -29,7 +33,7 @@ class NearestInstanceSerializer(serializers.Serializer):
     def to_representation(self, instance):
         data = super().to_representation(instance)
         driver_data = data.pop('driver')
-        return {**driver_data, 'distance':f'{data['distance']} miles'}
+        return {**driver_data, 'distance':f"{data['distance']} miles"}
     
 class RideCreateSerializer(serializers.ModelSerializer):
     pickup_location = LocationSerializerField()
@@ -37,25 +41,86 @@ class RideCreateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Ride
-        fields = ['id', 'driver', 'pickup_location', 'dropoff_location', 'price', 'status']
+        fields = [
+            'id', 'driver', 'pickup_location', 'dropoff_location', 'scheduled_for',
+            'distance_km', 'price', 'surge_multiplier', 'status',
+        ]
         extra_kwargs = {
             'status': {'read_only': True},
             'price': {'read_only': True},
+            'distance_km': {'read_only': True},
+            'surge_multiplier': {'read_only': True},
         }
-    
+
+    def validate_scheduled_for(self, value):
+        if value is None:
+            return value
+        now = timezone.now()
+        lead = timedelta(seconds=settings.SCHEDULED_RIDE_LEAD_SECONDS)
+        if value < now + lead:
+            raise serializers.ValidationError(
+                f'Scheduled rides must be booked at least {int(lead.total_seconds() // 60)} minutes ahead'
+            )
+        if value > now + timedelta(days=settings.SCHEDULED_RIDE_MAX_DAYS):
+            raise serializers.ValidationError(
+                f'Scheduled rides can be booked at most {settings.SCHEDULED_RIDE_MAX_DAYS} days ahead'
+            )
+        return value
+
     def create(self, validated_data):
-        driver_obj = validated_data.pop('driver')
+        # Rides requested without a driver wait for the dispatch engine to assign one
+        driver_obj = validated_data.pop('driver', None)
         user = self.context.get('request').user
         client_obj = Client.objects.get(user=user)
         instance = self.Meta.model(**validated_data)
         instance.driver = driver_obj
         instance.client = client_obj
-        instance.calculate_price()
+        # Bookings for later wait for the scheduler to release them to matching
+        if instance.scheduled_for is not None:
+            instance.status = 'SCHEDULED'
         instance.save()
         return instance
 
 
+class FareQuoteSerializer(serializers.Serializer):
+    pickup_location = LocationSerializerField()
+    dropoff_location = LocationSerializerField()
+    limit = serializers.IntegerField(min_value=1, max_value=20, default=7)
+
+
 class RideSerializer(serializers.ModelSerializer):
+    pickup_location = serializers.ReadOnlyField()
+    dropoff_location = serializers.ReadOnlyField()
+
+    class Meta:
+        model = Ride
+        exclude = ['pickup_location_lat', 'pickup_location_lon', 'dropoff_location_lat', 'dropoff_location_lon', 'route']
+
+class RideDriverSummarySerializer(serializers.ModelSerializer):
+    location = serializers.ReadOnlyField()
+
+    class Meta:
+        model = Driver
+        fields = ['id', 'first_name', 'last_name', 'car_type', 'plate_number', 'location']
+
+
+class RideClientSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Client
+        fields = ['id', 'first_name', 'last_name']
+
+
+class ActiveRideSerializer(serializers.ModelSerializer):
+    """
+    Read-only listing of active rides with a short summary of each side.
+    Use with select_related('driver', 'client') so no row adds a query.
+    """
+    pickup_location = serializers.ReadOnlyField()
+    dropoff_location = serializers.ReadOnlyField()
+    driver = RideDriverSummarySerializer(read_only=True)
+    client = RideClientSummarySerializer(read_only=True)
+
     class Meta:
         model = Ride
-        fields = '__all__'
\ No newline at end of file
+        fields = ['id', 'status', 'price', 'distance_km', 'pickup_location', 'dropoff_location', 'driver', 'client', 'created_at']
+        read_only_fields = fields
@@ -0,0 +1,118 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from apps.Accounts.models import Driver
+from apps.Rides.eta import speed_grid
+from apps.Rides.models import Ride
+from apps.Rides.notify import get_notifier, get_position_broker
+from base.geo import haversine, lat_lon
+
+# Ride statuses during which the client can follow the driver
+STREAMABLE = ('ACCEPTED', 'STARTED')
+
+
+def sse(event: str, data: Any) -> str:
+    """One Server-Sent Events message"""
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+def ride_for_stream(ride_id: Any) -> Optional[dict]:
+    """The fields a position stream needs, or None if the ride does not exist"""
+    return (
+        Ride.objects.filter(pk=ride_id)
+        .values(
+            'id', 'status', 'driver_id', 'client__user_id',
+            'pickup_location_lat', 'pickup_location_lon', 'dropoff_location_lat', 'dropoff_location_lon',
+        )
+        .first()
+    )
+
+
+def driver_position(driver_id: Any) -> Optional[tuple[float, float]]:
+    """Newest known position: a ping still waiting to be written, else the stored one"""
+    pending = Driver.location_buffer.pending_location(driver_id)
+    if pending is not None:
+        return pending
+    row = Driver.objects.filter(pk=driver_id).values_list('location_lat', 'location_lon').first()
+    if row is None or row[0] is None:
+        return None
+    return row
+
+
+def position_payload(ride: dict, position: Any) -> dict:
+    """
+    The driver's position with the straight-line distance and speed grid ETA
+    to where they are heading: the pickup while ACCEPTED, the dropoff once
+    STARTED. Road routing is left out to keep each update cheap.
+    """
+    lat, lon = lat_lon(position)
+    if ride['status'] == 'ACCEPTED':
+        target = (ride['pickup_location_lat'], ride['pickup_location_lon'])
+    else:
+        target = (ride['dropoff_location_lat'], ride['dropoff_location_lon'])
+    payload = {'lat': lat, 'lon': lon, 'status': ride['status'], 'distance_km': None, 'eta_seconds': None}
+    if target[0] is not None:
+        payload['distance_km'] = round(haversine(lat, lon, *target), 3)
+        payload['eta_seconds'] = int(round(speed_grid.duration((lat, lon), target)))
+    return payload
+
+
+async def position_events(ride: dict) -> AsyncIterator[str]:
+    """
+    Server-Sent Events for one ride: the assigned driver's position at most
+    every DRIVER_STREAM_MIN_INTERVAL seconds, a comment line when idle for
+    DRIVER_STREAM_HEARTBEAT_SECONDS, and a final `end` event once the ride
+    leaves ACCEPTED/STARTED.
+
+    Positions arrive through the position broker and status changes
+    through the ride notifier, so an idle stream costs two subscriptions
+    and no polling. Pings published while the stream is sleeping off the
+    rate limit are conflated into the newest one.
+    """
+    ride = dict(ride)
+    min_interval = settings.DRIVER_STREAM_MIN_INTERVAL
+    heartbeat = settings.DRIVER_STREAM_HEARTBEAT_SECONDS
+    # Only loading the speed grid touches the database, and only every ETA_REFRESH_SECONDS; that goes through
+    # the thread-sensitive executor like the other queries, and the payload itself is computed inline
+    ensure_speeds = sync_to_async(speed_grid.ensure_fresh)
+
+    async def payload(ride: dict, position: Any) -> dict:
+        await ensure_speeds()
+        return position_payload(ride, position)
+
+    async with get_position_broker().subscribe(ride['driver_id']) as positions, \
+            get_notifier().subscribe(ride['id']) as changes:
+        # Force a status check first, in case the ride moved on before we subscribed
+        changes.notify()
+        position = await sync_to_async(driver_position)(ride['driver_id'])
+        if position is not None:
+            yield sse('position', await payload(ride, position))
+
+        while True:
+            waits = [asyncio.ensure_future(positions.wait(heartbeat)), asyncio.ensure_future(changes.wait(heartbeat))]
+            try:
+                await asyncio.wait(waits, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for wait in waits:
+                    wait.cancel()
+
+            changed = changes.ready
+            if changed:
+                changes.take()
+                current = await sync_to_async(ride_for_stream)(ride['id'])
+                status = current['status'] if current else None
+                if status not in STREAMABLE:
+                    yield sse('end', {'status': status})
+                    return
+                ride['status'] = status
+
+            position = positions.take() if positions.ready else None
+            if position is not None:
+                yield sse('position', await payload(ride, position))
+                await asyncio.sleep(min_interval)
+            elif not changed:
+                yield ': keep-alive\n\n'
@@ -0,0 +1,117 @@
+import logging
+from decimal import Decimal
+from typing import Any, Optional
+
+from django.conf import settings
+
+from base.counters import SharedCounter
+from base.spatial import geocell
+from base.worker import PeriodicWorker
+
+logger = logging.getLogger(__name__)
+
+NO_SURGE = Decimal('1.00')
+
+
+class SurgePricing:
+    """
+    Per-geocell fare multipliers from recent demand and supply.
+
+    Demand is the number of rides requested in each cell over the rolling
+    window, counted as rides are created. Supply is the average number of
+    ONLINE drivers in the cell per bucket of the window: each driver counts
+    once per bucket, in the cell where a GPS ping, heartbeat, profile save
+    or ride transition last placed them while ONLINE. A driver who goes
+    offline, or is expired by presence, stops reporting and drops out from
+    the next bucket on. Both are fed as these events happen; nothing scans
+    the rides or drivers tables.
+
+    Every `interval` seconds the multipliers are recomputed as
+
+        1 + sensitivity * (demand / max(supply, 1) - 1)
+
+    clamped to [1, max_multiplier] and rounded to 0.1, then swapped in as a
+    plain dict, so `multiplier()` is a single lookup.
+
+    Both counters are SharedCounter rings in the `cache_alias` cache, so
+    with a shared backend (Redis in production) every process sees the
+    events of all of them and computes the same multipliers. With a
+    per-process cache such as LocMemCache, each process only counts what it
+    handled itself.
+    """
+
+    def __init__(
+        self,
+        cell_deg: float = 0.02,
+        cache_alias: str = 'default',
+        window_seconds: float = 600,
+        buckets: int = 10,
+        interval: float = 30,
+        sensitivity: float = 0.5,
+        max_multiplier: float = 3.0,
+        background: bool = True,
+    ) -> None:
+        self.cell_deg = cell_deg
+        self.interval = interval
+        self.sensitivity = sensitivity
+        self.max_multiplier = max_multiplier
+        self.background = background
+        self.demand = SharedCounter('surge:demand', cache_alias, buckets, window_seconds / buckets)
+        self.supply = SharedCounter('surge:supply', cache_alias, buckets, window_seconds / buckets)
+        self._multipliers: dict[tuple[int, int], Decimal] = {}
+        self._worker = PeriodicWorker(self.recompute, interval, name='surge-recompute')
+
+    def record_request(self, location: Any) -> None:
+        """Count a new ride request at its pickup location"""
+        if location:
+            self.demand.add(geocell(location, self.cell_deg))
+            if self.background:
+                self._worker.ensure_running()
+
+    def record_driver(self, pk: Any, location: Any, status: Optional[str]) -> None:
+        """Count a driver towards the supply of their cell if they are ONLINE"""
+        if location and status == 'ONLINE':
+            self.supply.add_distinct(geocell(location, self.cell_deg), pk)
+        else:
+            # Still an observation: a bucket where every driver went offline has a supply of zero
+            self.supply.touch()
+        if self.background:
+            self._worker.ensure_running()
+
+    def multiplier(self, location: Any) -> Decimal:
+        """Current multiplier for a pickup at `location`"""
+        if not location:
+            return NO_SURGE
+        if self.background:
+            self._worker.ensure_running()
+        return self._multipliers.get(geocell(location, self.cell_deg), NO_SURGE)
+
+    def recompute(self) -> dict[tuple[int, int], Decimal]:
+        """Rebuild the multiplier table from the counters; returns the surging cells"""
+        supply = self.supply.means()
+        multipliers = {}
+        for cell, requested in self.demand.sums().items():
+            ratio = requested / max(supply.get(cell, 0.0), 1.0)
+            value = min(max(1 + self.sensitivity * (ratio - 1), 1.0), self.max_multiplier)
+            if value > 1:
+                multipliers[cell] = Decimal(str(round(value, 1))).quantize(Decimal('0.01'))
+        self._multipliers = multipliers
+        return multipliers
+
+    def clear(self) -> None:
+        self.demand.clear()
+        self.supply.clear()
+        self._multipliers = {}
+
+    def stop(self) -> None:
+        self._worker.stop()
+
+
+surge_pricing = SurgePricing(
+    cell_deg=settings.SURGE_CELL_DEG,
+    cache_alias=settings.SURGE_CACHE_ALIAS,
+    window_seconds=settings.SURGE_WINDOW_SECONDS,
+    interval=settings.SURGE_RECOMPUTE_SECONDS,
+    sensitivity=settings.SURGE_SENSITIVITY,
+    max_multiplier=settings.SURGE_MAX_MULTIPLIER,
+)
@@ -0,0 +1,264 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from functools import partial
+from typing import Hashable, Iterable, Iterator, Optional
+
+from django.conf import settings
+
+from apps.Rides.models import Ride, RideTrackChunk
+from base import breadcrumbs
+from base.geo import haversine, lat_lon, simplify_polyline
+from base.worker import PeriodicWorker
+
+logger = logging.getLogger(__name__)
+
+
+class TrackBuffer:
+    """
+    Collects the GPS breadcrumbs of STARTED rides and stores them as
+    RideTrackChunk rows of `chunk_points` points each.
+
+    Points are held per ride in memory until a full chunk is ready, then
+    encoded and written with one bulk insert per flush, every
+    `flush_interval` seconds. A ride's partial chunk is written once it is
+    `max_age` seconds old, or straight away with `flush(ride_id,
+    force=True)`, so at most `max_age` seconds of a track are only in
+    memory. Like the location write buffer, pending points are per process.
+    """
+
+    def __init__(
+        self,
+        chunk_points: int = 64,
+        max_age: float = 60.0,
+        flush_interval: float = 5.0,
+        background: bool = True,
+    ) -> None:
+        self.chunk_points = chunk_points
+        self.max_age = max_age
+        self.flush_interval = flush_interval
+        self.background = background
+        self._lock = threading.Lock()
+        self._pending: dict[Hashable, list[tuple[float, float, datetime]]] = {}
+        # When each ride's partial chunk got its first point, by time.monotonic()
+        self._opened: dict[Hashable, float] = {}
+        self._ready: list[RideTrackChunk] = []
+        self._worker = PeriodicWorker(
+            self.flush, flush_interval, name='ride-track-flush', on_stop=partial(self.flush, force=True)
+        )
+        self.written = 0
+
+    def __len__(self) -> int:
+        """Points waiting in partial chunks"""
+        return sum(len(points) for points in self._pending.values())
+
+    def _chunk(self, ride_id: Hashable, points: list[tuple[float, float, datetime]]) -> RideTrackChunk:
+        points.sort(key=lambda point: point[2])
+        return RideTrackChunk(
+            ride_id=ride_id, points=len(points), started_at=points[0][2], ended_at=points[-1][2],
+            data=breadcrumbs.encode(points),
+        )
+
+    def add(self, ride_id: Hashable, points: Iterable[tuple[float, float, datetime]]) -> None:
+        """Append (lat, lon, recorded_at) points to a ride's track"""
+        with self._lock:
+            pending = self._pending.setdefault(ride_id, [])
+            if not pending:
+                self._opened[ride_id] = time.monotonic()
+            pending.extend(points)
+            while len(pending) >= self.chunk_points:
+                self._ready.append(self._chunk(ride_id, pending[:self.chunk_points]))
+                del pending[:self.chunk_points]
+                self._opened[ride_id] = time.monotonic()
+            if not pending:
+                del self._pending[ride_id]
+                self._opened.pop(ride_id, None)
+        if self.background:
+            self._worker.ensure_running()
+
+    def _cut_partial(self, ride_id: Optional[Hashable], force: bool) -> None:
+        now = time.monotonic()
+        for pk, opened in list(self._opened.items()):
+            if now - opened >= self.max_age or (force and ride_id in (None, pk)):
+                self._ready.append(self._chunk(pk, self._pending.pop(pk)))
+                del self._opened[pk]
+
+    def flush(self, ride_id: Optional[Hashable] = None, force: bool = False) -> int:
+        """
+        Write every full chunk, plus partial ones past `max_age`, or only
+        those of `ride_id` when given; with `force`, the partial chunk of
+        `ride_id` (or of every ride) as well. Returns the number of chunks
+        written.
+        """
+        with self._lock:
+            self._cut_partial(ride_id, force)
+            if ride_id is None:
+                ready, self._ready = self._ready, []
+            else:
+                ready = [chunk for chunk in self._ready if chunk.ride_id == ride_id]
+                self._ready = [chunk for chunk in self._ready if chunk.ride_id != ride_id]
+        if not ready:
+            return 0
+        try:
+            RideTrackChunk.objects.bulk_create(ready)
+        except Exception:
+            with self._lock:
+                self._ready[:0] = ready
+            raise
+        self.written += len(ready)
+        return len(ready)
+
+    def discard_pending(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            self._opened.clear()
+            self._ready.clear()
+
+    def stop(self) -> None:
+        """Stop the background thread and write every pending point"""
+        self._worker.stop()
+
+
+def track_points(ride_id: Hashable) -> Iterator[tuple[float, float, float]]:
+    """
+    Stream a ride's stored breadcrumbs as (lat, lon, Unix seconds), chunk
+    by chunk in time order. Points still buffered are not included; flush
+    the ride first.
+    """
+    chunks = (
+        RideTrackChunk.objects.filter(ride_id=ride_id)
+        .order_by('started_at', 'id')
+        .values_list('data', flat=True)
+    )
+    return breadcrumbs.iter_points(chunks.iterator(chunk_size=100))
+
+
+@dataclass
+class RouteSummary:
+    distance_km: float = 0.0
+    # Points used and points dropped as out of order or implausibly far from the previous one
+    points: int = 0
+    dropped: int = 0
+    # Douglas-Peucker simplified (lat, lon, Unix seconds) points
+    route: list[tuple[float, float, float]] = field(default_factory=list)
+    seconds: float = 0.0
+
+
+def summarize_track(
+    points: Iterable[tuple[float, float, float]],
+    max_speed_kmh: float = 160,
+    tolerance_m: float = 15,
+    max_rejects: int = 3,
+) -> RouteSummary:
+    """
+    One pass over a GPS track that drops bad fixes, then a Douglas-Peucker
+    simplification of what is left; the distance is the length of the
+    simplified route.
+
+    A point is dropped when its time is not after the last kept point or
+    reaching it would mean going faster than `max_speed_kmh`. When
+    `max_rejects` points in a row are dropped, the last kept point is taken
+    to be the bad one: a new segment starts at the current point and the
+    jump between segments is not counted.
+
+    Adding up the raw steps would bill GPS jitter: a few metres of noise on
+    every fix adds about a quarter to a city drive. Simplifying to within
+    `tolerance_m` first, a few times the usual noise, irons the jitter out
+    while keeping every real turn.
+    """
+    started = time.perf_counter()
+    summary = RouteSummary()
+    segments: list[list[tuple[float, float, float]]] = [[]]
+    rejects = 0
+    for lat, lon, at in points:
+        kept = segments[-1]
+        if kept:
+            last_lat, last_lon, last_at = kept[-1]
+            elapsed = at - last_at
+            if elapsed <= 0:
+                summary.dropped += 1
+                continue
+            if haversine(last_lat, last_lon, lat, lon) * 3600 > max_speed_kmh * elapsed:
+                rejects += 1
+                if rejects < max_rejects:
+                    summary.dropped += 1
+                    continue
+                segments.append([])
+            rejects = 0
+        segments[-1].append((lat, lon, at))
+
+    for kept in segments:
+        summary.points += len(kept)
+        if not kept:
+            continue
+        route = [kept[i] for i in simplify_polyline([point[:2] for point in kept], tolerance_m / 1000)]
+        summary.distance_km += sum(
+            haversine(route[i - 1][0], route[i - 1][1], route[i][0], route[i][1]) for i in range(1, len(route))
+        )
+        summary.route += route
+    summary.seconds = time.perf_counter() - started
+    return summary
+
+
+def covers_trip(ride: Ride, summary: RouteSummary) -> bool:
+    """
+    Whether a track is complete enough to charge for: it starts and ends
+    within RIDE_TRACK_ENDPOINT_KM of the pickup and dropoff, and is at least
+    RIDE_TRACK_MIN_COVERAGE of the quoted distance. Tracks with gaps, such
+    as pings lost or still held by another process, fail one or the other.
+    """
+    if not (summary.route and ride.pickup_location and ride.dropoff_location):
+        return False
+    reach = settings.RIDE_TRACK_ENDPOINT_KM
+    (first_lat, first_lon, _), (last_lat, last_lon, _) = summary.route[0], summary.route[-1]
+    if haversine(first_lat, first_lon, *lat_lon(ride.pickup_location)) > reach:
+        return False
+    if haversine(last_lat, last_lon, *lat_lon(ride.dropoff_location)) > reach:
+        return False
+    quoted_km = float(ride.distance_km or 0)
+    return summary.distance_km >= settings.RIDE_TRACK_MIN_COVERAGE * quoted_km
+
+
+def settle_route(ride: Ride) -> Optional[RouteSummary]:
+    """
+    Work out a completed ride's driven distance and route from its GPS track
+    and, when the track covers the trip, charge for that distance at the
+    price per km and surge multiplier the ride was booked with. Rides with
+    fewer than two usable points, or a track that does not cover the trip,
+    keep their quoted price. Updates `ride` in place and in the database.
+    Reads the stored track only; flush the ride's buffered points first.
+    """
+    summary = summarize_track(
+        track_points(ride.pk),
+        max_speed_kmh=settings.RIDE_TRACK_MAX_SPEED_KMH,
+        tolerance_m=settings.RIDE_ROUTE_TOLERANCE_METRES,
+    )
+    if summary.points < 2:
+        return None
+
+    travelled_km = Decimal(summary.distance_km).quantize(Decimal('0.001'))
+    fields = {'travelled_km': travelled_km, 'route': breadcrumbs.encode(summary.route)}
+    price_per_km = ride.driver.price_per_km if ride.driver_id else None
+    covered = covers_trip(ride, summary)
+    if price_per_km and covered:
+        fields['price'] = (travelled_km * price_per_km * ride.surge_multiplier).quantize(Decimal('0.01'))
+    Ride.objects.filter(pk=ride.pk).update(**fields)
+    # Only once the update has gone through, so a failure leaves `ride` as quoted
+    for name, value in fields.items():
+        setattr(ride, name, value)
+    logger.info(
+        'Ride %s travelled %.3f km over %s points (%s dropped, %s kept in route, %.3fs)%s',
+        ride.pk, summary.distance_km, summary.points, summary.dropped, len(summary.route), summary.seconds,
+        '' if covered else '; track does not cover the trip, quoted price kept',
+    )
+    return summary
+
+
+ride_tracks = TrackBuffer(
+    chunk_points=settings.RIDE_TRACK_CHUNK_POINTS,
+    max_age=settings.RIDE_TRACK_MAX_AGE_SECONDS,
+    flush_interval=settings.RIDE_TRACK_FLUSH_SECONDS,
+)
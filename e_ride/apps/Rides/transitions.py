@@ -0,0 +1,177 @@
+import logging
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Optional
+
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import exceptions
+
+from apps.Accounts.models import Client, Driver
+from apps.Rides.cache import nearest_driver_cache
+from apps.Rides.models import Ride, RideEvent
+from apps.Rides.surge import surge_pricing
+from apps.Rides.tracks import ride_tracks, settle_route
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidTransition(exceptions.APIException):
+    status_code = 400
+    default_detail = 'Ride cannot change to that status'
+    default_code = 'invalid_transition'
+
+
+@dataclass(frozen=True)
+class Transition:
+    verb: str
+    sources: tuple[str, ...]
+    target: str
+    # Who may apply it: 'driver' (the assigned driver) or 'participant' (driver or client)
+    actor: str = 'driver'
+    # New availability for the assigned driver, and the availability it must currently have
+    driver_status: Optional[str] = None
+    driver_from: Optional[str] = None
+    # Ride column recording when the transition happened
+    timestamp_field: Optional[str] = None
+    # Whether to charge for the distance in the ride's GPS track, see apps.Rides.tracks.settle_route
+    settles_route: bool = False
+
+
+ACCEPT = Transition('accepted', ('REQUESTED',), 'ACCEPTED', driver_status='ENGAGED')
+START = Transition('started', ('ACCEPTED',), 'STARTED', timestamp_field='started_at')
+COMPLETE = Transition(
+    'completed', ('STARTED',), 'COMPLETED',
+    driver_status='ONLINE', timestamp_field='completed_at', settles_route=True,
+)
+CANCEL = Transition(
+    'cancelled', ('SCHEDULED', 'REQUESTED', 'ACCEPTED'), 'CANCELLED',
+    actor='participant', driver_status='ONLINE', driver_from='ENGAGED',
+)
+
+
+def _column(model: Any, name: str) -> str:
+    return connection.ops.quote_name(model._meta.get_field(name).column)
+
+
+def _table(model: Any) -> str:
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def _prep(model: Any, name: str, value: Any) -> Any:
+    field = model._meta.get_field(name)
+    field = getattr(field, 'target_field', field)
+    return field.get_db_prep_value(value, connection)
+
+
+def _update_ride(ride_id: Any, user: Any, transition: Transition, now: Any) -> Optional[Ride]:
+    """
+    Move the ride to `transition.target` in one conditional UPDATE that only
+    matches while the ride is in an allowed source status and `user` is
+    allowed to act on it. Returns the updated row, or None if nothing matched.
+    """
+    actor_filters = [
+        f'{_column(Ride, "driver")} IN (SELECT {_column(Driver, "id")} FROM {_table(Driver)} WHERE {_column(Driver, "user")} = %s)'
+    ]
+    assignments = f'{_column(Ride, "status")} = %s, {_column(Ride, "updated_at")} = %s'
+    params: list[Any] = [transition.target, _prep(Ride, 'updated_at', now)]
+    if transition.timestamp_field:
+        assignments += f', {_column(Ride, transition.timestamp_field)} = %s'
+        params.append(_prep(Ride, transition.timestamp_field, now))
+    params += [
+        _prep(Ride, 'id', ride_id),
+        *transition.sources,
+        _prep(Driver, 'user', user.pk),
+    ]
+    if transition.actor == 'participant':
+        actor_filters.append(
+            f'{_column(Ride, "client")} IN (SELECT {_column(Client, "id")} FROM {_table(Client)} WHERE {_column(Client, "user")} = %s)'
+        )
+        params.append(_prep(Client, 'user', user.pk))
+
+    placeholders = ', '.join(['%s'] * len(transition.sources))
+    sql = (
+        f'UPDATE {_table(Ride)} SET {assignments} '
+        f'WHERE {_column(Ride, "id")} = %s AND {_column(Ride, "status")} IN ({placeholders}) '
+        f'AND ({" OR ".join(actor_filters)}) RETURNING *'
+    )
+    # raw() applies the usual field converters to the returned row
+    rows = list(Ride.objects.raw(sql, params))
+    return rows[0] if rows else None
+
+
+def _update_driver(driver_id: Any, transition: Transition, now: Any) -> Optional[Driver]:
+    """Set the assigned driver's availability in one conditional UPDATE, returning the row if it changed"""
+    params: list[Any] = [transition.driver_status, _prep(Driver, 'updated_at', now), _prep(Driver, 'id', driver_id)]
+    condition = ''
+    if transition.driver_from:
+        condition = f' AND {_column(Driver, "availability_status")} = %s'
+        params.append(transition.driver_from)
+    sql = (
+        f'UPDATE {_table(Driver)} SET {_column(Driver, "availability_status")} = %s, {_column(Driver, "updated_at")} = %s '
+        f'WHERE {_column(Driver, "id")} = %s{condition} RETURNING *'
+    )
+    rows = list(Driver.objects.raw(sql, params))
+    return rows[0] if rows else None
+
+
+def _publish_driver(driver: Driver) -> None:
+    """Push a committed availability change to the spatial index, nearest-driver cache and surge supply"""
+    Driver.spatial_index.update(driver.pk, driver.location, driver.availability_status)
+    nearest_driver_cache.invalidate_driver(driver.pk, driver.location)
+    surge_pricing.record_driver(driver.pk, driver.location, driver.availability_status)
+
+
+def _explain_failure(ride_id: Any, user: Any, transition: Transition) -> exceptions.APIException:
+    """Work out why the conditional update matched nothing"""
+    row = Ride.objects.filter(pk=ride_id).values('status', 'driver__user_id', 'client__user_id').first()
+    if row is None:
+        return exceptions.NotFound('Ride not found')
+    allowed = {row['driver__user_id']}
+    if transition.actor == 'participant':
+        allowed.add(row['client__user_id'])
+    if user.pk not in allowed:
+        return exceptions.PermissionDenied()
+    return InvalidTransition(f'Ride cannot be {transition.verb} from status {row["status"]}')
+
+
+def apply_transition(ride_id: Any, user: Any, transition: Transition) -> Ride:
+    """
+    Apply a ride state change and the matching driver availability change
+    atomically, and append the matching RideEvent in the same transaction.
+    Completion also settles the fare from the GPS track before committing;
+    a track that cannot be read or settled leaves the quoted price.
+    Concurrent callers race on the conditional UPDATE, so exactly one of
+    them wins; the rest get InvalidTransition (or NotFound /
+    PermissionDenied) without anything having been written.
+
+    Raw writes skip the Driver post_save signal, so the spatial index and
+    nearest-driver cache are updated here once the outermost transaction
+    commits; a rollback leaves them untouched.
+    """
+    now = timezone.now()
+    if transition.settles_route:
+        # Outside the transaction, so a rollback cannot lose the written chunks
+        try:
+            ride_tracks.flush(ride_id, force=True)
+        except Exception:
+            logger.exception('Failed to write the track of ride %s before settling it', ride_id)
+    with transaction.atomic():
+        ride = _update_ride(ride_id, user, transition, now)
+        if ride is None:
+            raise _explain_failure(ride_id, user, transition)
+        RideEvent.objects.create(
+            ride=ride, kind=transition.verb, status=ride.status, driver_id=ride.driver_id, actor=user, created_at=now,
+        )
+        if transition.settles_route:
+            try:
+                # A savepoint, so a failed query does not break the completion itself
+                with transaction.atomic():
+                    settle_route(ride)
+            except Exception:
+                logger.exception('Failed to settle ride %s from its track; keeping the quoted price', ride.pk)
+        if transition.driver_status and ride.driver_id:
+            driver = _update_driver(ride.driver_id, transition, now)
+            if driver is not None:
+                transaction.on_commit(partial(_publish_driver, driver))
+    return ride
@@ -1,11 +1,16 @@
 from django.urls import path
-from .views import NearestDriverView, RideRequestsView, RideAcceptView, RideStartView, RideCompleteView, RideCancelView
+from .views import NearestDriverView, NearestDriverCacheStatsView, FareQuoteView, RideRequestsView, RideHistoryView, RideAcceptView, RideStartView, RideCompleteView, RideCancelView, RideWaitView, DriverPositionStreamView
 
 urlpatterns = [
     path('find_ride', NearestDriverView.as_view(), name='find rides'),
+    path('find_ride/cache_stats', NearestDriverCacheStatsView.as_view(), name='find rides cache stats'),
+    path('quote', FareQuoteView.as_view(), name='fare quote'),
     path('ride_request', RideRequestsView.as_view(), name='ride requests'),
+    path('history', RideHistoryView.as_view(), name='ride history'),
     path('ride/<uuid:ride_id>/accept/', RideAcceptView.as_view(), name='ride-accept'),
     path('ride/<uuid:ride_id>/start/', RideStartView.as_view(), name='ride-start'),
     path('ride/<uuid:ride_id>/complete/', RideCompleteView.as_view(), name='ride-complete'),
     path('ride/<uuid:ride_id>/cancel/', RideCancelView.as_view(), name='ride-cancel'),
+    path('ride/<uuid:ride_id>/wait/', RideWaitView.as_view(), name='ride-wait'),
+    path('ride/<uuid:ride_id>/driver_position/', DriverPositionStreamView.as_view(), name='ride-driver-position'),
 ]
\ No newline at end of file
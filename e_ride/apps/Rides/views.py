@@ -1,14 +1,25 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.views import View
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from apps.Accounts.models import Client, Driver
-from apps.Accounts.permissions import IsClient, IsDriver
-from apps.Rides.serializers import NearestInstanceSerializer, RideCreateSerializer, RideSerializer
-from apps.Rides.models import Ride
-from django.shortcuts import get_object_or_404
-from apps.Rides.permissions import IsRideDriver, IsRideClient, IsRideParticipant
+from apps.Accounts.permissions import IsClient, IsDriver, IsAdmin
+from apps.Rides.serializers import ActiveRideSerializer, FareQuoteSerializer, RideCreateSerializer, RideSerializer
+from apps.Rides.models import Ride, RideEvent
+from rest_framework.exceptions import APIException, AuthenticationFailed, ValidationError
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from base.pagination import KeysetPaginator
+from apps.Rides.cache import nearest_driver_cache
+from apps.Rides.notify import get_notifier
+from apps.Rides.quotes import quote
+from apps.Rides.streams import STREAMABLE, position_events, ride_for_stream
+from apps.Rides.transitions import ACCEPT, CANCEL, COMPLETE, START, apply_transition
 
 class NearestDriverView(APIView):
     permission_classes = [IsAuthenticated, IsClient]
@@ -17,13 +28,15 @@ class NearestDriverView(APIView):
             client_obj = Client.objects.get(user=request.user)
             lon = float(request.data.get('lon'))
             lat = float(request.data.get('lat'))
-            client_obj.location = (lon, lat) 
-            client_obj.save()
-            nearest_drivers = client_obj.find_nearest_instances(Driver, limit=7)
-            serializer = NearestInstanceSerializer(nearest_drivers, many=True)
+            location = (lon, lat)
+            written = Client.location_dead_band.should_write(client_obj.location, client_obj.updated_at, location)
+            client_obj.location = location
+            if written:
+                client_obj.save(update_fields=['location_lat', 'location_lon', 'updated_at'])
             data = {
                 'status': 'Success',
-                'data' : serializer.data
+                'data' : nearest_driver_cache.nearest(client_obj.location, limit=7),
+                'location_written': written
             }
             return Response(data=data, status=status.HTTP_200_OK)
         except (TypeError, ValueError):
@@ -39,11 +52,9 @@ class NearestDriverView(APIView):
         # Assume User's location is present
         try:
             client_obj = Client.objects.get(user=request.user)
-            nearest_drivers = client_obj.find_nearest_instances(Driver, limit=7)
-            serializer = NearestInstanceSerializer(nearest_drivers, many=True)
             data = {
                 'status' : 'Success',
-                'data' : serializer.data
+                'data' : nearest_driver_cache.nearest(client_obj.location, limit=7)
             }
             return Response(data=data, status=status.HTTP_200_OK)
         except Client.DoesNotExist:
@@ -55,6 +66,26 @@ class NearestDriverView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+class NearestDriverCacheStatsView(APIView):
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        return Response({'status': 'Success', 'data': nearest_driver_cache.stats()}, status=status.HTTP_200_OK)
+
+class FareQuoteView(APIView):
+    """Prices for a trip with each nearby driver, without creating a ride"""
+    permission_classes = [IsAuthenticated, IsClient]
+
+    def post(self, request):
+        serializer = FareQuoteSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'status': 'Failed', 'details': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        return Response({
+            'status': 'Success',
+            'data': quote(data['pickup_location'], data['dropoff_location'], limit=data['limit']),
+        }, status=status.HTTP_200_OK)
+
 class RideRequestsView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -62,27 +93,22 @@ class RideRequestsView(APIView):
         user = request.user
         role_name = getattr(user.role, 'name', '').upper() if user.role else ''
         if role_name == 'CLIENT':
-            try:
-                client_obj = Client.objects.get(user=user)
-                active_rides = Ride.objects.filter(
-                    client=client_obj, 
-                    status__in=['REQUESTED', 'ACCEPTED', 'STARTED']
-                )
-            except Client.DoesNotExist:
-                return Response({'status': 'Failed', 'details': 'Client profile not found'}, status=status.HTTP_404_NOT_FOUND)
+            profile_model, lookup = Client, 'client__user'
         elif role_name == 'DRIVER':
-            try:
-                driver_obj = Driver.objects.get(user=user)
-                active_rides = Ride.objects.filter(
-                    driver=driver_obj, 
-                    status__in=['REQUESTED', 'ACCEPTED', 'STARTED']
-                )
-            except Driver.DoesNotExist:
-                return Response({'status': 'Failed', 'details': 'Driver profile not found'}, status=status.HTTP_404_NOT_FOUND)
+            profile_model, lookup = Driver, 'driver__user'
         else:
             return Response({'status': 'Failed', 'details': 'Only drivers and clients can view active rides'}, status=status.HTTP_403_FORBIDDEN)
-            
-        serializer = RideSerializer(active_rides, many=True)
+
+        # Filter through the profile join instead of loading the profile first
+        active_rides = list(
+            Ride.objects.filter(**{lookup: user}, status__in=['SCHEDULED', 'REQUESTED', 'ACCEPTED', 'STARTED'])
+            .select_related('driver', 'client')
+            .order_by('-created_at')
+        )
+        if not active_rides and not profile_model.objects.filter(user=user).exists():
+            return Response({'status': 'Failed', 'details': f'{profile_model.__name__} profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = ActiveRideSerializer(active_rides, many=True)
         return Response({
             'status': 'Success',
             'data': serializer.data,
@@ -93,9 +119,10 @@ class RideRequestsView(APIView):
         if role_name != 'CLIENT':
             return Response({'status': 'Failed', 'details': 'Only clients can request rides'}, status=status.HTTP_403_FORBIDDEN)
             
+        serializer = RideCreateSerializer(data=request.data, context={'request':request})
+        if not serializer.is_valid():
+            return Response({'status': 'Failed', 'details': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            serializer = RideCreateSerializer(data=request.data, context={'request':request})
-            serializer.is_valid(raise_exception=True)
             serializer.save()
             data = {
                 'status' : 'Success',
@@ -111,75 +138,162 @@ class RideRequestsView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class RideAcceptView(APIView):
-    permission_classes = [IsAuthenticated, IsRideDriver]
-    
-    def post(self, request, ride_id):
-        ride = get_object_or_404(Ride, id=ride_id)
-        self.check_object_permissions(request, ride)
-        
-        if ride.status != 'REQUESTED':
-            return Response({'status': 'Failed', 'details': f'Ride cannot be accepted from status {ride.status}'}, status=status.HTTP_400_BAD_REQUEST)
-            
-        ride.status = 'ACCEPTED'
-        ride.save()
-        
-        driver = ride.driver
-        driver.availability_status = 'ENGAGED'
-        driver.save()
-        
-        return Response({'status': 'Success', 'data': RideSerializer(ride).data}, status=status.HTTP_200_OK)
+class RideHistoryView(APIView):
+    """Ride history for the current client or driver, newest first, keyset paginated"""
+    permission_classes = [IsAuthenticated]
+    paginator = KeysetPaginator()
 
-class RideStartView(APIView):
-    permission_classes = [IsAuthenticated, IsRideDriver]
-    
-    def post(self, request, ride_id):
-        ride = get_object_or_404(Ride, id=ride_id)
-        self.check_object_permissions(request, ride)
-        
-        if ride.status != 'ACCEPTED':
-            return Response({'status': 'Failed', 'details': f'Ride cannot be started from status {ride.status}'}, status=status.HTTP_400_BAD_REQUEST)
-            
-        ride.status = 'STARTED'
-        ride.save()
-        
-        return Response({'status': 'Success', 'data': RideSerializer(ride).data}, status=status.HTTP_200_OK)
+    def get(self, request):
+        user = request.user
+        role_name = getattr(user.role, 'name', '').upper() if user.role else ''
+        if role_name == 'CLIENT':
+            lookup = 'client__user'
+        elif role_name == 'DRIVER':
+            lookup = 'driver__user'
+        else:
+            return Response({'status': 'Failed', 'details': 'Only drivers and clients can view ride history'}, status=status.HTTP_403_FORBIDDEN)
 
-class RideCompleteView(APIView):
-    permission_classes = [IsAuthenticated, IsRideDriver]
-    
-    def post(self, request, ride_id):
-        ride = get_object_or_404(Ride, id=ride_id)
-        self.check_object_permissions(request, ride)
-        
-        if ride.status != 'STARTED':
-            return Response({'status': 'Failed', 'details': f'Ride cannot be completed from status {ride.status}'}, status=status.HTTP_400_BAD_REQUEST)
-            
-        ride.status = 'COMPLETED'
-        ride.save()
-        
-        driver = ride.driver
-        driver.availability_status = 'ONLINE'
-        driver.save()
-        
-        return Response({'status': 'Success', 'data': RideSerializer(ride).data}, status=status.HTTP_200_OK)
+        rides = Ride.objects.filter(**{lookup: user}).select_related('driver', 'client')
+        statuses = [value.upper() for value in request.query_params.get('status', '').split(',') if value]
+        valid = {choice for choice, _ in Ride.RIDE_STATUS}
+        if any(value not in valid for value in statuses):
+            return Response({'status': 'Failed', 'details': f'status must be one of {", ".join(sorted(valid))}'}, status=status.HTTP_400_BAD_REQUEST)
+        if statuses:
+            rides = rides.filter(status__in=statuses)
+
+        try:
+            page, next_cursor = self.paginator.paginate(
+                rides, request.query_params.get('cursor'), request.query_params.get('limit')
+            )
+        except ValidationError as e:
+            return Response({'status': 'Failed', 'details': e.detail[0]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'status': 'Success',
+            'data': ActiveRideSerializer(page, many=True).data,
+            'next': next_cursor,
+        }, status=status.HTTP_200_OK)
+
+class RideTransitionView(APIView):
+    permission_classes = [IsAuthenticated]
+    transition = None
 
-class RideCancelView(APIView):
-    permission_classes = [IsAuthenticated, IsRideParticipant]
-    
     def post(self, request, ride_id):
-        ride = get_object_or_404(Ride, id=ride_id)
-        self.check_object_permissions(request, ride)
-        
-        if ride.status not in ['REQUESTED', 'ACCEPTED']:
-            return Response({'status': 'Failed', 'details': f'Ride cannot be cancelled from status {ride.status}'}, status=status.HTTP_400_BAD_REQUEST)
-            
-        ride.status = 'CANCELLED'
-        ride.save()
-        
-        driver = ride.driver
-        if driver and driver.availability_status == 'ENGAGED':
-            driver.availability_status = 'ONLINE'
-            driver.save()
-            
+        try:
+            ride = apply_transition(ride_id, request.user, self.transition)
+        except APIException as e:
+            return Response({'status': 'Failed', 'details': str(e.detail)}, status=e.status_code)
         return Response({'status': 'Success', 'data': RideSerializer(ride).data}, status=status.HTTP_200_OK)
+
+class RideAcceptView(RideTransitionView):
+    transition = ACCEPT
+
+class RideStartView(RideTransitionView):
+    transition = START
+
+class RideCompleteView(RideTransitionView):
+    transition = COMPLETE
+
+class RideCancelView(RideTransitionView):
+    transition = CANCEL
+
+
+async def _authenticate(request):
+    """JWT authentication for async views, which DRF's APIView does not support; returns (user, error response)"""
+    try:
+        authenticated = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed as e:
+        return None, JsonResponse({'status': 'Failed', 'details': str(e.detail)}, status=e.status_code)
+    if authenticated is None:
+        return None, JsonResponse({'status': 'Failed', 'details': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
+    return authenticated[0], None
+
+def _ride_snapshot(ride_id, user):
+    """Status and event version of a ride, or the error response if `user` may not watch it"""
+    # The newest event for the ride is one step down the (ride, sequence) index
+    latest = RideEvent.objects.filter(ride=OuterRef('pk')).order_by('-sequence').values('sequence')[:1]
+    row = (
+        Ride.objects.filter(pk=ride_id)
+        .annotate(version=Subquery(latest))
+        .values('status', 'driver_id', 'client__user_id', 'driver__user_id', 'version')
+        .first()
+    )
+    if row is None:
+        return None, JsonResponse({'status': 'Failed', 'details': 'Ride not found'}, status=status.HTTP_404_NOT_FOUND)
+    if user.pk not in (row['client__user_id'], row['driver__user_id']):
+        return None, JsonResponse({'status': 'Failed', 'details': 'You are not part of this ride'}, status=status.HTTP_403_FORBIDDEN)
+    # Rides created before the event log have no events; they are at version 0
+    row['version'] = row['version'] or 0
+    return row, None
+
+class RideWaitView(View):
+    """
+    Long-poll for a ride change: responds as soon as the ride's event version
+    differs from `version`, or with the unchanged state after `timeout`
+    seconds. The view is async, so under ASGI a held request costs no worker
+    thread; clients pass the returned version back in the next call.
+    """
+
+    async def get(self, request, ride_id):
+        user, error = await _authenticate(request)
+        if error is not None:
+            return error
+
+        try:
+            version = request.GET.get('version')
+            version = int(version) if version not in (None, '') else None
+            timeout = float(request.GET.get('timeout', settings.RIDE_WAIT_DEFAULT_SECONDS))
+        except ValueError:
+            return JsonResponse({'status': 'Failed', 'details': 'version must be an integer and timeout a number'}, status=status.HTTP_400_BAD_REQUEST)
+        timeout = min(max(timeout, 0), settings.RIDE_WAIT_MAX_SECONDS)
+
+        # Subscribe before reading so a change landing in between still wakes us
+        async with get_notifier().subscribe(ride_id) as subscription:
+            row, error = await sync_to_async(_ride_snapshot)(ride_id, user)
+            if error is not None:
+                return error
+            if version is None or row['version'] != version:
+                return self._respond(ride_id, row, changed=version is not None)
+            await subscription.wait(timeout)
+
+        row, error = await sync_to_async(_ride_snapshot)(ride_id, user)
+        if error is not None:
+            return error
+        return self._respond(ride_id, row, changed=row['version'] != version)
+
+    def _respond(self, ride_id, row, changed):
+        return JsonResponse({
+            'status': 'Success',
+            'data': {
+                'id': str(ride_id),
+                'status': row['status'],
+                'driver': str(row['driver_id']) if row['driver_id'] else None,
+                'version': row['version'],
+                'changed': changed,
+            },
+        })
+
+class DriverPositionStreamView(View):
+    """
+    Server-Sent Events stream of the assigned driver's position, with the
+    distance and ETA to the pickup (then the dropoff), for the ride's
+    client while the ride is ACCEPTED or STARTED. Async like RideWaitView,
+    so open streams hold no worker threads under ASGI.
+    """
+
+    async def get(self, request, ride_id):
+        user, error = await _authenticate(request)
+        if error is not None:
+            return error
+        ride = await sync_to_async(ride_for_stream)(ride_id)
+        if ride is None:
+            return JsonResponse({'status': 'Failed', 'details': 'Ride not found'}, status=status.HTTP_404_NOT_FOUND)
+        if ride['client__user_id'] != user.pk:
+            return JsonResponse({'status': 'Failed', 'details': 'Only the ride\'s client can follow the driver'}, status=status.HTTP_403_FORBIDDEN)
+        if ride['status'] not in STREAMABLE or ride['driver_id'] is None:
+            return JsonResponse({'status': 'Failed', 'details': f'Ride is {ride["status"]}; positions are only streamed while it is accepted or started'}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(position_events(ride), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
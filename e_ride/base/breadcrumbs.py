@@ -0,0 +1,108 @@
+"""
+Compact binary encoding for GPS breadcrumbs.
+
+A chunk packs a run of (lat, lon, time) points as
+
+    version byte | point count | count x (dlat, dlon, dt)
+
+where every number is a zigzag varint, coordinates are integer
+microdegrees (~0.11 m) and times integer milliseconds since the Unix
+epoch, each stored as the difference from the previous point (the first
+from zero). Consecutive GPS fixes are close in space and time, so a point
+usually costs 2 bytes per field, against ~40 bytes for one JSON location
+plus its timestamp. Chunks are self-contained and decoded lazily, a point
+at a time.
+"""
+from datetime import datetime
+from typing import Iterable, Iterator, Union
+
+VERSION = 1
+MICRODEGREES = 1_000_000
+
+Timestamp = Union[datetime, float]
+
+
+class BreadcrumbError(ValueError):
+    pass
+
+
+def _seconds(at: Timestamp) -> float:
+    return at.timestamp() if isinstance(at, datetime) else float(at)
+
+
+def _put(out: bytearray, value: int) -> None:
+    # Zigzag keeps small negative deltas small: 0, -1, 1, -2 -> 0, 1, 2, 3
+    value = value << 1 if value >= 0 else (-value << 1) - 1
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def encode(points: Iterable[tuple[float, float, Timestamp]]) -> bytes:
+    """Pack (lat, lon, time) points, time as a datetime or Unix seconds, into one chunk"""
+    body = bytearray()
+    count = 0
+    prev_lat = prev_lon = prev_ms = 0
+    for lat, lon, at in points:
+        lat_u = round(lat * MICRODEGREES)
+        lon_u = round(lon * MICRODEGREES)
+        ms = round(_seconds(at) * 1000)
+        _put(body, lat_u - prev_lat)
+        _put(body, lon_u - prev_lon)
+        _put(body, ms - prev_ms)
+        prev_lat, prev_lon, prev_ms = lat_u, lon_u, ms
+        count += 1
+    head = bytearray([VERSION])
+    _put(head, count)
+    return bytes(head + body)
+
+
+def decode(data: bytes) -> Iterator[tuple[float, float, float]]:
+    """Yield the (lat, lon, Unix seconds) points of one chunk in the order they were encoded"""
+    data = bytes(data)
+    if not data or data[0] != VERSION:
+        raise BreadcrumbError('Unknown breadcrumb chunk version')
+    pos = 1
+    end = len(data)
+
+    def take() -> int:
+        nonlocal pos
+        value = shift = 0
+        while True:
+            if pos >= end:
+                raise BreadcrumbError('Truncated breadcrumb chunk')
+            byte = data[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value >> 1 if not value & 1 else -((value + 1) >> 1)
+            shift += 7
+
+    count = take()
+    lat = lon = ms = 0
+    for _ in range(count):
+        lat += take()
+        lon += take()
+        ms += take()
+        yield lat / MICRODEGREES, lon / MICRODEGREES, ms / 1000
+
+
+def count(data: bytes) -> int:
+    """Number of points in a chunk, without decoding them"""
+    data = bytes(data[:11])
+    if not data or data[0] != VERSION:
+        raise BreadcrumbError('Unknown breadcrumb chunk version')
+    value = shift = 0
+    for byte in data[1:]:
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value >> 1
+        shift += 7
+    raise BreadcrumbError('Truncated breadcrumb chunk')
+
+
+def iter_points(chunks: Iterable[bytes]) -> Iterator[tuple[float, float, float]]:
+    """Stream the points of consecutive chunks, decoding one chunk at a time"""
+    for chunk in chunks:
+        yield from decode(chunk)
@@ -0,0 +1,204 @@
+import math
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+import numpy as np
+from django.core.cache import caches
+
+
+class RingCounter:
+    """
+    Rolling-window counts per key in a fixed-size ring of time buckets.
+
+    Each key owns one row of `buckets` slots in a shared numpy array; the
+    slot for the current `bucket_seconds` period is found by modulo, and
+    slots are zeroed as time moves past them, so memory per key is fixed
+    and no event history is kept. `add` counts events (e.g. ride requests)
+    and `replace` records a snapshot of a level (e.g. drivers online) in
+    the current bucket; `sums` and `means` read the whole window.
+    """
+
+    def __init__(self, buckets: int = 10, bucket_seconds: float = 60, clock: Callable[[], float] = time.monotonic) -> None:
+        self.buckets = buckets
+        self.bucket_seconds = bucket_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._rows: dict[Hashable, int] = {}
+        self._counts = np.zeros((16, buckets), dtype=np.float64)
+        self._epoch = int(clock() // bucket_seconds)
+        # Buckets that have been written since they were last cleared, for means()
+        self._filled = np.zeros(buckets, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _advance(self) -> int:
+        """Clear the slots time has moved past; returns the current slot"""
+        epoch = int(self.clock() // self.bucket_seconds)
+        if epoch > self._epoch:
+            for stale in range(self._epoch + 1, self._epoch + 1 + min(epoch - self._epoch, self.buckets)):
+                self._counts[:, stale % self.buckets] = 0
+                self._filled[stale % self.buckets] = False
+            self._epoch = epoch
+        return self._epoch % self.buckets
+
+    def _row(self, key: Hashable) -> int:
+        row = self._rows.get(key)
+        if row is None:
+            row = self._rows[key] = len(self._rows)
+            if row == len(self._counts):
+                self._counts = np.vstack([self._counts, np.zeros_like(self._counts)])
+        return row
+
+    def add(self, key: Hashable, amount: float = 1) -> None:
+        with self._lock:
+            slot = self._advance()
+            row = self._row(key)
+            self._counts[row, slot] += amount
+            self._filled[slot] = True
+
+    def replace(self, values: dict[Hashable, float]) -> None:
+        """Overwrite the current bucket with `values`; keys not given read as 0"""
+        with self._lock:
+            slot = self._advance()
+            self._counts[:, slot] = 0
+            for key, value in values.items():
+                row = self._row(key)
+                self._counts[row, slot] = value
+            self._filled[slot] = True
+
+    def sums(self) -> dict[Hashable, float]:
+        """Total per key over the window, for keys with a non-zero total"""
+        with self._lock:
+            self._advance()
+            totals = self._counts[:len(self._rows)].sum(axis=1)
+            return {key: float(totals[row]) for key, row in self._rows.items() if totals[row]}
+
+    def means(self) -> dict[Hashable, float]:
+        """Average per written bucket over the window, for snapshots taken with replace()"""
+        with self._lock:
+            self._advance()
+            filled = int(self._filled.sum())
+            if not filled:
+                return {}
+            totals = self._counts[:len(self._rows)].sum(axis=1) / filled
+            return {key: float(totals[row]) for key, row in self._rows.items() if totals[row]}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows.clear()
+            self._counts[:] = 0
+            self._filled[:] = False
+
+
+class SharedCounter:
+    """
+    Rolling-window event counts per key, kept in a Django cache so every
+    process using a shared backend adds to and reads the same totals.
+
+    Counts go to one cache integer per key and `bucket_seconds` period of
+    wall-clock time, incremented atomically and left to expire once the
+    window has moved past it. The first count of a key in a bucket also
+    claims the next slot in that bucket's key list, so `sums` reads the
+    whole window with a few get_many calls and without scanning the cache.
+    `add_distinct` counts each member once per bucket, so a level such as
+    drivers online can be sampled from repeated sightings. Keys and members
+    must be picklable and have a stable repr.
+    """
+
+    def __init__(
+        self,
+        prefix: str,
+        alias: str = 'default',
+        buckets: int = 10,
+        bucket_seconds: float = 60,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.prefix = prefix
+        self.alias = alias
+        self.buckets = buckets
+        self.bucket_seconds = bucket_seconds
+        self.clock = clock
+        # Long enough to outlive the window, so reads never see a half expired bucket
+        self.ttl = math.ceil((buckets + 1) * bucket_seconds)
+
+    @property
+    def cache(self) -> Any:
+        return caches[self.alias]
+
+    def _epochs(self) -> range:
+        epoch = int(self.clock() // self.bucket_seconds)
+        return range(epoch - self.buckets + 1, epoch + 1)
+
+    def _count_key(self, epoch: int, key: Hashable) -> str:
+        return f'{self.prefix}:{epoch}:{key!r}'.replace(' ', '')
+
+    def _incr(self, name: str, amount: int = 1) -> int:
+        self.cache.add(name, 0, self.ttl)
+        return self.cache.incr(name, amount)
+
+    def add(self, key: Hashable, amount: int = 1) -> None:
+        epoch = int(self.clock() // self.bucket_seconds)
+        if self.cache.add(self._count_key(epoch, key), amount, self.ttl):
+            slot = self._incr(f'{self.prefix}:{epoch}:n')
+            self.cache.set(f'{self.prefix}:{epoch}:k{slot}', key, self.ttl)
+            return
+        try:
+            self.cache.incr(self._count_key(epoch, key), amount)
+        except ValueError:
+            # Expired between the add and the incr; the bucket has left the window anyway
+            pass
+
+    def add_distinct(self, key: Hashable, member: Hashable) -> None:
+        """Count `member` under `key` at most once per bucket, e.g. each driver seen in a cell"""
+        epoch = int(self.clock() // self.bucket_seconds)
+        if self.cache.add(f'{self.prefix}:{epoch}:m:{member!r}'.replace(' ', ''), 1, self.ttl):
+            self.add(key)
+
+    def touch(self) -> None:
+        """Mark the current bucket as observed even if nothing is counted in it, for means()"""
+        self.cache.add(f'{self.prefix}:{int(self.clock() // self.bucket_seconds)}:n', 0, self.ttl)
+
+    def _keys(self) -> dict[int, list[Hashable]]:
+        """The keys counted in each bucket of the window"""
+        epochs = self._epochs()
+        sizes = self.cache.get_many([f'{self.prefix}:{epoch}:n' for epoch in epochs])
+        names = [
+            f'{self.prefix}:{epoch}:k{slot}'
+            for epoch in epochs
+            for slot in range(1, sizes.get(f'{self.prefix}:{epoch}:n', 0) + 1)
+        ]
+        keys: dict[int, list[Hashable]] = {}
+        for name, key in self.cache.get_many(names).items():
+            keys.setdefault(int(name.split(':')[-2]), []).append(key)
+        return keys
+
+    def sums(self) -> dict[Hashable, float]:
+        """Total per key over the window, for keys with a non-zero total"""
+        names = {
+            self._count_key(epoch, key): key
+            for epoch, keys in self._keys().items()
+            for key in keys
+        }
+        totals: dict[Hashable, float] = {}
+        for name, value in self.cache.get_many(list(names)).items():
+            if value:
+                totals[names[name]] = totals.get(names[name], 0.0) + float(value)
+        return totals
+
+    def means(self) -> dict[Hashable, float]:
+        """Average per observed bucket (one that was counted in or touched), for levels such as drivers online"""
+        observed = len(self.cache.get_many([f'{self.prefix}:{epoch}:n' for epoch in self._epochs()]))
+        if not observed:
+            return {}
+        return {key: total / observed for key, total in self.sums().items()}
+
+    def clear(self) -> None:
+        names = []
+        for epoch, keys in self._keys().items():
+            names += [self._count_key(epoch, key) for key in keys]
+        for epoch in self._epochs():
+            size = self.cache.get(f'{self.prefix}:{epoch}:n', 0)
+            names += [f'{self.prefix}:{epoch}:n'] + [f'{self.prefix}:{epoch}:k{slot}' for slot in range(1, size + 1)]
+        self.cache.delete_many(names)
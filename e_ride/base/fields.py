@@ -3,6 +3,10 @@ from django.core.exceptions import ValidationError
 import json
 
 class LocationField(models.Field):
+    """
+    Legacy JSON storage for a (lat, lon) point. Superseded by PointField and
+    only kept so the historical migrations that reference it still load.
+    """
     description = "A geographical point (latitude, longitude) stored as JSON"
 
     def __init__(self, *args, **kwargs):
@@ -71,4 +75,65 @@ class LocationField(models.Field):
         if value is None:
             return None
         lat, lon = self.to_python(value)
-        return json.dumps({'lat': lat, 'lon': lon})
\ No newline at end of file
+        return json.dumps({'lat': lat, 'lon': lon})
+
+
+def parse_location(value):
+    """Normalise a (lat, lon) tuple/list, {"lat", "lon"} dict or "lat,lon" string to a float tuple"""
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)) and len(value) == 2:
+        return (float(value[0]), float(value[1]))
+    if isinstance(value, dict) and 'lat' in value and 'lon' in value:
+        return (float(value['lat']), float(value['lon']))
+    if isinstance(value, str):
+        try:
+            parsed = json.loads(value)
+            if isinstance(parsed, (list, dict)):
+                return parse_location(parsed)
+        except json.JSONDecodeError:
+            pass
+        try:
+            lat, lon = map(float, value.split(','))
+            return (lat, lon)
+        except ValueError:
+            pass
+    raise ValidationError('Invalid location format. Use [lat, lon] or {"lat": lat, "lon": lon}')
+
+
+class PointField:
+    """
+    A geographical point exposed as a (lat, lon) tuple but stored in two
+    nullable double precision columns, `<name>_lat` and `<name>_lon`.
+
+    Storing plain floats means rows need no decoding when read and bounding
+    box filters (`location_lat__range=...`) can use a composite B-tree index
+    declared on the model's Meta. The attribute itself is a property, so
+    `Model(location=(lat, lon))`, `obj.location = {...}` and `obj.location`
+    behave as they did with LocationField.
+    """
+
+    def __init__(self, verbose_name=None):
+        self.verbose_name = verbose_name
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        self.name = name
+        self.lat_attname = f'{name}_lat'
+        self.lon_attname = f'{name}_lon'
+        label = self.verbose_name or name.replace('_', ' ')
+        cls.add_to_class(self.lat_attname, models.FloatField(f'{label} latitude', null=True, blank=True))
+        cls.add_to_class(self.lon_attname, models.FloatField(f'{label} longitude', null=True, blank=True))
+        setattr(cls, name, property(self._get, self._set))
+
+    def _get(self, instance):
+        lat = getattr(instance, self.lat_attname)
+        lon = getattr(instance, self.lon_attname)
+        if lat is None or lon is None:
+            return None
+        return (lat, lon)
+
+    def _set(self, instance, value):
+        point = parse_location(value)
+        lat, lon = point if point is not None else (None, None)
+        setattr(instance, self.lat_attname, lat)
+        setattr(instance, self.lon_attname, lon)
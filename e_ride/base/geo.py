@@ -0,0 +1,118 @@
+import math
+from typing import Any, Iterable
+
+import numpy as np
+
+# Radius of earth in kilometers
+EARTH_RADIUS_KM = 6371
+
+
+def lat_lon(coord: Any) -> tuple[float, float]:
+    """Extract (lat, lon) floats from a location given as a dict or a tuple/list"""
+    if isinstance(coord, dict):
+        return float(coord['lat']), float(coord['lon'])
+    return float(coord[0]), float(coord[1])
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great circle distance in kilometers between two points in decimal degrees"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * math.asin(math.sqrt(a)) * EARTH_RADIUS_KM
+
+
+def coord_array(coords: Iterable[Any]) -> np.ndarray:
+    """
+    Pack locations into a contiguous (N, 2) float64 array of (lat, lon) degrees.
+    Arrays that are already (N, 2) are passed through without copying.
+    """
+    if isinstance(coords, np.ndarray) and coords.ndim == 2 and coords.shape[1] == 2:
+        return np.ascontiguousarray(coords, dtype=np.float64)
+    points = [lat_lon(coord) for coord in coords]
+    if not points:
+        return np.empty((0, 2), dtype=np.float64)
+    return np.array(points, dtype=np.float64)
+
+
+def _haversine_radians(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    # Same formula as the scalar version so results agree to floating point noise
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * np.arcsin(np.sqrt(a)) * EARTH_RADIUS_KM
+
+
+def haversine_many(origin: Any, destinations: Iterable[Any]) -> np.ndarray:
+    """Distances in kilometers from one origin to each of N destinations, shape (N,)"""
+    lat1, lon1 = (math.radians(value) for value in lat_lon(origin))
+    points = np.radians(coord_array(destinations))
+    return _haversine_radians(lat1, lon1, points[:, 0], points[:, 1])
+
+
+def haversine_matrix(origins: Iterable[Any], destinations: Iterable[Any]) -> np.ndarray:
+    """Pairwise distances in kilometers between N origins and M destinations, shape (N, M)"""
+    src = np.radians(coord_array(origins))
+    dst = np.radians(coord_array(destinations))
+    return _haversine_radians(src[:, 0, None], src[:, 1, None], dst[None, :, 0], dst[None, :, 1])
+
+
+def bounding_box(origin: Any, distance_km: float) -> tuple[float, float, float, float]:
+    """
+    Return (min_lat, max_lat, min_lon, max_lon) of a box that contains every
+    point within `distance_km` of `origin`. Longitudes are normalised to
+    [-180, 180], so min_lon > max_lon means the box crosses the antimeridian.
+    """
+    lat, lon = lat_lon(origin)
+    lat_delta = math.degrees(distance_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = lat - lat_delta, lat + lat_delta
+    if min_lat <= -90 or max_lat >= 90:
+        # The circle reaches a pole, so every longitude is in range
+        return max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0
+
+    lon_delta = math.degrees(distance_km / (EARTH_RADIUS_KM * math.cos(math.radians(max(abs(min_lat), abs(max_lat))))))
+    if lon_delta >= 180:
+        return min_lat, max_lat, -180.0, 180.0
+    min_lon = (lon - lon_delta + 180) % 360 - 180
+    max_lon = (lon + lon_delta + 180) % 360 - 180
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def simplify_polyline(coords: Iterable[Any], tolerance_km: float) -> np.ndarray:
+    """
+    Indices of the points Douglas-Peucker keeps so that no dropped point is
+    more than `tolerance_km` from the simplified line. Points are projected
+    onto a flat plane around the first one, which is accurate to well under
+    a metre over a city. Each split measures every point of its span in one
+    vectorised step; spans are kept on a stack rather than by recursion, so
+    long tracks cannot exhaust the call stack.
+    """
+    points = coord_array(coords)
+    n = len(points)
+    if n < 3:
+        return np.arange(n)
+    km_per_deg = math.radians(EARTH_RADIUS_KM)
+    xy = np.empty((n, 2))
+    xy[:, 0] = (points[:, 1] - points[0, 1]) * km_per_deg * math.cos(math.radians(points[0, 0]))
+    xy[:, 1] = (points[:, 0] - points[0, 0]) * km_per_deg
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    spans = [(0, n - 1)]
+    while spans:
+        first, last = spans.pop()
+        if last - first < 2:
+            continue
+        start = xy[first]
+        direction = xy[last] - start
+        offsets = xy[first + 1:last] - start
+        length = math.hypot(direction[0], direction[1])
+        if length:
+            distances = np.abs(direction[0] * offsets[:, 1] - direction[1] * offsets[:, 0]) / length
+        else:
+            # The span returns to where it started; measure from that point
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance_km:
+            split = first + 1 + farthest
+            keep[split] = True
+            spans.append((first, split))
+            spans.append((split, last))
+    return np.flatnonzero(keep)
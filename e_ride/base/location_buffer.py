@@ -0,0 +1,181 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Hashable, Optional
+
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .geo import haversine, lat_lon
+from .worker import PeriodicWorker
+
+logger = logging.getLogger(__name__)
+
+# Sent with `locations`, {pk: (lat, lon)}, after a flush writes them; bulk_update sends no post_save
+locations_flushed = Signal()
+
+
+class DeadBand:
+    """
+    Decides whether a location update is worth persisting.
+
+    An update is written when the point has moved at least `min_distance_m`
+    metres from the last written position or `min_interval` seconds have
+    passed since that write; below both it is acknowledged but skipped.
+    Parked drivers and waiting clients then cost no writes at all while
+    still refreshing their row every `min_interval` seconds.
+    """
+
+    def __init__(self, min_distance_m: float = 10, min_interval: float = 30) -> None:
+        self.min_distance_m = min_distance_m
+        self.min_interval = min_interval
+        self.written = 0
+        self.skipped = 0
+
+    def should_write(
+        self,
+        previous: Any,
+        previous_at: Optional[datetime],
+        location: Any,
+        at: Optional[datetime] = None,
+    ) -> bool:
+        """Compare `location` at time `at` with the last written `previous` at `previous_at`"""
+        write = True
+        if previous and previous_at is not None:
+            at = at or timezone.now()
+            lat1, lon1 = lat_lon(previous)
+            lat2, lon2 = lat_lon(location)
+            moved_m = haversine(lat1, lon1, lat2, lon2) * 1000
+            elapsed = (at - previous_at).total_seconds()
+            write = moved_m >= self.min_distance_m or elapsed >= self.min_interval
+        if write:
+            self.written += 1
+        else:
+            self.skipped += 1
+        return write
+
+    def stats(self) -> dict[str, int]:
+        return {'written': self.written, 'skipped': self.skipped}
+
+
+class LocationWriteBuffer:
+    """
+    Write-behind buffer for high frequency location updates.
+
+    Pings are coalesced per instance in memory (the newest by `recorded_at`
+    wins) and written with a single bulk_update of the PointField columns
+    and `updated_at` every `flush_interval` seconds, or inline once
+    `max_pending` instances are waiting. With a `dead_band`, pings that
+    barely move from the last queued position are acknowledged and dropped. The attached model's in-memory
+    spatial index is moved immediately so nearest searches in this process
+    see the fresh position before the flush lands; each flush then sends
+    `locations_flushed` so caches keyed on position can be invalidated.
+
+    Attach it to a model like a manager:
+
+        class Driver(BaseProfile):
+            location_buffer = LocationWriteBuffer()
+    """
+
+    # Outcomes of add()
+    QUEUED = 'queued'
+    SKIPPED = 'skipped'
+    STALE = 'stale'
+
+    def __init__(
+        self,
+        flush_interval: float = 2.0,
+        max_pending: int = 5000,
+        batch_size: int = 1000,
+        background: bool = True,
+        dead_band: Optional[DeadBand] = None,
+    ) -> None:
+        self.dead_band = dead_band
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.background = background
+        self.model: Any = None
+        self._lock = threading.Lock()
+        self._pending: dict[Hashable, tuple[float, float, datetime]] = {}
+        # Last position queued per instance, the dead band's reference point
+        self._last: dict[Hashable, tuple[float, float, datetime]] = {}
+        self._worker = PeriodicWorker(self.flush, flush_interval, name='location-flush', on_stop=self.flush)
+        self.flushed = 0
+
+    def contribute_to_class(self, cls: Any, name: str) -> None:
+        self.model = cls
+        setattr(cls, name, self)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, pk: Hashable, location: Any, recorded_at: Optional[datetime] = None) -> str:
+        """
+        Queue a position for `pk`. Returns QUEUED, SKIPPED when it is inside
+        the dead band of the last queued position, or STALE when a newer ping
+        for the same instance has already been seen.
+        """
+        lat, lon = lat_lon(location)
+        recorded_at = recorded_at or timezone.now()
+        with self._lock:
+            last = self._last.get(pk)
+            if last is not None and last[2] > recorded_at:
+                return self.STALE
+            if self.dead_band is not None:
+                previous, previous_at = (last[:2], last[2]) if last is not None else (None, None)
+                if not self.dead_band.should_write(previous, previous_at, (lat, lon), recorded_at):
+                    return self.SKIPPED
+            self._pending[pk] = self._last[pk] = (lat, lon, recorded_at)
+            overflow = len(self._pending) >= self.max_pending
+
+        index = getattr(self.model, 'spatial_index', None)
+        if index is not None:
+            index.move(pk, (lat, lon))
+
+        if overflow:
+            self.flush()
+        elif self.background:
+            self._worker.ensure_running()
+        return self.QUEUED
+
+    def pending_location(self, pk: Hashable) -> Optional[tuple[float, float]]:
+        """Position waiting to be written for `pk`, if any"""
+        entry = self._pending.get(pk)
+        return (entry[0], entry[1]) if entry else None
+
+    def flush(self) -> int:
+        """Write every pending position; returns the number of rows updated"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        now = timezone.now()
+        objs = []
+        for pk, (lat, lon, _) in pending.items():
+            obj = self.model(pk=pk)
+            obj.location_lat, obj.location_lon, obj.updated_at = lat, lon, now
+            objs.append(obj)
+        try:
+            updated = self.model._default_manager.bulk_update(
+                objs, ['location_lat', 'location_lon', 'updated_at'], batch_size=self.batch_size
+            )
+        except Exception:
+            # Put the positions back unless newer pings arrived meanwhile, then let the caller see the error
+            with self._lock:
+                for pk, entry in pending.items():
+                    self._pending.setdefault(pk, entry)
+            raise
+        self.flushed += updated
+        locations_flushed.send(sender=self.model, locations={pk: (lat, lon) for pk, (lat, lon, _) in pending.items()})
+        return updated
+
+    def discard_pending(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            self._last.clear()
+
+    def stop(self) -> None:
+        """Stop the background thread and write whatever is still pending"""
+        self._worker.stop()
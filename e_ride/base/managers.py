@@ -1,5 +1,8 @@
 from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.hashers import make_password
+from django.db import models
+from django.db.models import Q
+from .geo import bounding_box
 
 class UserManager(BaseUserManager):
     use_in_migrations = True
@@ -37,4 +40,24 @@ class UserManager(BaseUserManager):
         
         email = self.normalize_email(email)
 
-        return self._create(email, password, username, **kwargs)  
\ No newline at end of file
+        return self._create(email, password, username, **kwargs)  
+
+class LocationQuerySet(models.QuerySet):
+
+    def within_box(self, point, distance_km, field='location'):
+        """
+        Filter to rows whose PointField `field` lies inside the lat/lon
+        bounding box around `point`. This is a cheap, index-backed superset
+        of the rows within `distance_km`; callers still need an exact
+        haversine check on what comes back.
+        """
+        min_lat, max_lat, min_lon, max_lon = bounding_box(point, distance_km)
+        queryset = self.filter(**{f'{field}_lat__range': (min_lat, max_lat)})
+        if min_lon <= max_lon:
+            return queryset.filter(**{f'{field}_lon__range': (min_lon, max_lon)})
+        # Box wraps around the antimeridian
+        return queryset.filter(Q(**{f'{field}_lon__gte': min_lon}) | Q(**{f'{field}_lon__lte': max_lon}))
+
+
+class LocationManager(models.Manager.from_queryset(LocationQuerySet)):
+    pass
@@ -1,6 +1,11 @@
-import math
+from itertools import islice
+from .geo import haversine, haversine_many, haversine_matrix, lat_lon
+from .routing import road_distance
+from .spatial import NearestHeap
 
 class LocationMixin:
+    # Rows fetched per round trip when scanning candidates from the database
+    nearest_chunk_size = 2000
 
     def distance(self, d_location):
         """Returns the distance between two LocationField points (in kilometers)"""
@@ -8,35 +13,36 @@ class LocationMixin:
         distance_in_km = self.haversine_distance(self.location, d_location)
         return distance_in_km  # Return in kilometers
 
+    def driving_distance(self, d_location):
+        """
+        Road distance in kilometers to `d_location` when a road graph is
+        configured (ROAD_GRAPH_PATH), falling back to the straight line
+        """
+        return road_distance(self.location, d_location)
+
     def haversine_distance(self, coord1, coord2):
         """
         Calculate the great circle distance between two points 
         on the earth (specified in decimal degrees)
         Returns distance in kilometers
         """
-        # Helper to extract lat/lon from either dict or tuple/list
-        def extract_lat_lon(coord):
-            if isinstance(coord, dict):
-                return float(coord['lat']), float(coord['lon'])
-            return float(coord[0]), float(coord[1])
-            
-        # Convert decimal degrees to radians
-        lat1, lon1 = extract_lat_lon(coord1)
-        lat2, lon2 = extract_lat_lon(coord2)
-        
-        # Convert to radians
-        lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-
-        # Haversine formula
-        dlat = lat2 - lat1 
-        dlon = lon2 - lon1 
-        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-        c = 2 * math.asin(math.sqrt(a)) 
-        
-        # Radius of earth in kilometers
-        r = 6371
-        
-        return c * r
+        lat1, lon1 = lat_lon(coord1)
+        lat2, lon2 = lat_lon(coord2)
+        return haversine(lat1, lon1, lat2, lon2)
+
+    def haversine_many(self, origin, destinations):
+        """
+        Distances in kilometers from `origin` to every point in `destinations`,
+        computed in a single vectorized pass. Returns a numpy array of shape (N,).
+        """
+        return haversine_many(origin, destinations)
+
+    def haversine_matrix(self, origins, destinations):
+        """
+        Pairwise distances in kilometers between N origins and M destinations.
+        Returns a numpy array of shape (N, M).
+        """
+        return haversine_matrix(origins, destinations)
 
     def distance_to(self, other_instance):
         """Calculate distance to another instance that has a location field"""
@@ -60,23 +66,56 @@ class LocationMixin:
         if not self.location:
             return []
 
-        instances = model_class.objects.all()
+        index = getattr(model_class, 'spatial_index', None)
+        if index is not None and index.enabled:
+            return self._find_nearest_indexed(model_class, index, limit, max_distance_km)
+
+        # Let the database discard everything outside the bounding box first
+        instances = model_class.objects.within_box(self.location, max_distance_km)
 
         # Filter to only ONLINE instances for models with availability_status
         if hasattr(model_class, 'availability_status'):
             instances = instances.filter(availability_status='ONLINE')
 
-        results = []
-        for instance in instances:
-            # Skip instances without a location or self
-            if not instance.location:
-                continue
-            if hasattr(instance, 'pk') and hasattr(self, 'pk') and instance.pk == self.pk:
-                continue
+        # Skip self
+        if getattr(self, 'pk', None) is not None:
+            instances = instances.exclude(pk=self.pk)
+
+        # Stream only the coordinates in chunks, keeping the best `limit` in a bounded heap
+        best = NearestHeap(limit)
+        rows = instances.values_list('pk', 'location_lat', 'location_lon').iterator(chunk_size=self.nearest_chunk_size)
+        for chunk in iter(lambda: list(islice(rows, self.nearest_chunk_size)), []):
+            distances = self.haversine_many(self.location, [(lat, lon) for _, lat, lon in chunk])
+            best.push_many([pk for pk, _, _ in chunk], distances, max_distance_km)
+
+        ranked = best.items()
+        if not ranked:
+            return []
+
+        # Load full rows for the winners only
+        found = model_class.objects.in_bulk([pk for pk, _ in ranked])
+        return [(found[pk], round(dist, 2)) for pk, dist in ranked if pk in found]
+
+    def _find_nearest_indexed(self, model_class, index, limit, max_distance_km):
+        """
+        Answer find_nearest_instances from the model's in-memory GridIndex.
+        Candidates are confirmed against the database in one query; entries
+        the database no longer agrees with (deleted rows, rolled back or
+        out-of-process status changes) are evicted and the lookup retried.
+        """
+        exclude = getattr(self, 'pk', None)
+        while True:
+            candidates = index.nearest(self.location, limit=limit, max_distance_km=max_distance_km, exclude=exclude)
+            if not candidates:
+                return []
 
-            dist = self.haversine_distance(self.location, instance.location)
-            if dist <= max_distance_km:
-                results.append((instance, round(dist, 2)))
+            queryset = model_class.objects.filter(pk__in=[pk for pk, _ in candidates])
+            if index.status_field and index.active_status is not None:
+                queryset = queryset.filter(**{index.status_field: index.active_status})
+            instances = queryset.in_bulk()
 
-        results.sort(key=lambda x: x[1])
-        return results[:limit]
\ No newline at end of file
+            stale = [pk for pk, _ in candidates if pk not in instances]
+            for pk in stale:
+                index.discard(pk)
+            if not stale:
+                return [(instances[pk], round(dist, 2)) for pk, dist in candidates]
@@ -3,8 +3,8 @@ from django.contrib.auth.models import PermissionsMixin
 from django.contrib.auth.base_user import AbstractBaseUser
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
-from .managers import UserManager
-from .fields import LocationField
+from .managers import UserManager, LocationManager
+from .fields import PointField
 from .mixins import LocationMixin
 import uuid
 from cloudinary.models import CloudinaryField
@@ -48,10 +48,15 @@ class BaseProfile(BaseModel, LocationMixin):
     last_name = models.CharField(_('last name'), max_length=50, blank=False, null=False)
     profile_img = CloudinaryField('image')
     gender = models.CharField(max_length=52, choices = [(choice.name, choice.value) for choice in GenderChoices])
-    location = LocationField()  # Current location field
+    location = PointField()  # Current location, stored as location_lat/location_lon
+
+    objects = LocationManager()
 
     class Meta:
         abstract = True
+        indexes = [
+            models.Index(fields=['location_lat', 'location_lon'], name='%(app_label)s_%(class)s_loc_idx'),
+        ]
     
     
     def get_full_name(self):
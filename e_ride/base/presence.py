@@ -0,0 +1,243 @@
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Hashable, Optional
+
+from django.db import connection
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .worker import PeriodicWorker
+
+logger = logging.getLogger(__name__)
+
+# Sent with `pks` after a sweep takes instances offline
+presence_expired = Signal()
+
+
+class PresenceTracker:
+    """
+    Heartbeat liveness for model instances that sit in an active status.
+
+    Each heartbeat records a last-seen time and pushes a deadline onto a
+    min-heap; a sweep every `sweep_interval` seconds pops the deadlines that
+    have passed (skipping ones superseded by a later heartbeat), drops those
+    instances from the model's spatial index straight away, and takes them
+    offline in the database with one conditional UPDATE per batch of keys.
+    Nothing scans the table.
+
+    Presence is per process, like the spatial index. So that a process never
+    takes offline an instance whose heartbeats go to another one, last-seen
+    times are written back to `seen_field` (at most every third of the TTL
+    per instance), and the UPDATE only matches rows whose stored last-seen
+    time is also past the TTL. Instances it leaves alone are re-indexed and
+    tracked from their stored time. Indexed instances that have never sent
+    a heartbeat here are given one TTL of grace.
+
+    Attach it to a model like a manager:
+
+        class Driver(BaseProfile):
+            presence = PresenceTracker(status_field='availability_status', active_status='ONLINE', offline_status='OFFLINE')
+    """
+
+    def __init__(
+        self,
+        ttl: float = 90.0,
+        sweep_interval: float = 5.0,
+        status_field: str = 'status',
+        active_status: str = 'ONLINE',
+        offline_status: str = 'OFFLINE',
+        seen_field: str = 'last_seen_at',
+        batch_size: int = 500,
+        background: bool = True,
+    ) -> None:
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.status_field = status_field
+        self.active_status = active_status
+        self.offline_status = offline_status
+        self.seen_field = seen_field
+        self.batch_size = batch_size
+        self.background = background
+        self.model: Any = None
+        self._lock = threading.Lock()
+        self._seen: dict[Hashable, datetime] = {}
+        self._heap: list[tuple[datetime, int, Hashable]] = []
+        # Tie-breaker so the heap never compares primary keys
+        self._counter = 0
+        self._persisted: dict[Hashable, datetime] = {}
+        self._dirty: dict[Hashable, datetime] = {}
+        self._worker = PeriodicWorker(self.sweep, sweep_interval, name='presence-sweep', on_stop=self.flush_seen)
+        self.expired = 0
+
+    def contribute_to_class(self, cls: Any, name: str) -> None:
+        self.model = cls
+        setattr(cls, name, self)
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def _track(self, pk: Hashable, seen_at: datetime) -> None:
+        self._seen[pk] = seen_at
+        self._counter += 1
+        heapq.heappush(self._heap, (seen_at + timedelta(seconds=self.ttl), self._counter, pk))
+        # Superseded deadlines are skipped lazily; rebuild once they dominate the heap
+        if len(self._heap) > 4 * len(self._seen) + 64:
+            self._heap = [
+                (seen + timedelta(seconds=self.ttl), i, key) for i, (key, seen) in enumerate(self._seen.items())
+            ]
+            heapq.heapify(self._heap)
+            self._counter = len(self._heap)
+
+    def heartbeat(self, pk: Hashable, at: Optional[datetime] = None) -> None:
+        """Record that `pk` is alive as of `at` (now by default)"""
+        at = at or timezone.now()
+        with self._lock:
+            previous = self._seen.get(pk)
+            if previous is not None and previous >= at:
+                return
+            self._track(pk, at)
+            persisted = self._persisted.get(pk)
+            if persisted is None or (at - persisted).total_seconds() >= self.ttl / 3:
+                self._dirty[pk] = at
+        if self.background:
+            self._worker.ensure_running()
+
+    def last_seen(self, pk: Hashable) -> Optional[datetime]:
+        return self._seen.get(pk)
+
+    def is_alive(self, pk: Hashable, now: Optional[datetime] = None) -> bool:
+        seen = self._seen.get(pk)
+        return seen is not None and ((now or timezone.now()) - seen).total_seconds() < self.ttl
+
+    def _index(self) -> Any:
+        return getattr(self.model, 'spatial_index', None)
+
+    def _pop_expired(self, now: datetime) -> list[Hashable]:
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, _, pk = heapq.heappop(self._heap)
+                seen = self._seen.get(pk)
+                # A later heartbeat pushed a later deadline; this one is stale
+                if seen is None or seen + timedelta(seconds=self.ttl) != deadline:
+                    continue
+                del self._seen[pk]
+                self._persisted.pop(pk, None)
+                self._dirty.pop(pk, None)
+                expired.append(pk)
+        return expired
+
+    def _adopt_untracked(self, now: datetime) -> None:
+        index = self._index()
+        if index is None:
+            return
+        indexed = index.keys()
+        with self._lock:
+            for pk in indexed - self._seen.keys():
+                self._track(pk, now)
+
+    def flush_seen(self) -> int:
+        """Write pending last-seen times; returns the number of rows updated"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return 0
+        objs = []
+        for pk, seen in dirty.items():
+            obj = self.model(pk=pk)
+            setattr(obj, self.seen_field, seen)
+            objs.append(obj)
+        try:
+            updated = self.model._default_manager.bulk_update(objs, [self.seen_field], batch_size=self.batch_size)
+        except Exception:
+            with self._lock:
+                for pk, seen in dirty.items():
+                    self._dirty.setdefault(pk, seen)
+            raise
+        with self._lock:
+            for pk, seen in dirty.items():
+                if pk in self._seen:
+                    self._persisted[pk] = seen
+        return updated
+
+    def _take_offline(self, pks: list[Hashable], now: datetime) -> set:
+        """Conditionally flip `pks` to offline; returns the keys that actually changed"""
+        meta = self.model._meta
+        quote = connection.ops.quote_name
+        pk_field = meta.pk
+        status = quote(meta.get_field(self.status_field).column)
+        seen = quote(meta.get_field(self.seen_field).column)
+        updated_at = meta.get_field('updated_at')
+        cutoff = now - timedelta(seconds=self.ttl)
+        changed = set()
+        for start in range(0, len(pks), self.batch_size):
+            batch = pks[start:start + self.batch_size]
+            placeholders = ', '.join(['%s'] * len(batch))
+            sql = (
+                f'UPDATE {quote(meta.db_table)} SET {status} = %s, {quote(updated_at.column)} = %s '
+                f'WHERE {quote(pk_field.column)} IN ({placeholders}) AND {status} = %s '
+                f'AND ({seen} IS NULL OR {seen} < %s) RETURNING {quote(pk_field.column)}'
+            )
+            params = [
+                self.offline_status,
+                updated_at.get_db_prep_value(now, connection),
+                *(pk_field.get_db_prep_value(pk, connection) for pk in batch),
+                self.active_status,
+                meta.get_field(self.seen_field).get_db_prep_value(cutoff, connection),
+            ]
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                changed.update(pk_field.to_python(row[0]) for row in cursor.fetchall())
+        return changed
+
+    def _restore(self, pks: list[Hashable], now: datetime) -> None:
+        """Re-index and re-track instances another process has seen recently"""
+        rows = self.model._default_manager.filter(
+            pk__in=pks, **{self.status_field: self.active_status}
+        ).values_list('pk', 'location_lat', 'location_lon', self.seen_field)
+        index = self._index()
+        with self._lock:
+            for pk, lat, lon, seen in rows:
+                if seen is None or (now - seen).total_seconds() >= self.ttl:
+                    continue
+                if pk not in self._seen:
+                    self._track(pk, seen)
+                    self._persisted[pk] = seen
+                if index is not None and lat is not None:
+                    index.update(pk, (lat, lon), self.active_status)
+
+    def sweep(self, now: Optional[datetime] = None) -> list[Hashable]:
+        """Expire everything past its deadline; returns the keys taken offline"""
+        now = now or timezone.now()
+        self._adopt_untracked(now)
+        self.flush_seen()
+        expired = self._pop_expired(now)
+        if not expired:
+            return []
+
+        index = self._index()
+        if index is not None:
+            # Out of the searchable set first; the database follows below
+            for pk in expired:
+                index.discard(pk)
+        changed = self._take_offline(expired, now)
+        kept = [pk for pk in expired if pk not in changed]
+        if kept:
+            self._restore(kept, now)
+        self.expired += len(changed)
+        if changed:
+            presence_expired.send(sender=self.model, pks=list(changed))
+        return list(changed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._seen.clear()
+            self._heap.clear()
+            self._persisted.clear()
+            self._dirty.clear()
+
+    def stop(self) -> None:
+        """Stop the background thread and write pending last-seen times"""
+        self._worker.stop()
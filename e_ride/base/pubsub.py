@@ -0,0 +1,114 @@
+import asyncio
+import threading
+from collections import defaultdict
+from typing import Any, Optional
+
+# Marks a subscription that has not received anything yet
+_EMPTY = object()
+
+
+class Subscription:
+    """
+    Interest in one channel, used as an async context manager. Enter it
+    before reading the current state so a message published in between is
+    not lost.
+
+    Only the latest message is kept: a slow reader skips intermediate ones
+    instead of queueing them, which suits state like positions and versions
+    where only the newest value matters.
+    """
+
+    def __init__(self, broker: 'LocalBroker', channel: str) -> None:
+        self.broker = broker
+        self.channel = channel
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._event: Optional[asyncio.Event] = None
+        self._message: Any = _EMPTY
+
+    async def __aenter__(self) -> 'Subscription':
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+        self.broker._add(self)
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.broker._remove(self)
+
+    def notify(self, message: Any = None) -> None:
+        # Publishers run on worker threads; hand the message to the reader's loop
+        try:
+            self._loop.call_soon_threadsafe(self._set, message)
+        except RuntimeError:
+            # The loop has already shut down
+            pass
+
+    def _set(self, message: Any) -> None:
+        self._message = message
+        self._event.set()
+
+    @property
+    def ready(self) -> bool:
+        """Whether a message has arrived since the last `take()`"""
+        return self._event.is_set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait for a message; False if `timeout` seconds pass first"""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def take(self) -> Any:
+        """The latest message, marking it read"""
+        self._event.clear()
+        message, self._message = self._message, _EMPTY
+        return None if message is _EMPTY else message
+
+
+class LocalBroker:
+    """
+    In-memory publish/subscribe between worker threads and async readers.
+
+    Readers only hold an asyncio.Event and the latest message, so thousands
+    of open subscriptions cost a few objects each and no threads. Messages
+    published in another process are not seen here; a shared backend (e.g.
+    Redis pub/sub or Postgres LISTEN/NOTIFY) can subclass this, send
+    `publish` to the other processes and call `deliver` when a message
+    arrives.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subscriptions: dict[str, set[Subscription]] = defaultdict(set)
+
+    def subscribe(self, channel: Any) -> Subscription:
+        return Subscription(self, str(channel))
+
+    def _add(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions[subscription.channel].add(subscription)
+
+    def _remove(self, subscription: Subscription) -> None:
+        with self._lock:
+            waiting = self._subscriptions.get(subscription.channel)
+            if waiting is not None:
+                waiting.discard(subscription)
+                if not waiting:
+                    del self._subscriptions[subscription.channel]
+
+    def waiting(self, channel: Any) -> int:
+        """Number of readers subscribed to `channel`"""
+        with self._lock:
+            return len(self._subscriptions.get(str(channel), ()))
+
+    def deliver(self, channel: Any, message: Any = None) -> None:
+        """Hand `message` to every reader subscribed to `channel` in this process"""
+        with self._lock:
+            waiting = list(self._subscriptions.get(str(channel), ()))
+        for subscription in waiting:
+            subscription.notify(message)
+
+    def publish(self, channel: Any, message: Any = None) -> None:
+        """Send `message` to the readers of `channel`"""
+        self.deliver(channel, message)
@@ -0,0 +1,292 @@
+import heapq
+import json
+import math
+import threading
+from pathlib import Path
+from typing import Any, Iterable, Optional, Sequence
+
+import numpy as np
+
+from .geo import coord_array, haversine, haversine_many, lat_lon
+from .spatial import KM_PER_DEGREE, geocell
+
+# Key packing for the snapping grid: rows and columns are offset to stay positive
+_CELL_OFFSET = 1 << 20
+_CELL_STRIDE = 1 << 21
+
+ARRAYS = (
+    'node_lat', 'node_lon',
+    'offsets', 'targets', 'weights',
+    'rev_offsets', 'rev_targets', 'rev_weights',
+    'landmarks_from', 'landmarks_to',
+    'cell_keys', 'cell_nodes',
+)
+
+
+def _cell_keys(lat: np.ndarray, lon: np.ndarray, cell_deg: float) -> np.ndarray:
+    rows = np.floor(lat / cell_deg).astype(np.int64) + _CELL_OFFSET
+    cols = np.floor(lon / cell_deg).astype(np.int64) + _CELL_OFFSET
+    return rows * _CELL_STRIDE + cols
+
+
+def _csr(n: int, sources: np.ndarray, targets: np.ndarray, weights: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    order = np.argsort(sources, kind='stable')
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n), out=offsets[1:])
+    return offsets, targets[order].astype(np.int32), weights[order].astype(np.float32)
+
+
+def dijkstra(
+    offsets: Sequence[int],
+    targets: Sequence[int],
+    weights: Sequence[float],
+    source: int,
+    stop_at: Optional[set[int]] = None,
+    max_distance: float = math.inf,
+) -> dict[int, float]:
+    """
+    Shortest distances from `source` over a CSR graph. Stops early once every
+    node in `stop_at` is settled or the frontier passes `max_distance`.
+    """
+    settled: dict[int, float] = {}
+    remaining = set(stop_at) if stop_at is not None else None
+    heap = [(0.0, source)]
+    while heap:
+        dist, node = heapq.heappop(heap)
+        if node in settled:
+            continue
+        if dist > max_distance:
+            break
+        settled[node] = dist
+        if remaining is not None:
+            remaining.discard(node)
+            if not remaining:
+                break
+        start, end = offsets[node], offsets[node + 1]
+        for target, weight in zip(targets[start:end].tolist(), weights[start:end].tolist()):
+            if target not in settled:
+                heapq.heappush(heap, (dist + weight, target))
+    return settled
+
+
+def _full_dijkstra(offsets: np.ndarray, targets: np.ndarray, weights: np.ndarray, source: int) -> np.ndarray:
+    distances = np.full(len(offsets) - 1, np.inf, dtype=np.float64)
+    for node, dist in dijkstra(offsets, targets, weights, source).items():
+        distances[node] = dist
+    return distances
+
+
+def build_graph(
+    nodes: Iterable[tuple[float, float]],
+    edges: Iterable[tuple[int, int, float]],
+    path: Any,
+    landmarks: int = 16,
+    cell_deg: float = 0.005,
+) -> None:
+    """
+    Preprocess a road graph into `path`.
+
+    `nodes` are (lat, lon) pairs indexed from 0 and `edges` directed
+    (source, target, metres) triples; add both directions for two-way roads.
+    Writes forward and reverse CSR adjacency, a sorted cell index for
+    snapping, and distances to and from `landmarks` nodes picked by
+    farthest-point selection for the ALT heuristic.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    coords = np.asarray(list(nodes), dtype=np.float64).reshape(-1, 2)
+    edge_array = np.asarray(list(edges), dtype=np.float64).reshape(-1, 3)
+    n = len(coords)
+    sources = edge_array[:, 0].astype(np.int64)
+    dests = edge_array[:, 1].astype(np.int64)
+    lengths = edge_array[:, 2]
+
+    offsets, targets, weights = _csr(n, sources, dests, lengths)
+    rev_offsets, rev_targets, rev_weights = _csr(n, dests, sources, lengths)
+
+    # Farthest-point landmarks: each new one is the node worst served by those chosen so far
+    count = min(landmarks, n)
+    landmarks_from = np.zeros((n, count), dtype=np.float32)
+    landmarks_to = np.zeros((n, count), dtype=np.float32)
+    nearest = np.full(n, np.inf)
+    landmark = 0
+    for i in range(count):
+        from_l = _full_dijkstra(offsets, targets, weights, landmark)
+        to_l = _full_dijkstra(rev_offsets, rev_targets, rev_weights, landmark)
+        landmarks_from[:, i] = from_l
+        landmarks_to[:, i] = to_l
+        nearest = np.minimum(nearest, np.where(np.isfinite(from_l), from_l, -1))
+        nearest[landmark] = -1
+        landmark = int(np.argmax(nearest))
+
+    cell_keys = _cell_keys(coords[:, 0], coords[:, 1], cell_deg)
+    cell_nodes = np.argsort(cell_keys, kind='stable').astype(np.int32)
+
+    arrays = {
+        'node_lat': coords[:, 0], 'node_lon': coords[:, 1],
+        'offsets': offsets, 'targets': targets, 'weights': weights,
+        'rev_offsets': rev_offsets, 'rev_targets': rev_targets, 'rev_weights': rev_weights,
+        'landmarks_from': landmarks_from, 'landmarks_to': landmarks_to,
+        'cell_keys': cell_keys[cell_nodes], 'cell_nodes': cell_nodes,
+    }
+    for name, array in arrays.items():
+        np.save(path / f'{name}.npy', array)
+    (path / 'meta.json').write_text(json.dumps({'nodes': n, 'edges': len(edge_array), 'landmarks': count, 'cell_deg': cell_deg}))
+
+
+class RoadGraph:
+    """
+    Driving distances over a preprocessed road graph (see `build_graph`).
+
+    Arrays are memory-mapped, so loading is instant and the pages are shared
+    between worker processes. Point-to-point queries run A* with landmark
+    (ALT) lower bounds, which keeps the search close to the shortest path;
+    `distances_to` runs one bounded reverse Dijkstra from a destination to
+    reach many origins at once, e.g. every candidate driver for a pickup.
+
+    Locations are snapped to the nearest graph node within `snap_km`; the
+    straight-line legs to and from the snapped nodes are added to the
+    result. Anything that cannot be snapped or routed gives None / inf so
+    callers can fall back to haversine.
+    """
+
+    def __init__(self, path: Any, snap_km: float = 1.0) -> None:
+        self.path = Path(path)
+        self.snap_km = snap_km
+        self.meta = json.loads((self.path / 'meta.json').read_text())
+        self.cell_deg = self.meta['cell_deg']
+        for name in ARRAYS:
+            # Plain ndarray views over the mapping skip np.memmap's per-slice bookkeeping
+            setattr(self, name, np.load(self.path / f'{name}.npy', mmap_mode='r').view(np.ndarray))
+
+    def __len__(self) -> int:
+        return self.meta['nodes']
+
+    def snap(self, location: Any) -> Optional[tuple[int, float]]:
+        """Nearest node to `location` and its distance in km, if within `snap_km`"""
+        lat, lon = lat_lon(location)
+        row, col = geocell((lat, lon), self.cell_deg)
+        rings = int(math.ceil(self.snap_km / (self.cell_deg * KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01)))) + 1
+        candidates = []
+        for d_row in range(-rings, rings + 1):
+            # Columns are contiguous within a row of cells, so each row is one range lookup
+            low = (row + d_row + _CELL_OFFSET) * _CELL_STRIDE + col - rings + _CELL_OFFSET
+            high = low + 2 * rings + 1
+            start, end = np.searchsorted(self.cell_keys, [low, high])
+            if end > start:
+                candidates.append(self.cell_nodes[start:end])
+        if not candidates:
+            return None
+        nodes = np.concatenate(candidates)
+        distances = haversine_many((lat, lon), np.column_stack([self.node_lat[nodes], self.node_lon[nodes]]))
+        best = int(np.argmin(distances))
+        if distances[best] > self.snap_km:
+            return None
+        return int(nodes[best]), float(distances[best])
+
+    def _heuristic(self, node: int, target_from: np.ndarray, target_to: np.ndarray) -> float:
+        # d(v, t) >= d(l, t) - d(l, v) and d(v, t) >= d(v, l) - d(t, l) for every landmark l
+        bounds = np.concatenate([target_from - self.landmarks_from[node], self.landmarks_to[node] - target_to])
+        # fmax skips the NaNs left by landmarks that reach neither node
+        bound = float(np.fmax.reduce(bounds))
+        if math.isnan(bound):
+            return 0.0
+        if math.isinf(bound):
+            # A landmark reaches one node but not the other: the target is unreachable from here
+            return math.inf if bound > 0 else 0.0
+        # Shave float32 rounding so the bound stays below the true distance
+        return max(0.0, bound - 0.5)
+
+    def node_distance(self, source: int, target: int) -> float:
+        """Shortest driving distance in metres between two nodes (A* with ALT), inf if unreachable"""
+        if source == target:
+            return 0.0
+        target_from = np.asarray(self.landmarks_from[target], dtype=np.float64)
+        target_to = np.asarray(self.landmarks_to[target], dtype=np.float64)
+        start_h = self._heuristic(source, target_from, target_to)
+        if math.isinf(start_h):
+            return math.inf
+        best = {source: 0.0}
+        closed: set[int] = set()
+        heap = [(start_h, 0.0, source)]
+        while heap:
+            _, dist, node = heapq.heappop(heap)
+            if node == target:
+                return dist
+            if node in closed:
+                continue
+            closed.add(node)
+            start, end = self.offsets[node], self.offsets[node + 1]
+            for neighbour, weight in zip(self.targets[start:end].tolist(), self.weights[start:end].tolist()):
+                candidate = dist + weight
+                if neighbour in closed or candidate >= best.get(neighbour, math.inf):
+                    continue
+                best[neighbour] = candidate
+                estimate = self._heuristic(neighbour, target_from, target_to)
+                if not math.isinf(estimate):
+                    heapq.heappush(heap, (candidate + estimate, candidate, neighbour))
+        return math.inf
+
+    def distance(self, origin: Any, destination: Any) -> Optional[float]:
+        """Driving distance in km between two locations, or None when either is off the graph or unreachable"""
+        start = self.snap(origin)
+        end = self.snap(destination)
+        if start is None or end is None:
+            return None
+        metres = self.node_distance(start[0], end[0])
+        if math.isinf(metres):
+            return None
+        return metres / 1000 + start[1] + end[1]
+
+    def distances_to(self, origins: Any, destination: Any, max_km: float = math.inf) -> np.ndarray:
+        """
+        Driving distance in km from each of `origins` to `destination`, with
+        inf for origins that are off the graph, unreachable or beyond `max_km`.
+        One reverse Dijkstra from the destination serves all origins.
+        """
+        points = coord_array(origins)
+        result = np.full(len(points), np.inf)
+        end = self.snap(destination)
+        if end is None or not len(points):
+            return result
+        snapped = [self.snap(point) for point in points.tolist()]
+        wanted = {s[0] for s in snapped if s is not None}
+        settled = dijkstra(
+            self.rev_offsets, self.rev_targets, self.rev_weights, end[0],
+            stop_at=wanted, max_distance=max_km * 1000,
+        )
+        for i, snap in enumerate(snapped):
+            if snap is not None and snap[0] in settled:
+                result[i] = settled[snap[0]] / 1000 + snap[1] + end[1]
+        return result
+
+
+_graph: Optional[RoadGraph] = None
+_graph_lock = threading.Lock()
+
+
+def get_road_graph() -> Optional[RoadGraph]:
+    """The graph configured by ROAD_GRAPH_PATH, loaded on first use; None when routing is not set up"""
+    global _graph
+    from django.conf import settings
+
+    path = getattr(settings, 'ROAD_GRAPH_PATH', '')
+    if not path:
+        return None
+    if _graph is None or _graph.path != Path(path):
+        with _graph_lock:
+            if _graph is None or _graph.path != Path(path):
+                _graph = RoadGraph(path, snap_km=settings.ROAD_GRAPH_SNAP_KM)
+    return _graph
+
+
+def road_distance(origin: Any, destination: Any) -> float:
+    """Driving distance in km when a road graph is configured and covers both points, haversine otherwise"""
+    graph = get_road_graph()
+    if graph is not None:
+        distance = graph.distance(origin, destination)
+        if distance is not None:
+            return distance
+    lat1, lon1 = lat_lon(origin)
+    lat2, lon2 = lat_lon(destination)
+    return haversine(lat1, lon1, lat2, lon2)
@@ -0,0 +1,281 @@
+import heapq
+import math
+import threading
+import time
+from typing import Any, Hashable, Iterable, Optional
+
+import numpy as np
+from django.db.models.signals import post_delete, post_save
+
+from .geo import EARTH_RADIUS_KM, haversine_many, lat_lon
+
+# Kilometres spanned by one degree of latitude
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+
+
+def geocell(location: Any, cell_deg: float) -> tuple[int, int]:
+    """Quantize a location to the (row, col) of its cell in a fixed lat/lon grid"""
+    lat, lon = lat_lon(location)
+    return math.floor(lat / cell_deg), math.floor(lon / cell_deg)
+
+
+def cell_center(cell: tuple[int, int], cell_deg: float) -> tuple[float, float]:
+    """(lat, lon) of the middle of a grid cell"""
+    return (cell[0] + 0.5) * cell_deg, (cell[1] + 0.5) * cell_deg
+
+
+class NearestHeap:
+    """
+    Bounded max-heap that keeps the `limit` closest items pushed into it.
+
+    Memory stays O(limit) however many candidates are offered and each push
+    costs O(log limit). Items at equal distance keep their arrival order, so
+    the result is identical to a stable sort of every candidate sliced to
+    `limit`.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self._heap: list[tuple[float, int, Any]] = []
+        self._seen = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    @property
+    def full(self) -> bool:
+        return len(self._heap) >= self.limit
+
+    @property
+    def worst(self) -> float:
+        """Distance of the furthest item kept, or infinity while not yet full"""
+        return -self._heap[0][0] if self.full else math.inf
+
+    def push(self, item: Any, distance: float) -> None:
+        if self.limit <= 0:
+            return
+        self._seen += 1
+        # Negated arrival order makes the latest of equally distant items the first to go
+        entry = (-distance, -self._seen, item)
+        if len(self._heap) < self.limit:
+            heapq.heappush(self._heap, entry)
+        elif distance < -self._heap[0][0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def push_many(self, items: Iterable[Any], distances: Iterable[float], max_distance: float = math.inf) -> None:
+        for item, distance in zip(items, distances):
+            if distance <= max_distance:
+                self.push(item, float(distance))
+
+    def items(self) -> list[tuple[Any, float]]:
+        """(item, distance) pairs, closest first"""
+        return [(item, -neg) for neg, _, item in sorted(self._heap, key=lambda entry: (-entry[0], -entry[1]))]
+
+
+class GridIndex:
+    """
+    Process-local spatial index of model instances bucketed into fixed
+    lat/lon grid cells.
+
+    Only instances whose status is `active_status` are searchable, so a
+    nearest lookup expands ring by ring around the caller's cell and stops
+    as soon as no unvisited cell can hold a closer point. The index is kept
+    current by post_save/post_delete signals on the model it is attached to,
+    and fully reloaded from the database every `refresh_seconds` so updates
+    made by other processes (or by queryset.update) are eventually picked up.
+
+    Usage, on a model with a `location` PointField:
+
+        class Driver(BaseProfile):
+            spatial_index = GridIndex(status_field='availability_status', active_status='ONLINE')
+    """
+
+    def __init__(
+        self,
+        cell_deg: float = 0.01,
+        refresh_seconds: float = 60.0,
+        status_field: Optional[str] = None,
+        active_status: Optional[str] = None,
+        enabled: bool = True,
+    ) -> None:
+        self.cell_deg = cell_deg
+        self.refresh_seconds = refresh_seconds
+        self.status_field = status_field
+        self.active_status = active_status
+        self.enabled = enabled
+        self.model: Any = None
+        self._lock = threading.RLock()
+        self._cells: dict[tuple[int, int], set] = {}
+        self._entries: dict[Hashable, tuple[float, float, Optional[str]]] = {}
+        self._loaded_at: Optional[float] = None
+
+    def contribute_to_class(self, cls: Any, name: str) -> None:
+        """Attach to a model class and subscribe to its save/delete signals"""
+        self.model = cls
+        setattr(cls, name, self)
+        post_save.connect(self._on_save, sender=cls, weak=False)
+        post_delete.connect(self._on_delete, sender=cls, weak=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, pk: Hashable) -> bool:
+        return pk in self._entries
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return geocell((lat, lon), self.cell_deg)
+
+    def _is_active(self, status: Optional[str]) -> bool:
+        return self.active_status is None or status == self.active_status
+
+    def update(self, pk: Hashable, location: Any, status: Optional[str] = None) -> None:
+        """Insert, move or drop a single entry depending on its location and status"""
+        with self._lock:
+            self._remove(pk)
+            if not location or not self._is_active(status):
+                return
+            lat, lon = lat_lon(location)
+            self._entries[pk] = (lat, lon, status)
+            self._cells.setdefault(self._cell(lat, lon), set()).add(pk)
+
+    def position(self, pk: Hashable) -> Optional[tuple[float, float]]:
+        """Last known (lat, lon) of an indexed entry"""
+        entry = self._entries.get(pk)
+        return (entry[0], entry[1]) if entry else None
+
+    def move(self, pk: Hashable, location: Any) -> None:
+        """Reposition an entry that is already indexed, keeping its status"""
+        with self._lock:
+            entry = self._entries.get(pk)
+            if entry is not None:
+                self.update(pk, location, entry[2])
+
+    def discard(self, pk: Hashable) -> None:
+        """Remove an entry if present"""
+        with self._lock:
+            self._remove(pk)
+
+    def _remove(self, pk: Hashable) -> None:
+        entry = self._entries.pop(pk, None)
+        if entry is None:
+            return
+        key = self._cell(entry[0], entry[1])
+        bucket = self._cells.get(key)
+        if bucket is not None:
+            bucket.discard(pk)
+            if not bucket:
+                del self._cells[key]
+
+    def keys(self) -> set:
+        """Primary keys of every indexed entry"""
+        with self._lock:
+            return set(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cells.clear()
+            self._entries.clear()
+            self._loaded_at = None
+
+    def rebuild(self, rows: Optional[Iterable[tuple[Hashable, Any, Optional[str]]]] = None) -> None:
+        """
+        Replace the whole index with `rows` of (pk, location, status).
+        When no rows are given they are loaded from the attached model.
+        """
+        if rows is None:
+            rows = self._load_rows()
+        with self._lock:
+            self._cells.clear()
+            self._entries.clear()
+            for pk, location, status in rows:
+                self.update(pk, location, status)
+            self._loaded_at = time.monotonic()
+
+    def _load_rows(self) -> list[tuple[Hashable, Any, Optional[str]]]:
+        queryset = self.model._default_manager.exclude(location_lat=None).exclude(location_lon=None)
+        status = None
+        if self.status_field and self.active_status is not None:
+            queryset = queryset.filter(**{self.status_field: self.active_status})
+            status = self.active_status
+        return [
+            (pk, (lat, lon), status)
+            for pk, lat, lon in queryset.values_list('pk', 'location_lat', 'location_lon')
+        ]
+
+    def ensure_fresh(self) -> None:
+        """Reload from the database on first use and after `refresh_seconds`"""
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.refresh_seconds:
+            self.rebuild()
+
+    def _on_save(self, sender: Any, instance: Any, **kwargs: Any) -> None:
+        status = getattr(instance, self.status_field) if self.status_field else None
+        self.update(instance.pk, instance.location, status)
+
+    def _on_delete(self, sender: Any, instance: Any, **kwargs: Any) -> None:
+        self.discard(instance.pk)
+
+    def _ring(self, row: int, col: int, ring: int, lat_rings: int, lon_rings: int) -> Iterable[tuple[int, int]]:
+        """Cells whose Chebyshev distance from (row, col) is exactly `ring`, clipped to the search box"""
+        if ring == 0:
+            yield row, col
+            return
+        for d_row in range(-min(ring, lat_rings), min(ring, lat_rings) + 1):
+            if abs(d_row) == ring:
+                d_cols: Iterable[int] = range(-min(ring, lon_rings), min(ring, lon_rings) + 1)
+            elif ring <= lon_rings:
+                d_cols = (-ring, ring)
+            else:
+                continue
+            for d_col in d_cols:
+                yield row + d_row, col + d_col
+
+    def nearest(
+        self,
+        location: Any,
+        limit: int = 5,
+        max_distance_km: float = 50,
+        exclude: Optional[Hashable] = None,
+    ) -> list[tuple[Hashable, float]]:
+        """
+        Return up to `limit` (pk, distance_km) pairs within `max_distance_km`
+        of `location`, closest first.
+        """
+        if not location or limit <= 0:
+            return []
+        self.ensure_fresh()
+        lat, lon = lat_lon(location)
+
+        with self._lock:
+            row, col = self._cell(lat, lon)
+            cell_km = self.cell_deg * KM_PER_DEGREE
+            # Longitude cells narrow towards the poles; size the box using the widest latitude it reaches
+            edge_lat = min(abs(lat) + max_distance_km / KM_PER_DEGREE, 89.0)
+            cell_lon_km = cell_km * math.cos(math.radians(edge_lat))
+            lat_rings = math.ceil(max_distance_km / cell_km)
+            lon_rings = math.ceil(max_distance_km / cell_lon_km)
+            min_cell_km = min(cell_km, cell_lon_km)
+
+            best = NearestHeap(limit)
+            for ring in range(max(lat_rings, lon_rings) + 1):
+                perimeter = 8 * ring if ring else 1
+                if perimeter > len(self._cells):
+                    # Sparse index: cheaper to walk the occupied cells than the ring
+                    cells = [
+                        key for key in self._cells
+                        if max(abs(key[0] - row), abs(key[1] - col)) == ring
+                        and abs(key[0] - row) <= lat_rings and abs(key[1] - col) <= lon_rings
+                    ]
+                else:
+                    cells = list(self._ring(row, col, ring, lat_rings, lon_rings))
+
+                pks = [pk for key in cells for pk in self._cells.get(key, ()) if pk != exclude]
+                if pks:
+                    points = np.array([self._entries[pk][:2] for pk in pks], dtype=np.float64)
+                    best.push_many(pks, haversine_many((lat, lon), points), max_distance_km)
+
+                # Anything outside the rings visited so far is at least `ring` cells away
+                if best.worst <= ring * min_cell_km:
+                    break
+
+        return best.items()
@@ -0,0 +1,87 @@
+from typing import Hashable, Iterator
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel: `slots` buckets of `tick_seconds` each, covering
+    `horizon` seconds ahead of the current tick.
+
+    A key due at time t is filed in the bucket for its tick by modulo, so
+    `add` and `discard` are O(1), and `advance` only visits the buckets time
+    has moved past, emptying each in one go. The cost of a tick is one
+    bucket plus the keys that fall due, however many keys are waiting.
+    Times further out than the horizon are refused; callers keep those
+    elsewhere and add them once the wheel has turned far enough. Times
+    already past are filed in the current tick and fire on the next
+    `advance`.
+
+    Times are plain seconds (e.g. Unix timestamps). Not thread-safe.
+    """
+
+    def __init__(self, tick_seconds: float = 1.0, slots: int = 3600, start: float = 0.0) -> None:
+        self.tick_seconds = tick_seconds
+        self.slots = slots
+        self._buckets: list[dict[Hashable, float]] = [{} for _ in range(slots)]
+        self._ticks: dict[Hashable, int] = {}
+        # First tick that has not fired yet
+        self._tick = int(start // tick_seconds)
+
+    def __len__(self) -> int:
+        return len(self._ticks)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._ticks
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self._ticks)
+
+    @property
+    def horizon(self) -> float:
+        return self.slots * self.tick_seconds
+
+    @property
+    def now(self) -> float:
+        """Start of the first tick that has not fired"""
+        return self._tick * self.tick_seconds
+
+    @property
+    def until(self) -> float:
+        """Due times before this fit in the wheel"""
+        return (self._tick + self.slots) * self.tick_seconds
+
+    def add(self, key: Hashable, due: float) -> bool:
+        """File `key` to fire at `due`, replacing any earlier time; False if beyond the horizon"""
+        tick = max(int(due // self.tick_seconds), self._tick)
+        if tick >= self._tick + self.slots:
+            return False
+        self.discard(key)
+        self._buckets[tick % self.slots][key] = due
+        self._ticks[key] = tick
+        return True
+
+    def discard(self, key: Hashable) -> None:
+        tick = self._ticks.pop(key, None)
+        if tick is not None:
+            del self._buckets[tick % self.slots][key]
+
+    def advance(self, now: float) -> list[Hashable]:
+        """Fire every tick up to and including the one `now` falls in; returns their keys, earliest first"""
+        target = int(now // self.tick_seconds)
+        if target < self._tick:
+            return []
+        fired: list[Hashable] = []
+        # Every key sits less than one turn ahead, so a long pause still visits each bucket at most once
+        for tick in range(self._tick, min(target + 1, self._tick + self.slots)):
+            bucket = self._buckets[tick % self.slots]
+            if bucket:
+                fired.extend(sorted(bucket, key=bucket.__getitem__))
+                for key in bucket:
+                    del self._ticks[key]
+                bucket.clear()
+        self._tick = target + 1
+        return fired
+
+    def clear(self) -> None:
+        for bucket in self._buckets:
+            bucket.clear()
+        self._ticks.clear()
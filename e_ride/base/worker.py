@@ -0,0 +1,77 @@
+import atexit
+import logging
+import threading
+from typing import Any, Callable, Optional
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicWorker:
+    """
+    Calls `task` every `interval` seconds on a named daemon thread.
+
+    The thread is started on the first `ensure_running` call and restarted
+    if it has died. A failing run is logged and the loop carries on, and the
+    thread's database connection is closed after each run so that a broken
+    or idle connection is not held between runs. `stop` is registered with
+    atexit; it ends the loop, waits for a run in progress, and then calls
+    `on_stop` once (e.g. to write what is still buffered).
+
+        self._worker = PeriodicWorker(self.flush, interval=2.0, name='location-flush', on_stop=self.flush)
+    """
+
+    def __init__(
+        self,
+        task: Callable[[], Any],
+        interval: float,
+        name: str,
+        on_stop: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        self.task = task
+        self.interval = interval
+        self.name = name
+        self.on_stop = on_stop
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._atexit_registered = False
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def ensure_running(self) -> None:
+        if self.is_running():
+            return
+        with self._lock:
+            if self.is_running():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.stop)
+                self._atexit_registered = True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.task()
+            except Exception:
+                logger.exception('Background task %s failed', self.name)
+            finally:
+                close_old_connections()
+
+    def stop(self) -> None:
+        """Stop the thread, then run `on_stop` if one was given"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+        if self.on_stop is None:
+            return
+        try:
+            self.on_stop()
+        except Exception:
+            logger.exception('Background task %s failed on shutdown', self.name)
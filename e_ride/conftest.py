@@ -34,4 +34,85 @@ def dummy_image():
     def create_img(img_name):
         content = b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x02\x00\x00\x00\x90?\x0b\xfc\x00\x00\x00\x0dIDATx\x9cc``\x00\x00\x00\x02\x00\x01\xf5\x00\x01\x05\x03\x02\xd5z\x9b\x00\x00\x00\x00IEND\xaeB`\x82'
         return SimpleUploadedFile(img_name, content, content_type='image/jpeg')
-    return create_img
\ No newline at end of file
+    return create_img
+
+@pytest.fixture
+def make_driver(django_user_model):
+    # Other Driver fields (first_name, price_per_km, ...) override the defaults below
+    from apps.Accounts.models import Driver, UserRole
+
+    def _make(username='driver', location=(6.5250, 3.3790), availability='ONLINE', **fields):
+        role, _ = UserRole.objects.get_or_create(name='DRIVER')
+        user = django_user_model.objects.create_user(
+            username=username, email=f'{username}@test.com', password='testpass123', is_active=True, role=role
+        )
+        fields = {'first_name': username, 'last_name': 'Driver', 'nin': 1234567890, 'car_type': 'Sedan',
+                  'plate_number': f'ABC-{username}', 'price_per_km': 100, **fields}
+        return Driver.objects.create(user=user, availability_status=availability, location=location, **fields)
+    return _make
+
+@pytest.fixture
+def make_client(django_user_model):
+    from apps.Accounts.models import Client, UserRole
+
+    def _make(username='client', location=(6.5244, 3.3792), **fields):
+        role, _ = UserRole.objects.get_or_create(name='CLIENT')
+        user = django_user_model.objects.create_user(
+            username=username, email=f'{username}@test.com', password='testpass123', is_active=True, role=role
+        )
+        fields = {'first_name': username, 'last_name': 'Client', **fields}
+        return Client.objects.create(user=user, location=location, **fields)
+    return _make
+
+@pytest.fixture
+def api_for():
+    def _api(user):
+        api = APIClient()
+        api.force_authenticate(user=user)
+        return api
+    return _api
+
+@pytest.fixture
+def ride_setup(request, make_driver, make_client, api_for):
+    # A REQUESTED ride with an assigned driver; parametrise indirectly with a dict to override the defaults below
+    from apps.Rides.models import Ride
+    options = {
+        'driver_location': (6.5250, 3.3790), 'pickup': (6.5244, 3.3792), 'dropoff': (6.55, 3.40),
+        **getattr(request, 'param', {}),
+    }
+    driver = make_driver('ride_driver', options['driver_location'])
+    client = make_client('ride_client', options['pickup'])
+    ride = Ride.objects.create(
+        driver=driver, client=client, pickup_location=options['pickup'], dropoff_location=options['dropoff']
+    )
+    return {
+        'driver': driver, 'client': client, 'ride': ride, 'driver_user': driver.user, 'client_user': client.user,
+        'driver_api': api_for(driver.user), 'client_api': api_for(client.user),
+    }
+
+@pytest.fixture(autouse=True)
+def reset_driver_state():
+    # The driver grid index, location buffer, presence tracker, speed grid, surge counters, ride scheduler and
+    # track buffer are process-local and outlive each test's rolled back transaction
+    from apps.Accounts.models import Driver
+    from apps.Rides.eta import speed_grid
+    from apps.Rides.scheduling import ride_scheduler
+    from apps.Rides.surge import surge_pricing
+    from apps.Rides.tracks import ride_tracks
+    Driver.spatial_index.clear()
+    Driver.location_buffer.background = False
+    ride_tracks.background = False
+    Driver.presence.background = False
+    Driver.presence.clear()
+    speed_grid.clear()
+    surge_pricing.background = False
+    surge_pricing.clear()
+    ride_scheduler.reset()
+    yield
+    Driver.location_buffer.discard_pending()
+    ride_tracks.discard_pending()
+    Driver.spatial_index.clear()
+    Driver.presence.clear()
+    speed_grid.clear()
+    surge_pricing.clear()
+    ride_scheduler.reset()
@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
+
+Serve it with an ASGI server (e.g. ``uvicorn e_ride.asgi:application``) so
+async views such as the ride long-poll hold requests on the event loop
+instead of a worker thread each.
 """
 
 import os
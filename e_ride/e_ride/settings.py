@@ -204,6 +204,141 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 #Base url
 BASE_URL = config("BASE_URL")
 
+# Nearest driver search
+# Grid cell size in degrees (~1.1 km at the equator) and how often the
+# per-process index is reloaded from the database to pick up outside changes
+DRIVER_SPATIAL_INDEX = config('DRIVER_SPATIAL_INDEX', default=True, cast=bool)
+DRIVER_INDEX_CELL_DEG = config('DRIVER_INDEX_CELL_DEG', default=0.01, cast=float)
+DRIVER_INDEX_REFRESH_SECONDS = config('DRIVER_INDEX_REFRESH_SECONDS', default=60, cast=float)
+
+# Driver GPS pings are buffered per process and bulk written on this interval,
+# or as soon as this many drivers have a position waiting
+DRIVER_LOCATION_FLUSH_SECONDS = config('DRIVER_LOCATION_FLUSH_SECONDS', default=2, cast=float)
+DRIVER_LOCATION_MAX_PENDING = config('DRIVER_LOCATION_MAX_PENDING', default=5000, cast=int)
+
+# Driver presence
+# ONLINE drivers with no heartbeat or GPS ping for DRIVER_PRESENCE_TTL_SECONDS
+# leave the search index and are set OFFLINE; expiry is checked on this sweep interval
+DRIVER_PRESENCE_TTL_SECONDS = config('DRIVER_PRESENCE_TTL_SECONDS', default=90, cast=float)
+DRIVER_PRESENCE_SWEEP_SECONDS = config('DRIVER_PRESENCE_SWEEP_SECONDS', default=5, cast=float)
+
+# Location updates that move less than this many metres and arrive sooner than
+# this many seconds after the last written one are acknowledged but not saved
+LOCATION_DEAD_BAND_METRES = config('LOCATION_DEAD_BAND_METRES', default=10, cast=float)
+LOCATION_DEAD_BAND_SECONDS = config('LOCATION_DEAD_BAND_SECONDS', default=30, cast=float)
+
+# Ride tracks
+# GPS pings of STARTED rides are kept as breadcrumbs, RIDE_TRACK_CHUNK_POINTS
+# to a packed chunk; a partial chunk is written once RIDE_TRACK_MAX_AGE_SECONDS old
+RIDE_TRACK_CHUNK_POINTS = config('RIDE_TRACK_CHUNK_POINTS', default=64, cast=int)
+RIDE_TRACK_MAX_AGE_SECONDS = config('RIDE_TRACK_MAX_AGE_SECONDS', default=60, cast=float)
+RIDE_TRACK_FLUSH_SECONDS = config('RIDE_TRACK_FLUSH_SECONDS', default=5, cast=float)
+# At completion, fixes implying more than RIDE_TRACK_MAX_SPEED_KMH are dropped
+# and the rest simplified to within RIDE_ROUTE_TOLERANCE_METRES, which smooths
+# out GPS jitter; the simplified route gives the charged distance
+RIDE_TRACK_MAX_SPEED_KMH = config('RIDE_TRACK_MAX_SPEED_KMH', default=160, cast=float)
+RIDE_ROUTE_TOLERANCE_METRES = config('RIDE_ROUTE_TOLERANCE_METRES', default=15, cast=float)
+# The fare follows the track only when it starts and ends within
+# RIDE_TRACK_ENDPOINT_KM of the pickup and dropoff and is at least
+# RIDE_TRACK_MIN_COVERAGE of the quoted distance; otherwise the quote stands
+RIDE_TRACK_ENDPOINT_KM = config('RIDE_TRACK_ENDPOINT_KM', default=0.5, cast=float)
+RIDE_TRACK_MIN_COVERAGE = config('RIDE_TRACK_MIN_COVERAGE', default=0.5, cast=float)
+
+# Caching
+# Local memory by default (tests, single process); set REDIS_URL in production
+# so every worker shares one cache (requires the redis package)
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Nearest driver responses are cached per geocell (~550 m) for a few seconds
+NEAREST_CACHE_ALIAS = config('NEAREST_CACHE_ALIAS', default='default')
+NEAREST_CACHE_CELL_DEG = config('NEAREST_CACHE_CELL_DEG', default=0.005, cast=float)
+NEAREST_CACHE_TTL = config('NEAREST_CACHE_TTL', default=15, cast=float)
+
+# Ride dispatch
+# Rides requested without a driver are collected for this many seconds and
+# matched to ONLINE drivers in one batch; batches up to DISPATCH_OPTIMAL_MAX
+# are solved exactly, larger ones approximately
+DISPATCH_WINDOW_SECONDS = config('DISPATCH_WINDOW_SECONDS', default=2, cast=float)
+DISPATCH_OPTIMAL_MAX = config('DISPATCH_OPTIMAL_MAX', default=500, cast=int)
+DISPATCH_MAX_PICKUP_KM = config('DISPATCH_MAX_PICKUP_KM', default=10, cast=float)
+
+# Ride request expiry
+# REQUESTED rides older than RIDE_REQUEST_TIMEOUT_SECONDS are set EXPIRED in
+# batches, by `manage.py expire_rides` or, with RIDE_EXPIRY_IN_PROCESS, by a
+# background thread in each web process
+RIDE_REQUEST_TIMEOUT_SECONDS = config('RIDE_REQUEST_TIMEOUT_SECONDS', default=300, cast=float)
+RIDE_EXPIRY_BATCH_SIZE = config('RIDE_EXPIRY_BATCH_SIZE', default=500, cast=int)
+RIDE_EXPIRY_INTERVAL_SECONDS = config('RIDE_EXPIRY_INTERVAL_SECONDS', default=30, cast=float)
+RIDE_EXPIRY_IN_PROCESS = config('RIDE_EXPIRY_IN_PROCESS', default=False, cast=bool)
+
+# Scheduled rides
+# Rides booked for later stay SCHEDULED until SCHEDULED_RIDE_LEAD_SECONDS
+# before pickup, when `manage.py dispatch_rides` hands them to matching.
+# Upcoming bookings are kept in a timer wheel of SCHEDULER_SLOTS ticks of
+# SCHEDULER_TICK_SECONDS (an hour ahead by default)
+SCHEDULED_RIDE_LEAD_SECONDS = config('SCHEDULED_RIDE_LEAD_SECONDS', default=900, cast=float)
+SCHEDULED_RIDE_MAX_DAYS = config('SCHEDULED_RIDE_MAX_DAYS', default=30, cast=int)
+SCHEDULER_TICK_SECONDS = config('SCHEDULER_TICK_SECONDS', default=1, cast=float)
+SCHEDULER_SLOTS = config('SCHEDULER_SLOTS', default=3600, cast=int)
+
+# ETA estimation
+# Average speeds are learned per geocell (~2.2 km) and hour of the week from
+# completed rides; slots with fewer samples fall back to coarser averages
+ETA_CELL_DEG = config('ETA_CELL_DEG', default=0.02, cast=float)
+ETA_DEFAULT_SPEED_KMH = config('ETA_DEFAULT_SPEED_KMH', default=25, cast=float)
+ETA_MIN_SAMPLES = config('ETA_MIN_SAMPLES', default=3, cast=int)
+ETA_REFRESH_SECONDS = config('ETA_REFRESH_SECONDS', default=300, cast=float)
+# `manage.py update_speed_grid` leaves rides completed in the last
+# ETA_INGEST_LAG_SECONDS for its next run, so none are still uncommitted
+ETA_INGEST_LAG_SECONDS = config('ETA_INGEST_LAG_SECONDS', default=120, cast=float)
+
+# Road routing
+# Directory written by `manage.py build_road_graph`; leave empty to use
+# straight-line distances. Points further than ROAD_GRAPH_SNAP_KM from any
+# road node also fall back to straight-line distance
+ROAD_GRAPH_PATH = config('ROAD_GRAPH_PATH', default='')
+ROAD_GRAPH_SNAP_KM = config('ROAD_GRAPH_SNAP_KM', default=1.0, cast=float)
+
+# Surge pricing
+# Ride requests and ONLINE drivers are counted per geocell over a rolling
+# window as they happen; multipliers are recomputed every SURGE_RECOMPUTE_SECONDS.
+# Both are counted in the SURGE_CACHE_ALIAS cache, so every worker sees them all
+SURGE_CELL_DEG = config('SURGE_CELL_DEG', default=0.02, cast=float)
+SURGE_CACHE_ALIAS = config('SURGE_CACHE_ALIAS', default='default')
+SURGE_WINDOW_SECONDS = config('SURGE_WINDOW_SECONDS', default=600, cast=float)
+SURGE_RECOMPUTE_SECONDS = config('SURGE_RECOMPUTE_SECONDS', default=30, cast=float)
+SURGE_SENSITIVITY = config('SURGE_SENSITIVITY', default=0.5, cast=float)
+SURGE_MAX_MULTIPLIER = config('SURGE_MAX_MULTIPLIER', default=3.0, cast=float)
+
+# Ride status long-polling
+# Waiters are woken by RIDE_NOTIFIER, a dotted path to a notifier class. The
+# in-process default only sees changes made by the same process; waits still
+# end with a fresh read after RIDE_WAIT_MAX_SECONDS
+RIDE_NOTIFIER = config('RIDE_NOTIFIER', default='apps.Rides.notify.LocalNotifier')
+RIDE_WAIT_DEFAULT_SECONDS = config('RIDE_WAIT_DEFAULT_SECONDS', default=25, cast=float)
+RIDE_WAIT_MAX_SECONDS = config('RIDE_WAIT_MAX_SECONDS', default=55, cast=float)
+
+# Live driver position streams
+# GPS pings are fanned out to open streams through DRIVER_POSITION_BROKER,
+# at most one event per DRIVER_STREAM_MIN_INTERVAL seconds per stream
+DRIVER_POSITION_BROKER = config('DRIVER_POSITION_BROKER', default='base.pubsub.LocalBroker')
+DRIVER_STREAM_MIN_INTERVAL = config('DRIVER_STREAM_MIN_INTERVAL', default=2.0, cast=float)
+DRIVER_STREAM_HEARTBEAT_SECONDS = config('DRIVER_STREAM_HEARTBEAT_SECONDS', default=15, cast=float)
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",  # React default
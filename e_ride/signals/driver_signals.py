@@ -0,0 +1,33 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.Accounts.models import Driver
+from apps.Rides.cache import nearest_driver_cache
+from apps.Rides.surge import surge_pricing
+from base.location_buffer import locations_flushed
+from base.presence import presence_expired
+
+@receiver(post_save, sender=Driver)
+def invalidate_nearest_on_save(sender, instance, **kwargs):
+    # Location or availability may have changed; drop cached nearest-driver lists around the driver
+    nearest_driver_cache.invalidate_driver(instance.pk, instance.location)
+
+@receiver(post_save, sender=Driver)
+def count_surge_supply_on_save(sender, instance, **kwargs):
+    # A driver saved ONLINE counts towards the surge supply of their cell
+    surge_pricing.record_driver(instance.pk, instance.location, instance.availability_status)
+
+@receiver(post_delete, sender=Driver)
+def invalidate_nearest_on_delete(sender, instance, **kwargs):
+    nearest_driver_cache.invalidate_driver(instance.pk, instance.location)
+
+@receiver(presence_expired, sender=Driver)
+def invalidate_nearest_on_expiry(sender, pks, **kwargs):
+    # Expired drivers were taken offline with a raw UPDATE, which sends no post_save
+    for pk in pks:
+        nearest_driver_cache.invalidate_driver(pk)
+
+@receiver(locations_flushed, sender=Driver)
+def invalidate_nearest_on_flush(sender, locations, **kwargs):
+    # Buffered pings are written with bulk_update, which sends no post_save
+    for pk, location in locations.items():
+        nearest_driver_cache.invalidate_driver(pk, location)
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from apps.Rides.models import Ride, RideEvent
+from apps.Rides.notify import publish_on_commit
+from apps.Rides.expiry import ride_expiry
+from apps.Rides.surge import surge_pricing
+
+@receiver(post_save, sender=Ride)
+def count_ride_request(sender, instance, created, **kwargs):
+    # Feeds the per-cell demand counter behind surge multipliers
+    if created and instance.status == 'REQUESTED':
+        surge_pricing.record_request(instance.pickup_location)
+        # Starts the in-process expiry sweeper when it is enabled
+        ride_expiry.ensure_running()
+
+@receiver(post_save, sender=RideEvent)
+def notify_ride_waiters(sender, instance, created, **kwargs):
+    # Wakes long-poll requests waiting on the ride once the change is committed
+    if created:
+        publish_on_commit([instance.ride_id])
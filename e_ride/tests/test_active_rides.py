@@ -0,0 +1,76 @@
+"""
+Query-count regression tests for the active rides listing on
+/rides/ride_request.
+"""
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from apps.Accounts.models import UserRole
+from apps.Rides.models import Ride
+
+
+@pytest.fixture
+def participants(make_driver, make_client):
+    driver = make_driver('active_driver', first_name='Active', plate_number='ACT-1')
+    client = make_client('active_client', first_name='Active')
+    return driver, client
+
+
+def make_rides(driver, client, count):
+    Ride.objects.bulk_create(
+        Ride(driver=driver, client=client, pickup_location=(6.5244, 3.3792), dropoff_location=(6.55, 3.40))
+        for _ in range(count)
+    )
+
+
+def count_queries(user):
+    api = APIClient()
+    # Fresh user each call so the role is not already cached on the instance
+    api.force_authenticate(user=type(user).objects.get(pk=user.pk))
+    with CaptureQueriesContext(connection) as ctx:
+        resp = api.get(reverse('ride requests'))
+    assert resp.status_code == 200, resp.content
+    return len(ctx.captured_queries), resp.json()['data']
+
+
+@pytest.mark.django_db
+class TestActiveRidesQueries:
+
+    @pytest.mark.parametrize('side', ['client', 'driver'])
+    def test_query_count_is_constant(self, participants, side):
+        driver, client = participants
+        user = (client if side == 'client' else driver).user
+
+        make_rides(driver, client, 1)
+        few, data = count_queries(user)
+        assert len(data) == 1
+
+        make_rides(driver, client, 20)
+        many, data = count_queries(user)
+        assert len(data) == 21
+        # Role, then rides joined with both profiles
+        assert few == many == 2
+
+    def test_compact_payload(self, participants):
+        driver, client = participants
+        make_rides(driver, client, 1)
+        _, data = count_queries(client.user)
+        ride = data[0]
+        assert ride['driver'] == {
+            'id': str(driver.id), 'first_name': 'Active', 'last_name': 'Driver',
+            'car_type': 'Sedan', 'plate_number': 'ACT-1', 'location': [6.525, 3.379],
+        }
+        assert ride['client'] == {'id': str(client.id), 'first_name': 'Active', 'last_name': 'Client'}
+        assert ride['pickup_location'] == [6.5244, 3.3792]
+
+    def test_missing_profile(self, participants, django_user_model):
+        role = UserRole.objects.get(name='CLIENT')
+        user = django_user_model.objects.create_user(
+            username='no_profile', email='no_profile@test.com', password='testpass123', is_active=True, role=role
+        )
+        api = APIClient()
+        api.force_authenticate(user=user)
+        resp = api.get(reverse('ride requests'))
+        assert resp.status_code == 404
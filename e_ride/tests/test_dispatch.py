@@ -0,0 +1,170 @@
+"""
+Tests for the batched dispatch engine: the assignment solvers on their own,
+then a dispatch tick against the database.
+"""
+import itertools
+import random
+import numpy as np
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from apps.Rides.dispatch import DispatchEngine, greedy_assignment, optimal_assignment
+
+
+def brute_force_cost(cost):
+    rows, cols = cost.shape
+    if rows <= cols:
+        return min(sum(cost[i, j] for i, j in enumerate(perm)) for perm in itertools.permutations(range(cols), rows))
+    return brute_force_cost(cost.T)
+
+
+class TestOptimalAssignment:
+
+    @pytest.mark.parametrize('shape', [(1, 1), (4, 4), (3, 6), (6, 3), (5, 5)])
+    def test_matches_brute_force(self, shape):
+        rng = np.random.default_rng(sum(shape))
+        for _ in range(5):
+            cost = rng.random(shape) * 10
+            pairs = optimal_assignment(cost)
+            assert len(pairs) == min(shape)
+            assert len({i for i, _ in pairs}) == len({j for _, j in pairs}) == min(shape)
+            assert sum(cost[i, j] for i, j in pairs) == pytest.approx(brute_force_cost(cost))
+
+    def test_empty(self):
+        assert optimal_assignment(np.zeros((0, 3))) == []
+
+    def test_beats_nearest_first(self):
+        # Ride 0 grabbing its nearest driver would leave ride 1 with a 10 km pickup
+        cost = np.array([[1.0, 2.0], [1.5, 10.0]])
+        assert optimal_assignment(cost) == [(0, 1), (1, 0)]
+
+
+class TestGreedyAssignment:
+
+    def test_valid_matching_within_radius(self):
+        rng = random.Random(5)
+        rides = np.array([(6.5 + rng.random() * 0.1, 3.3 + rng.random() * 0.1) for _ in range(200)])
+        drivers = np.array([(6.5 + rng.random() * 0.1, 3.3 + rng.random() * 0.1) for _ in range(150)])
+        pairs = greedy_assignment(rides, drivers, max_distance_km=50)
+        assert len(pairs) == 150
+        assert len({i for i, _, _ in pairs}) == len({j for _, j, _ in pairs}) == 150
+
+    def test_unreachable_rides_stay_unmatched(self):
+        pairs = greedy_assignment(np.array([(6.52, 3.38), (9.05, 7.49)]), np.array([(6.53, 3.38)]), max_distance_km=10)
+        assert [(i, j) for i, j, _ in pairs] == [(0, 0)]
+
+
+class TestDispatchEngineMatch:
+
+    def test_drops_pairs_beyond_max_pickup(self):
+        engine = DispatchEngine(max_pickup_km=5)
+        pairs, method = engine.match([(6.52, 3.38), (9.05, 7.49)], [(6.53, 3.38), (6.60, 3.40)])
+        assert method == 'optimal'
+        assert [(i, j) for i, j, _ in pairs] == [(0, 0)]
+
+    def test_large_batches_use_approximation(self):
+        engine = DispatchEngine(optimal_max=2)
+        pairs, method = engine.match([(6.52, 3.38)] * 3, [(6.53, 3.38)] * 3)
+        assert method == 'greedy'
+        assert len(pairs) == 3
+
+
+@pytest.mark.django_db
+class TestDispatchTick:
+
+    @pytest.fixture
+    def client_profile(self, make_client):
+        return make_client('dispatch_client')
+
+    def make_ride(self, client, pickup):
+        from apps.Rides.models import Ride
+
+        return Ride.objects.create(client=client, pickup_location=pickup, dropoff_location=(6.55, 3.40))
+
+    def test_assigns_globally_nearest(self, make_driver, client_profile):
+        near_a = make_driver('near_a', (6.5250, 3.3790))
+        near_b = make_driver('near_b', (6.6000, 3.4000))
+        ride_a = self.make_ride(client_profile, (6.5244, 3.3792))
+        ride_b = self.make_ride(client_profile, (6.5990, 3.3995))
+
+        result = DispatchEngine(max_pickup_km=10).tick()
+        assert (result.rides, result.drivers, result.assigned) == (2, 2, 2)
+
+        ride_a.refresh_from_db()
+        ride_b.refresh_from_db()
+        assert ride_a.driver_id == near_a.pk
+        assert ride_b.driver_id == near_b.pk
+        assert ride_a.price > 0
+
+    def test_assignment_touches_updated_at(self, make_driver, client_profile):
+        from datetime import timedelta
+        from django.utils import timezone
+        from apps.Rides.models import Ride
+
+        make_driver('touched', (6.5250, 3.3790))
+        ride = self.make_ride(client_profile, (6.5244, 3.3792))
+        stale = timezone.now() - timedelta(hours=1)
+        Ride.objects.filter(pk=ride.pk).update(updated_at=stale)
+
+        before = timezone.now()
+        DispatchEngine(max_pickup_km=10).tick()
+        ride.refresh_from_db()
+        assert ride.updated_at >= before
+        assert ride.events.get(kind='assigned').created_at == ride.updated_at
+
+    @pytest.mark.parametrize('change', ['offline', 'named', 'deleted'])
+    def test_drivers_are_rechecked_under_lock(self, make_driver, client_profile, change):
+        import uuid
+        from apps.Accounts.models import Driver
+        from apps.Rides.models import Ride
+
+        driver = make_driver('changing', (6.5250, 3.3790))
+        ride = self.make_ride(client_profile, (6.5244, 3.3792))
+        engine = DispatchEngine(max_pickup_km=10)
+        # The driver changes after being read as free, before the assignment is written
+        free = engine._free_drivers()
+        if change == 'offline':
+            Driver.objects.filter(pk=driver.pk).update(availability_status='OFFLINE')
+        elif change == 'named':
+            Ride.objects.create(client=client_profile, driver=driver, pickup_location=(6.53, 3.38), dropoff_location=(6.55, 3.40))
+        else:
+            free = [(uuid.uuid4(), lat, lon) for _, lat, lon in free]
+        engine._free_drivers = lambda: free
+
+        result = engine.tick()
+        assert result.assigned == 0
+        ride.refresh_from_db()
+        assert ride.driver_id is None
+
+    def test_skips_busy_and_offline_drivers(self, make_driver, client_profile):
+        make_driver('offline', (6.5250, 3.3790), availability='OFFLINE')
+        busy = make_driver('busy', (6.5250, 3.3791))
+        held = self.make_ride(client_profile, (6.5244, 3.3792))
+        held.driver = busy
+        held.save()
+        free = make_driver('free', (6.5400, 3.3900))
+        ride = self.make_ride(client_profile, (6.5244, 3.3792))
+
+        result = DispatchEngine(max_pickup_km=10).tick()
+        assert result.assigned == 1
+        ride.refresh_from_db()
+        assert ride.driver_id == free.pk
+
+    def test_request_without_driver_waits_for_dispatch(self, make_driver, client_profile):
+        from apps.Rides.models import Ride
+
+        driver = make_driver('waiting', (6.5250, 3.3790))
+        api = APIClient()
+        api.force_authenticate(user=client_profile.user)
+        resp = api.post(
+            reverse('ride requests'),
+            {'pickup_location': [6.5244, 3.3792], 'dropoff_location': [6.5500, 3.4000]},
+            format='json',
+        )
+        assert resp.status_code == 201, resp.content
+        ride = Ride.objects.get(pk=resp.json()['data']['id'])
+        assert ride.driver is None
+
+        DispatchEngine().tick()
+        ride.refresh_from_db()
+        assert ride.driver_id == driver.pk
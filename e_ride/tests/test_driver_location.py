@@ -0,0 +1,138 @@
+"""
+Tests for driver GPS ping ingestion through the write-behind location buffer,
+and the dead band that drops updates which barely move.
+"""
+import pytest
+from datetime import timedelta
+from django.urls import reverse
+from django.utils import timezone
+
+
+@pytest.fixture
+def driver_api(make_driver, api_for):
+    driver = make_driver('gps_driver', (6.5244, 3.3792))
+    return driver, api_for(driver.user)
+
+
+@pytest.mark.django_db
+class TestDriverLocationIngestion:
+
+    def test_single_ping_is_buffered_then_flushed(self, driver_api):
+        from apps.Accounts.models import Driver
+
+        driver, api = driver_api
+        resp = api.post(reverse('driver location'), {'lat': 6.6, 'lon': 3.4}, format='json')
+        assert resp.status_code == 202
+        assert resp.json()['data'] == {'received': 1, 'written': 1, 'skipped': 0}
+
+        # Not written yet, but visible to the in-memory search
+        assert Driver.objects.get(pk=driver.pk).location == (6.5244, 3.3792)
+        assert Driver.location_buffer.pending_location(driver.pk) == (6.6, 3.4)
+        assert Driver.spatial_index.position(driver.pk) == (6.6, 3.4)
+
+        assert Driver.location_buffer.flush() == 1
+        assert Driver.objects.get(pk=driver.pk).location == (6.6, 3.4)
+        assert len(Driver.location_buffer) == 0
+
+    def test_batch_is_coalesced_to_newest(self, driver_api):
+        from apps.Accounts.models import Driver
+
+        driver, api = driver_api
+        now = timezone.now()
+        pings = [
+            {'lat': 6.7, 'lon': 3.5, 'recorded_at': (now - timedelta(seconds=1)).isoformat()},
+            {'lat': 6.8, 'lon': 3.6, 'recorded_at': now.isoformat()},
+            {'lat': 6.6, 'lon': 3.4, 'recorded_at': (now - timedelta(seconds=2)).isoformat()},
+        ]
+        resp = api.post(reverse('driver location'), pings, format='json')
+        assert resp.status_code == 202
+        assert resp.json()['data']['received'] == 3
+
+        assert Driver.location_buffer.flush() == 1
+        assert Driver.objects.get(pk=driver.pk).location == (6.8, 3.6)
+
+    def test_stale_ping_is_dropped(self, driver_api):
+        from apps.Accounts.models import Driver
+
+        driver, _ = driver_api
+        now = timezone.now()
+        buffer = Driver.location_buffer
+        assert buffer.add(driver.pk, (6.8, 3.6), now) == buffer.QUEUED
+        assert buffer.add(driver.pk, (6.7, 3.5), now - timedelta(seconds=5)) == buffer.STALE
+        assert Driver.location_buffer.pending_location(driver.pk) == (6.8, 3.6)
+
+    def test_overflow_flushes_inline(self, driver_api, monkeypatch):
+        from apps.Accounts.models import Driver
+
+        driver, _ = driver_api
+        monkeypatch.setattr(Driver.location_buffer, 'max_pending', 1)
+        Driver.location_buffer.add(driver.pk, (6.9, 3.7))
+        assert len(Driver.location_buffer) == 0
+        assert Driver.objects.get(pk=driver.pk).location == (6.9, 3.7)
+
+    def test_invalid_ping(self, driver_api):
+        _, api = driver_api
+        resp = api.post(reverse('driver location'), {'lat': 123, 'lon': 3.4}, format='json')
+        assert resp.status_code == 400
+
+    def test_requires_driver_profile(self, create_user, api_for):
+        api = api_for(create_user(username='nodriver', email='nodriver@test.com', password='testpass123'))
+        resp = api.post(reverse('driver location'), {'lat': 6.6, 'lon': 3.4}, format='json')
+        assert resp.status_code == 404
+
+
+class TestDeadBand:
+
+    def test_first_update_is_written(self):
+        from base.location_buffer import DeadBand
+
+        assert DeadBand(10, 30).should_write(None, None, (6.5244, 3.3792))
+
+    def test_small_recent_move_is_skipped(self):
+        from base.location_buffer import DeadBand
+
+        band = DeadBand(10, 30)
+        now = timezone.now()
+        # ~3 m north, 5 s later
+        assert not band.should_write((6.5244, 3.3792), now, (6.52443, 3.3792), now + timedelta(seconds=5))
+        assert band.stats() == {'written': 0, 'skipped': 1}
+
+    def test_large_move_or_old_position_is_written(self):
+        from base.location_buffer import DeadBand
+
+        band = DeadBand(10, 30)
+        now = timezone.now()
+        assert band.should_write((6.5244, 3.3792), now, (6.5250, 3.3792), now + timedelta(seconds=5))
+        assert band.should_write((6.5244, 3.3792), now, (6.5244, 3.3792), now + timedelta(seconds=31))
+        assert band.stats() == {'written': 2, 'skipped': 0}
+
+
+@pytest.mark.django_db
+class TestDeadBandWrites:
+
+    def test_stationary_driver_pings_are_skipped(self, driver_api):
+        driver, api = driver_api
+        now = timezone.now()
+        pings = [
+            {'lat': 6.6, 'lon': 3.4, 'recorded_at': now.isoformat()},
+            {'lat': 6.60001, 'lon': 3.4, 'recorded_at': (now + timedelta(seconds=3)).isoformat()},
+            {'lat': 6.6, 'lon': 3.40001, 'recorded_at': (now + timedelta(seconds=6)).isoformat()},
+        ]
+        resp = api.post(reverse('driver location'), pings, format='json')
+        assert resp.json()['data'] == {'received': 3, 'written': 1, 'skipped': 2}
+
+    def test_client_put_skips_unmoved_location(self, make_client, api_for):
+        from apps.Accounts.models import Client
+
+        client_obj = make_client('db_client', location=None)
+        api = api_for(client_obj.user)
+        url = reverse('find rides')
+
+        resp = api.put(url, {'lon': 6.5244, 'lat': 3.3792}, format='json')
+        assert resp.status_code == 200
+        assert resp.json()['location_written'] is True
+        updated_at = Client.objects.get(pk=client_obj.pk).updated_at
+
+        resp = api.put(url, {'lon': 6.52441, 'lat': 3.3792}, format='json')
+        assert resp.json()['location_written'] is False
+        assert Client.objects.get(pk=client_obj.pk).updated_at == updated_at
@@ -0,0 +1,153 @@
+"""
+Tests for the Server-Sent Events stream of the driver's position during a
+ride, and the in-memory broker that fans positions out to it.
+"""
+import asyncio
+import json
+
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+from apps.Accounts.models import Driver
+from apps.Rides.notify import get_position_broker
+from apps.Rides.transitions import ACCEPT, COMPLETE, START, apply_transition
+from base.geo import haversine
+from base.pubsub import LocalBroker
+
+PICKUP = (6.5244, 3.3792)
+DROPOFF = (6.55, 3.40)
+
+
+@pytest.fixture(autouse=True)
+def unthrottled(settings):
+    settings.DRIVER_STREAM_MIN_INTERVAL = 0
+
+
+def stream_url(ride):
+    return reverse('ride-driver-position', kwargs={'ride_id': ride.id})
+
+
+def headers(user):
+    return {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+
+
+def parse(chunk):
+    text = chunk.decode() if isinstance(chunk, bytes) else chunk
+    if text.startswith(':'):
+        return 'comment', None
+    event, data = text.strip().split('\n')
+    return event.removeprefix('event: '), json.loads(data.removeprefix('data: '))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('ride_setup', [{'driver_location': (6.5300, 3.3800), 'pickup': PICKUP, 'dropoff': DROPOFF}], indirect=True)
+class TestDriverPositionStream:
+
+    def test_streams_positions_until_ride_ends(self, ride_setup, django_capture_on_commit_callbacks):
+        ride = ride_setup['ride']
+        apply_transition(ride.id, ride_setup['driver_user'], ACCEPT)
+        driver_api = ride_setup['driver_api']
+
+        def ping(lat, lon):
+            driver_api.post(reverse('driver location'), {'lat': lat, 'lon': lon}, format='json')
+
+        def change(transition):
+            with django_capture_on_commit_callbacks(execute=True):
+                apply_transition(ride.id, ride_setup['driver_user'], transition)
+
+        async def scenario():
+            resp = await AsyncClient().get(stream_url(ride), headers=headers(ride_setup['client_user']))
+            assert resp.status_code == 200
+            assert resp['Content-Type'] == 'text/event-stream'
+            events = aiter(resp.streaming_content)
+            seen = [parse(await asyncio.wait_for(anext(events), 5))]
+
+            await sync_to_async(ping)(6.5260, 3.3795)
+            seen.append(parse(await asyncio.wait_for(anext(events), 5)))
+            await sync_to_async(change)(START)
+            await sync_to_async(ping)(6.5300, 3.3850)
+            # The status change may or may not be read before the ping; skip to the next position
+            while (event := parse(await asyncio.wait_for(anext(events), 5)))[0] != 'position':
+                pass
+            seen.append(event)
+            await sync_to_async(change)(COMPLETE)
+            seen.append(parse(await asyncio.wait_for(anext(events), 5)))
+            await resp.streaming_content.aclose()
+            return seen
+
+        seen = async_to_sync(scenario)()
+        (first, initial), (_, moved), (_, started), last = seen
+        assert first == 'position'
+        assert (initial['lat'], initial['lon'], initial['status']) == (6.53, 3.38, 'ACCEPTED')
+        assert (moved['lat'], moved['lon']) == (6.526, 3.3795)
+        assert moved['distance_km'] < initial['distance_km']
+        assert moved['eta_seconds'] > 0
+        # Once started, distances are to the dropoff
+        assert started['status'] == 'STARTED'
+        assert started['distance_km'] == round(haversine(6.53, 3.385, *DROPOFF), 3)
+        assert last == ('end', {'status': 'COMPLETED'})
+        assert get_position_broker().waiting(ride_setup['driver'].id) == 0
+
+    def test_flushed_pings_still_reach_the_stream(self, ride_setup, monkeypatch):
+        ride = ride_setup['ride']
+        apply_transition(ride.id, ride_setup['driver_user'], ACCEPT)
+        # Every ping overflows the buffer and is written at once, leaving nothing pending
+        monkeypatch.setattr(Driver.location_buffer, 'max_pending', 1)
+        driver_api = ride_setup['driver_api']
+
+        def ping(lat, lon):
+            driver_api.post(reverse('driver location'), {'lat': lat, 'lon': lon}, format='json')
+
+        async def scenario():
+            resp = await AsyncClient().get(stream_url(ride), headers=headers(ride_setup['client_user']))
+            events = aiter(resp.streaming_content)
+            await asyncio.wait_for(anext(events), 5)
+            # A message without a position is skipped rather than ending the stream
+            get_position_broker().publish(ride_setup['driver'].id, None)
+            await sync_to_async(ping)(6.5260, 3.3795)
+            while (event := parse(await asyncio.wait_for(anext(events), 5)))[0] != 'position':
+                pass
+            await resp.streaming_content.aclose()
+            return event
+
+        _, moved = async_to_sync(scenario)()
+        assert Driver.location_buffer.pending_location(ride_setup['driver'].id) is None
+        assert (moved['lat'], moved['lon']) == (6.526, 3.3795)
+
+    def test_payload_needs_no_queries_once_speeds_are_loaded(self, ride_setup, django_assert_num_queries):
+        from apps.Rides.eta import speed_grid
+        from apps.Rides.streams import position_payload, ride_for_stream
+
+        ride = ride_for_stream(ride_setup['ride'].id)
+        ride['status'] = 'ACCEPTED'
+        speed_grid.ensure_fresh()
+        # Computed inline on the event loop, so it must not touch the database
+        with django_assert_num_queries(0):
+            payload = position_payload(ride, (6.53, 3.38))
+        assert payload['eta_seconds'] > 0
+
+    def test_only_active_rides_stream(self, ride_setup):
+        resp = async_to_sync(AsyncClient().get)(stream_url(ride_setup['ride']), headers=headers(ride_setup['client_user']))
+        assert resp.status_code == 400
+
+    def test_only_the_client_can_follow(self, ride_setup):
+        ride = ride_setup['ride']
+        apply_transition(ride.id, ride_setup['driver_user'], ACCEPT)
+        resp = async_to_sync(AsyncClient().get)(stream_url(ride), headers=headers(ride_setup['driver_user']))
+        assert resp.status_code == 403
+
+
+def test_broker_keeps_only_the_latest_message():
+    broker = LocalBroker()
+
+    async def scenario():
+        async with broker.subscribe('driver') as positions:
+            for i in range(3):
+                broker.publish('driver', i)
+            await positions.wait(1)
+            latest = positions.take()
+            return latest, positions.ready, await positions.wait(0.05)
+
+    assert async_to_sync(scenario)() == (2, False, False)
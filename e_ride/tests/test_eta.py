@@ -0,0 +1,117 @@
+"""
+Tests for the speed grid behind ride duration and pickup ETA estimates.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+import pytest
+from apps.Rides.eta import SpeedGrid, hour_of_week
+from base.geo import haversine
+from base.spatial import geocell
+
+# A Monday, 08:xx UTC -> hour of week 8
+MONDAY_8AM = datetime(2026, 10, 19, 8, 15, tzinfo=dt_timezone.utc)
+LAGOS = (6.5244, 3.3792)
+
+
+class TestSpeedGrid:
+
+    @pytest.fixture
+    def grid(self):
+        grid = SpeedGrid(cell_deg=0.02, default_kmh=25, min_samples=3)
+        row, col = geocell(LAGOS, 0.02)
+        grid.load([
+            (row, col, 8, 30.0, 2.0, 4),      # 15 km/h at 08:00 Monday
+            (row, col, 20, 40.0, 1.0, 1),     # too few samples on its own
+            (row + 5, col, 8, 10.0, 1.0, 3),  # another cell, 10 km/h
+        ])
+        return grid
+
+    def test_hour_of_week(self):
+        assert hour_of_week(MONDAY_8AM) == 8
+        assert hour_of_week(MONDAY_8AM + timedelta(days=6, hours=15)) == 167
+
+    def test_lookup_and_fallbacks(self, grid):
+        assert grid.speed(LAGOS, MONDAY_8AM) == pytest.approx(15)
+        # Sparse slot uses the cell's whole-week average: 70 km over 3 h
+        assert grid.speed(LAGOS, MONDAY_8AM + timedelta(hours=12)) == pytest.approx(70 / 3)
+        # Unknown cell uses the city-wide average for the hour: 40 km over 3 h
+        assert grid.speed((9.05, 7.49), MONDAY_8AM) == pytest.approx(40 / 3)
+        # Nothing known at all
+        assert grid.speed((9.05, 7.49), MONDAY_8AM + timedelta(hours=1)) == 25
+
+    def test_bulk_matches_single(self, grid):
+        origins = [LAGOS, (6.6244, 3.3792), (9.05, 7.49)]
+        destination = (6.55, 3.40)
+        bulk = grid.durations_to(origins, destination, MONDAY_8AM)
+        single = [grid.duration(origin, destination, MONDAY_8AM) for origin in origins]
+        assert list(bulk) == pytest.approx(single, rel=1e-5)
+
+
+@pytest.mark.django_db
+class TestSpeedGridIngest:
+
+    @pytest.fixture
+    def completed_ride(self, make_client):
+        from apps.Rides.models import Ride
+
+        client = make_client('eta_client', LAGOS)
+
+        def _make(minutes, started_at=MONDAY_8AM):
+            ride = Ride.objects.create(client=client, pickup_location=LAGOS, dropoff_location=(6.55, 3.40), status='COMPLETED')
+            Ride.objects.filter(pk=ride.pk).update(started_at=started_at, completed_at=started_at + timedelta(minutes=minutes))
+            return Ride.objects.get(pk=ride.pk)
+        return _make
+
+    def test_incremental_ingest(self, completed_ride):
+        from apps.Rides.models import SpeedCell
+
+        grid = SpeedGrid(cell_deg=0.02, min_samples=1)
+        for minutes in (10, 20):
+            completed_ride(minutes)
+        assert grid.ingest(now=MONDAY_8AM + timedelta(minutes=30)) == 2
+        assert grid.ingest(now=MONDAY_8AM + timedelta(minutes=40)) == 0
+
+        completed_ride(30, started_at=MONDAY_8AM + timedelta(hours=1))
+        assert grid.ingest(now=MONDAY_8AM + timedelta(hours=2)) == 1
+        cell = SpeedCell.objects.get(hour_of_week=8)
+        assert cell.samples == 2
+        assert cell.total_hours == pytest.approx(0.5)
+
+        km = haversine(*LAGOS, 6.55, 3.40)
+        assert grid.speed(LAGOS, MONDAY_8AM) == pytest.approx(km * 2 / 0.5)
+
+    def test_rides_committed_late_are_not_skipped(self, completed_ride):
+        from apps.Rides.models import SpeedCell
+
+        grid = SpeedGrid(cell_deg=0.02, min_samples=1, lag_seconds=120)
+        completed_ride(10)
+        completed_ride(20)
+        # Too recent to be sure every ride completed by then has committed
+        assert grid.ingest(now=MONDAY_8AM + timedelta(minutes=21)) == 1
+        assert SpeedCell.objects.get().last_sample_at == MONDAY_8AM + timedelta(minutes=19)
+
+        # Committed after that ingest, but completed before the newest ride it saw, or at the same moment
+        completed_ride(19.5)
+        completed_ride(20)
+        assert grid.ingest(now=MONDAY_8AM + timedelta(minutes=30)) == 3
+        assert grid.ingest(now=MONDAY_8AM + timedelta(minutes=40)) == 0
+        assert SpeedCell.objects.get().samples == 4
+
+    def test_ride_duration(self, completed_ride):
+        ride = completed_ride(12)
+        assert ride.ride_duration == 720
+        ride.completed_at = None
+        assert ride.ride_duration == pytest.approx(float(ride.distance_km) / 25 * 3600, rel=1e-3)
+
+    def test_nearest_drivers_carry_eta(self, django_user_model):
+        from django.core.cache import cache
+        from apps.Accounts.models import Driver
+        from apps.Rides.cache import nearest_driver_cache
+
+        cache.clear()
+        user = django_user_model.objects.create_user(username='eta_driver', email='eta_driver@test.com', password='testpass123')
+        Driver.objects.create(
+            user=user, first_name='Eta', last_name='Driver', nin=1234567890,
+            availability_status='ONLINE', location=(6.5300, 3.3800),
+        )
+        result = nearest_driver_cache.nearest(LAGOS)
+        assert result[0]['eta_seconds'] > 0
@@ -0,0 +1,95 @@
+"""
+Tests for /rides/quote, which prices a trip with every nearby driver
+without creating a ride.
+"""
+from decimal import Decimal
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+
+PICKUP = (6.5244, 3.3792)
+DROPOFF = (6.5500, 3.4000)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def client_profile(make_client):
+    return make_client('quote_client', PICKUP)
+
+
+@pytest.fixture
+def client_api(client_profile, api_for):
+    return api_for(client_profile.user)
+
+
+def test_fares_round_like_calculate_price():
+    from apps.Rides.quotes import fares
+
+    distance = Decimal('3.337')
+    prices = [Decimal('120.00'), '99.99', Decimal('0.15'), Decimal('1.50')]
+    multiplier = Decimal('1.30')
+    expected = [(distance * Decimal(str(p)) * multiplier).quantize(Decimal('0.01')) for p in prices]
+    assert fares(distance, prices, multiplier) == expected
+    # 0.005 exactly: half to even, as Decimal.quantize does
+    assert fares(Decimal('0.001'), ['5.00'], Decimal('1.00')) == [Decimal('0.00')]
+    assert fares(Decimal('0.003'), ['5.00'], Decimal('1.00')) == [Decimal('0.02')]
+    assert fares(distance, [], multiplier) == []
+
+
+@pytest.mark.django_db
+class TestFareQuote:
+
+    def test_prices_each_driver_without_creating_rides(self, make_driver, client_api, client_profile):
+        from apps.Rides.models import Ride
+
+        near = make_driver('near', (6.5260, 3.3798), price_per_km=Decimal('100.00'))
+        make_driver('far', (6.5300, 3.3800), price_per_km=Decimal('150.00'))
+        resp = client_api.post(
+            reverse('fare quote'),
+            {'pickup_location': list(PICKUP), 'dropoff_location': list(DROPOFF)},
+            format='json',
+        )
+        assert resp.status_code == 200
+        data = resp.json()['data']
+        assert [d['first_name'] for d in data['drivers']] == ['near', 'far']
+        assert Ride.objects.count() == 0
+
+        # The quote matches the price locked in when the ride is created
+        ride = Ride.objects.create(client=client_profile, driver=near, pickup_location=PICKUP, dropoff_location=DROPOFF)
+        assert data['distance_km'] == str(ride.distance_km)
+        assert data['surge_multiplier'] == '1.00'
+        assert data['drivers'][0]['price'] == str(ride.price)
+        assert Decimal(data['drivers'][1]['price']) == (ride.distance_km * 150).quantize(Decimal('0.01'))
+        assert data['duration_seconds'] > 0
+        assert 'eta_seconds' in data['drivers'][0]
+
+    def test_applies_surge(self, make_driver, client_api, client_profile):
+        from apps.Rides.models import Ride
+        from apps.Rides.surge import surge_pricing
+
+        make_driver('near', (6.5250, 3.3790), price_per_km=Decimal('100.00'))
+        for _ in range(3):
+            Ride.objects.create(client=client_profile, pickup_location=PICKUP, dropoff_location=DROPOFF)
+        surge_pricing.recompute()
+        resp = client_api.post(
+            reverse('fare quote'),
+            {'pickup_location': list(PICKUP), 'dropoff_location': list(DROPOFF), 'limit': 1},
+            format='json',
+        )
+        data = resp.json()['data']
+        # 3 requests for 1 driver: 1 + 0.5 * (3 - 1)
+        assert data['surge_multiplier'] == '2.00'
+        distance = Decimal(data['distance_km'])
+        assert data['drivers'][0]['price'] == str((distance * 100 * 2).quantize(Decimal('0.01')))
+
+    def test_rejects_missing_dropoff(self, client_api):
+        resp = client_api.post(reverse('fare quote'), {'pickup_location': list(PICKUP)}, format='json')
+        assert resp.status_code == 400
+        assert 'dropoff_location' in resp.json()['details']
@@ -0,0 +1,67 @@
+"""
+Tests for the vectorized haversine API in base.geo and its LocationMixin
+wrappers. Batched results must agree with the scalar haversine_distance.
+"""
+import random
+import numpy as np
+import pytest
+from base.geo import coord_array, haversine_many, haversine_matrix
+from base.mixins import LocationMixin
+
+
+@pytest.fixture
+def points():
+    rng = random.Random(42)
+    return [(rng.uniform(-80, 80), rng.uniform(-180, 180)) for _ in range(200)]
+
+
+class TestHaversineMany:
+    """One origin against N destinations."""
+
+    def test_matches_scalar(self, points):
+        mixin = LocationMixin()
+        origin = (6.5244, 3.3792)
+        result = haversine_many(origin, points)
+        assert result.shape == (len(points),)
+        for dest, dist in zip(points, result):
+            assert dist == pytest.approx(mixin.haversine_distance(origin, dest), abs=1e-9)
+
+    def test_accepts_dicts_and_arrays(self):
+        origin = {'lat': 6.5244, 'lon': 3.3792}
+        dests = [{'lat': 7.3775, 'lon': 3.9470}, (9.0579, 7.4951)]
+        from_list = haversine_many(origin, dests)
+        from_array = haversine_many(origin, np.array([[7.3775, 3.9470], [9.0579, 7.4951]]))
+        np.testing.assert_allclose(from_list, from_array, atol=1e-12)
+
+    def test_empty(self):
+        assert haversine_many((6.5244, 3.3792), []).shape == (0,)
+
+    def test_mixin_wrapper(self, points):
+        mixin = LocationMixin()
+        np.testing.assert_array_equal(
+            mixin.haversine_many(points[0], points), haversine_many(points[0], points)
+        )
+
+
+class TestHaversineMatrix:
+    """N origins against M destinations."""
+
+    def test_matches_scalar(self, points):
+        mixin = LocationMixin()
+        origins, dests = points[:15], points[15:40]
+        matrix = haversine_matrix(origins, dests)
+        assert matrix.shape == (15, 25)
+        for i, origin in enumerate(origins):
+            for j, dest in enumerate(dests):
+                assert matrix[i, j] == pytest.approx(mixin.haversine_distance(origin, dest), abs=1e-9)
+
+    def test_rows_match_many(self, points):
+        matrix = haversine_matrix(points[:5], points)
+        for i in range(5):
+            np.testing.assert_allclose(matrix[i], haversine_many(points[i], points), atol=1e-9)
+
+    def test_coord_array_is_contiguous(self, points):
+        arr = coord_array(points)
+        assert arr.dtype == np.float64
+        assert arr.flags['C_CONTIGUOUS']
+        assert arr.shape == (len(points), 2)
@@ -0,0 +1,106 @@
+"""
+Tests for the geocell-keyed nearest-driver response cache behind
+/rides/find_ride.
+"""
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from apps.Rides.cache import nearest_driver_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def client_api(make_client, api_for):
+    return api_for(make_client('cache_client').user)
+
+
+@pytest.mark.django_db
+class TestNearestDriverCache:
+
+    def test_hit_after_miss(self, make_driver):
+        make_driver('near', (6.5260, 3.3798))
+        first = nearest_driver_cache.nearest((6.5244, 3.3792), limit=7)
+        second = nearest_driver_cache.nearest((6.5245, 3.3793), limit=7)
+        assert nearest_driver_cache.stats() == {'hits': 1, 'misses': 1}
+        assert [d['first_name'] for d in first] == [d['first_name'] for d in second] == ['near']
+
+    def test_distances_are_per_caller(self, make_driver):
+        from base.mixins import LocationMixin
+
+        make_driver('near', (6.5260, 3.3798))
+        nearest_driver_cache.nearest((6.5244, 3.3792), limit=7)
+        result = nearest_driver_cache.nearest((6.5246, 3.3790), limit=7)
+        expected = round(LocationMixin().haversine_distance((6.5246, 3.3790), (6.5260, 3.3798)), 2)
+        assert result[0]['distance'] == f'{expected} miles'
+
+    def test_matches_uncached_search(self, make_driver):
+        from apps.Accounts.models import Client, Driver
+
+        for i, loc in enumerate([(6.5300, 3.3800), (6.6000, 3.4000), (6.5260, 3.3798), (6.5250, 3.3795)]):
+            make_driver(f'drv{i}', loc)
+        origin = Client(location=(6.5244, 3.3792))
+        expected = [d.first_name for d, _ in origin.find_nearest_instances(Driver, limit=3)]
+        result = nearest_driver_cache.nearest((6.5244, 3.3792), limit=3)
+        assert [d['first_name'] for d in result] == expected
+
+    def test_exact_near_the_edge_of_a_cell(self, make_driver):
+        from apps.Accounts.models import Client, Driver
+        from base.spatial import cell_center, geocell
+
+        center = cell_center(geocell((6.5244, 3.3792), nearest_driver_cache.cell_deg), nearest_driver_cache.cell_deg)
+        # More drivers than the overfetch close to the centre, on the far side from the caller
+        for i in range(nearest_driver_cache.overfetch + 2):
+            make_driver(f'far{i}', (center[0] - 0.0020, center[1] - 0.0020 + i * 1e-5))
+        # Further from the centre than all of them, but next to the caller in the cell's corner
+        make_driver('corner', (center[0] + 0.0030, center[1] + 0.0030))
+        caller = (center[0] + 0.0024, center[1] + 0.0024)
+
+        nearest_driver_cache.nearest(center, limit=2)
+        result = nearest_driver_cache.nearest(caller, limit=2)
+        assert nearest_driver_cache.stats() == {'hits': 1, 'misses': 1}
+        expected = [d.first_name for d, _ in Client(location=caller).find_nearest_instances(Driver, limit=2)]
+        assert [d['first_name'] for d in result] == expected
+        assert expected[0] == 'corner'
+
+    def test_status_change_invalidates(self, make_driver):
+        driver = make_driver('near', (6.5260, 3.3798))
+        assert len(nearest_driver_cache.nearest((6.5244, 3.3792))) == 1
+
+        driver.availability_status = 'ENGAGED'
+        driver.save()
+        assert nearest_driver_cache.nearest((6.5244, 3.3792)) == []
+        assert nearest_driver_cache.stats()['hits'] == 0
+
+    def test_new_driver_nearby_invalidates(self, make_driver):
+        assert nearest_driver_cache.nearest((6.5244, 3.3792)) == []
+        make_driver('arrived', (6.5250, 3.3795))
+        assert [d['first_name'] for d in nearest_driver_cache.nearest((6.5244, 3.3792))] == ['arrived']
+
+    def test_flushed_location_invalidates(self, make_driver):
+        from apps.Accounts.models import Driver
+        from base.mixins import LocationMixin
+
+        driver = make_driver('near', (6.5260, 3.3798))
+        nearest_driver_cache.nearest((6.5244, 3.3792))
+        Driver.location_buffer.add(driver.pk, (6.5300, 3.3800))
+        assert Driver.location_buffer.flush() == 1
+
+        result = nearest_driver_cache.nearest((6.5244, 3.3792))
+        assert nearest_driver_cache.stats() == {'hits': 0, 'misses': 2}
+        expected = round(LocationMixin().haversine_distance((6.5244, 3.3792), (6.5300, 3.3800)), 2)
+        assert result[0]['distance'] == f'{expected} miles'
+
+    def test_view_uses_cache(self, make_driver, client_api):
+        make_driver('near', (6.5260, 3.3798))
+        url = reverse('find rides')
+        resp = client_api.get(url)
+        assert resp.status_code == 200
+        assert [d['first_name'] for d in resp.json()['data']] == ['near']
+        client_api.get(url)
+        assert nearest_driver_cache.stats() == {'hits': 1, 'misses': 1}
@@ -66,60 +66,25 @@ class TestFindNearestInstances:
     """Integration tests for find_nearest_instances using the Driver model."""
 
     @pytest.fixture
-    def setup_drivers(self, django_user_model):
+    def setup_drivers(self, make_driver):
         """Create multiple drivers at known locations around Lagos."""
-        from apps.Accounts.models import Driver, UserRole
-
-        role, _ = UserRole.objects.get_or_create(name='Driver')
-        drivers = []
-
         driver_data = [
-            # (username, email, lat, lon, availability, label)
-            ('driver1', 'd1@test.com', 6.5300, 3.3800, 'ONLINE', 'Near Lagos'),
-            ('driver2', 'd2@test.com', 6.6000, 3.4000, 'ONLINE', 'Slightly farther'),
-            ('driver3', 'd3@test.com', 7.3775, 3.9470, 'ONLINE', 'In Ibadan'),
-            ('driver4', 'd4@test.com', 6.5250, 3.3795, 'OFFLINE', 'Near but offline'),
-            ('driver5', 'd5@test.com', 6.5260, 3.3798, 'ONLINE', 'Very close'),
+            # (username, lat, lon, availability, label)
+            ('driver1', 6.5300, 3.3800, 'ONLINE', 'Near Lagos'),
+            ('driver2', 6.6000, 3.4000, 'ONLINE', 'Slightly farther'),
+            ('driver3', 7.3775, 3.9470, 'ONLINE', 'In Ibadan'),
+            ('driver4', 6.5250, 3.3795, 'OFFLINE', 'Near but offline'),
+            ('driver5', 6.5260, 3.3798, 'ONLINE', 'Very close'),
+        ]
+        return [
+            make_driver(username, (lat, lon), avail, first_name=label)
+            for username, lat, lon, avail, label in driver_data
         ]
-
-        for username, email, lat, lon, avail, label in driver_data:
-            user = django_user_model.objects.create_user(
-                username=username, email=email, password='testpass123'
-            )
-            user.role = role
-            user.save()
-            driver = Driver.objects.create(
-                user=user,
-                first_name=label,
-                last_name='Test',
-                nin=1234567890,
-                car_type='Sedan',
-                plate_number=f'ABC-{username}',
-                availability_status=avail,
-                location=(lat, lon),
-            )
-            drivers.append(driver)
-
-        return drivers
 
     @pytest.fixture
-    def client_profile(self, django_user_model):
+    def client_profile(self, make_client):
         """Create a client at a known location in Lagos."""
-        from apps.Accounts.models import Client, UserRole
-
-        role, _ = UserRole.objects.get_or_create(name='Client')
-        user = django_user_model.objects.create_user(
-            username='client1', email='c1@test.com', password='testpass123'
-        )
-        user.role = role
-        user.save()
-        client_obj = Client.objects.create(
-            user=user,
-            first_name='Test',
-            last_name='Client',
-            location=(6.5244, 3.3792),  # Central Lagos
-        )
-        return client_obj
+        return make_client('client1', (6.5244, 3.3792))  # Central Lagos
 
     def test_returns_sorted_by_distance(self, setup_drivers, client_profile):
         """Nearest drivers should be sorted closest first."""
@@ -193,3 +158,69 @@ class TestFindNearestInstances:
             instance, dist = item
             assert isinstance(instance, Driver)
             assert isinstance(dist, float)
+
+
+@pytest.mark.django_db
+class TestFindNearestInstancesWithoutIndex(TestFindNearestInstances):
+    """Re-run the integration tests through the database bounding-box path."""
+
+    @pytest.fixture(autouse=True)
+    def disable_index(self, monkeypatch):
+        from apps.Accounts.models import Driver
+
+        monkeypatch.setattr(Driver.spatial_index, 'enabled', False)
+        # Force several chunks through the streaming scan
+        monkeypatch.setattr(LocationMixin, 'nearest_chunk_size', 2)
+
+
+class TestBoundingBox:
+    """Unit tests for the bounding box used to prefilter candidates."""
+
+    def test_contains_circle(self):
+        from base.geo import bounding_box
+
+        origin = (6.5244, 3.3792)
+        min_lat, max_lat, min_lon, max_lon = bounding_box(origin, 10)
+        mixin = LocationMixin()
+        # Points just inside 10 km due north/south/east/west must be inside the box
+        for point in [(min_lat + 0.001, 3.3792), (max_lat - 0.001, 3.3792), (6.5244, min_lon + 0.001), (6.5244, max_lon - 0.001)]:
+            assert mixin.haversine_distance(origin, point) < 10.5
+        assert mixin.haversine_distance(origin, (max_lat, 3.3792)) == pytest.approx(10, abs=1e-6)
+        assert mixin.haversine_distance(origin, (6.5244, max_lon)) >= 10
+
+    def test_antimeridian_wraps(self):
+        from base.geo import bounding_box
+
+        _, _, min_lon, max_lon = bounding_box((0.0, 179.99), 10)
+        assert min_lon > max_lon
+
+    def test_pole_covers_all_longitudes(self):
+        from base.geo import bounding_box
+
+        _, max_lat, min_lon, max_lon = bounding_box((89.99, 0.0), 10)
+        assert (max_lat, min_lon, max_lon) == (90.0, -180.0, 180.0)
+
+
+@pytest.mark.django_db
+class TestWithinBox:
+    """Integration tests for the within_box queryset method."""
+
+    def test_filters_to_box(self, django_user_model):
+        from apps.Accounts.models import Driver
+
+        for i, (lat, lon) in enumerate([(6.53, 3.38), (7.3775, 3.9470), (6.60, 3.40)]):
+            user = django_user_model.objects.create_user(
+                username=f'box{i}', email=f'box{i}@test.com', password='testpass123'
+            )
+            Driver.objects.create(
+                user=user, first_name=f'Box{i}', last_name='Test', nin=1234567890,
+                availability_status='ONLINE', location=(lat, lon),
+            )
+
+        names = set(
+            Driver.objects.within_box((6.5244, 3.3792), 20).values_list('first_name', flat=True)
+        )
+        assert names == {'Box0', 'Box2'}
+
+        drivers = list(Driver.objects.within_box((6.5244, 3.3792), 20).only('location_lat', 'location_lon'))
+        assert len(drivers) == 2
@@ -0,0 +1,63 @@
+"""
+Tests for PointField, which keeps the (lat, lon) API of the old JSON
+LocationField while storing the point in two float columns.
+"""
+import pytest
+from django.core.exceptions import ValidationError
+from base.fields import parse_location
+
+
+class TestParseLocation:
+    """Unit tests for the accepted location input formats."""
+
+    @pytest.mark.parametrize('value', [
+        (6.5244, 3.3792),
+        [6.5244, 3.3792],
+        {'lat': 6.5244, 'lon': 3.3792},
+        '6.5244,3.3792',
+        '[6.5244, 3.3792]',
+        '{"lat": 6.5244, "lon": 3.3792}',
+    ])
+    def test_formats(self, value):
+        assert parse_location(value) == (6.5244, 3.3792)
+
+    def test_none(self):
+        assert parse_location(None) is None
+
+    def test_invalid(self):
+        with pytest.raises(ValidationError):
+            parse_location('not a location')
+
+
+@pytest.mark.django_db
+class TestPointFieldModel:
+    """The location attribute should round trip through the lat/lon columns."""
+
+    @pytest.fixture
+    def client_profile(self, make_client):
+        return make_client('point', (6.5244, 3.3792))
+
+    def test_stored_in_columns(self, client_profile):
+        from apps.Accounts.models import Client
+
+        row = Client.objects.values('location_lat', 'location_lon').get(pk=client_profile.pk)
+        assert row == {'location_lat': 6.5244, 'location_lon': 3.3792}
+        assert Client.objects.get(pk=client_profile.pk).location == (6.5244, 3.3792)
+
+    def test_assign_and_clear(self, client_profile):
+        from apps.Accounts.models import Client
+
+        client_profile.location = {'lat': 7.0, 'lon': 4.0}
+        client_profile.save()
+        assert Client.objects.get(pk=client_profile.pk).location == (7.0, 4.0)
+
+        client_profile.location = None
+        client_profile.save()
+        assert Client.objects.get(pk=client_profile.pk).location is None
+
+    def test_filter_on_columns(self, client_profile):
+        from apps.Accounts.models import Client
+
+        assert Client.objects.filter(
+            location_lat__range=(6.5, 6.6), location_lon__range=(3.3, 3.4)
+        ).exists()
@@ -0,0 +1,138 @@
+"""
+Tests for driver presence: heartbeats with a TTL, expiry out of the search
+index and batched write-back of the OFFLINE status.
+"""
+import pytest
+from datetime import timedelta
+from django.urls import reverse
+from django.utils import timezone
+
+
+def status_of(driver):
+    from apps.Accounts.models import Driver
+
+    return Driver.objects.values_list('availability_status', flat=True).get(pk=driver.pk)
+
+
+@pytest.mark.django_db
+class TestPresenceTracker:
+
+    def test_silent_driver_expires(self, make_driver):
+        from apps.Accounts.models import Driver
+
+        driver = make_driver('silent')
+        t0 = timezone.now()
+        Driver.presence.heartbeat(driver.pk, t0)
+        assert Driver.presence.sweep(t0 + timedelta(seconds=60)) == []
+        assert driver.pk in Driver.spatial_index
+
+        assert Driver.presence.sweep(t0 + timedelta(seconds=91)) == [driver.pk]
+        assert driver.pk not in Driver.spatial_index
+        assert status_of(driver) == 'OFFLINE'
+        assert len(Driver.presence) == 0
+
+    def test_later_heartbeat_extends_deadline(self, make_driver):
+        from apps.Accounts.models import Driver
+
+        driver = make_driver('chatty')
+        t0 = timezone.now()
+        Driver.presence.heartbeat(driver.pk, t0)
+        Driver.presence.heartbeat(driver.pk, t0 + timedelta(seconds=60))
+        assert Driver.presence.sweep(t0 + timedelta(seconds=100)) == []
+        assert status_of(driver) == 'ONLINE'
+        assert Driver.presence.sweep(t0 + timedelta(seconds=151)) == [driver.pk]
+
+    def test_last_seen_is_written_back_sparingly(self, make_driver):
+        from apps.Accounts.models import Driver
+
+        driver = make_driver('persisted')
+        t0 = timezone.now()
+        Driver.presence.heartbeat(driver.pk, t0)
+        assert Driver.presence.flush_seen() == 1
+        # Within a third of the TTL of the stored time: nothing to write
+        Driver.presence.heartbeat(driver.pk, t0 + timedelta(seconds=10))
+        assert Driver.presence.flush_seen() == 0
+        Driver.presence.heartbeat(driver.pk, t0 + timedelta(seconds=31))
+        assert Driver.presence.flush_seen() == 1
+        driver.refresh_from_db()
+        assert driver.last_seen_at == t0 + timedelta(seconds=31)
+
+    def test_driver_alive_in_another_process_is_kept(self, make_driver):
+        from apps.Accounts.models import Driver
+
+        driver = make_driver('elsewhere')
+        t0 = timezone.now()
+        Driver.presence.heartbeat(driver.pk, t0)
+        Driver.presence.flush_seen()
+        # Another process has since heard from the driver and written it back
+        Driver.objects.filter(pk=driver.pk).update(last_seen_at=t0 + timedelta(seconds=80))
+
+        assert Driver.presence.sweep(t0 + timedelta(seconds=91)) == []
+        assert status_of(driver) == 'ONLINE'
+        assert driver.pk in Driver.spatial_index
+        assert Driver.presence.last_seen(driver.pk) == t0 + timedelta(seconds=80)
+
+    def test_only_online_drivers_are_taken_offline(self, make_driver):
+        from apps.Accounts.models import Driver
+
+        driver = make_driver('on_a_ride')
+        t0 = timezone.now()
+        Driver.presence.heartbeat(driver.pk, t0)
+        Driver.objects.filter(pk=driver.pk).update(availability_status='ENGAGED')
+        assert Driver.presence.sweep(t0 + timedelta(seconds=91)) == []
+        assert status_of(driver) == 'ENGAGED'
+
+    def test_indexed_driver_without_heartbeats_gets_one_ttl(self, make_driver):
+        from apps.Accounts.models import Driver
+
+        driver = make_driver('ghost')
+        t0 = timezone.now()
+        assert Driver.presence.sweep(t0) == []
+        assert Driver.presence.sweep(t0 + timedelta(seconds=91)) == [driver.pk]
+        assert status_of(driver) == 'OFFLINE'
+
+    def test_expiry_invalidates_nearest_cache(self, make_driver):
+        from django.core.cache import cache
+        from apps.Accounts.models import Driver
+        from apps.Rides.cache import nearest_driver_cache
+
+        cache.clear()
+        driver = make_driver('cached')
+        assert len(nearest_driver_cache.nearest((6.5244, 3.3792))) == 1
+        t0 = timezone.now()
+        Driver.presence.heartbeat(driver.pk, t0)
+        Driver.presence.sweep(t0 + timedelta(seconds=91))
+        assert nearest_driver_cache.nearest((6.5244, 3.3792)) == []
+
+    def test_heap_stays_bounded(self, make_driver):
+        from apps.Accounts.models import Driver
+
+        driver = make_driver('steady')
+        t0 = timezone.now()
+        for i in range(1000):
+            Driver.presence.heartbeat(driver.pk, t0 + timedelta(seconds=i))
+        assert len(Driver.presence._heap) < 100
+        assert Driver.presence.sweep(t0 + timedelta(seconds=1000)) == []
+        assert Driver.presence.sweep(t0 + timedelta(seconds=1090)) == [driver.pk]
+
+
+@pytest.mark.django_db
+class TestHeartbeatEndpoints:
+
+    def test_heartbeat_reports_status(self, make_driver, api_for):
+        from apps.Accounts.models import Driver
+
+        driver = make_driver('beating')
+        api = api_for(driver.user)
+        resp = api.post(reverse('driver heartbeat'))
+        assert resp.status_code == 200
+        assert resp.json()['data'] == {'availability_status': 'ONLINE', 'ttl': Driver.presence.ttl}
+        assert Driver.presence.is_alive(driver.pk)
+
+    def test_location_ping_counts_as_heartbeat(self, make_driver, api_for):
+        from apps.Accounts.models import Driver
+
+        driver = make_driver('pinging')
+        api = api_for(driver.user)
+        api.post(reverse('driver location'), {'lat': 6.6, 'lon': 3.4}, format='json')
+        assert Driver.presence.is_alive(driver.pk)
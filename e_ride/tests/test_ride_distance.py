@@ -0,0 +1,44 @@
+"""
+Tests for the trip distance and price stored on Ride at write time.
+"""
+from decimal import Decimal
+import pytest
+from django.db.models import Sum
+from apps.Accounts.models import Driver
+from apps.Rides.models import Ride
+from base.geo import haversine
+
+
+@pytest.fixture
+def ride(make_driver, make_client):
+    driver = make_driver('dist_driver', price_per_km=150)
+    client = make_client('dist_client')
+    return Ride.objects.create(driver=driver, client=client, pickup_location=(6.5244, 3.3792), dropoff_location=(6.55, 3.40))
+
+
+@pytest.mark.django_db
+class TestStoredDistance:
+
+    def test_set_on_create(self, ride):
+        expected = Decimal(haversine(6.5244, 3.3792, 6.55, 3.40)).quantize(Decimal('0.001'))
+        ride = Ride.objects.get(pk=ride.pk)
+        assert ride.distance_km == expected
+        assert ride.price == (expected * 150).quantize(Decimal('0.01'))
+
+    def test_price_locked_until_locations_change(self, ride):
+        original = ride.price
+        Driver.objects.filter(pk=ride.driver_id).update(price_per_km=999)
+        ride = Ride.objects.select_related('driver').get(pk=ride.pk)
+        ride.status = 'ACCEPTED'
+        ride.save()
+        assert Ride.objects.get(pk=ride.pk).price == original
+
+        ride.dropoff_location = (6.60, 3.45)
+        ride.save(update_fields=['dropoff_location_lat', 'dropoff_location_lon'])
+        ride = Ride.objects.get(pk=ride.pk)
+        assert ride.distance_km == Decimal(haversine(6.5244, 3.3792, 6.60, 3.45)).quantize(Decimal('0.001'))
+        assert ride.price == (ride.distance_km * 999).quantize(Decimal('0.01'))
+
+    def test_totals_in_sql(self, ride):
+        totals = Ride.objects.aggregate(distance=Sum('distance_km'), earnings=Sum('price'))
+        assert totals == {'distance': ride.distance_km, 'earnings': ride.price}
@@ -0,0 +1,107 @@
+"""
+Tests for the append-only ride event log and its consumer API.
+"""
+import pytest
+from django.urls import reverse
+from apps.Rides.events import EventConsumer, latest_sequence, read_events
+from apps.Rides.models import Ride, RideEvent, RideEventCursor
+
+
+@pytest.mark.django_db
+class TestRideEventLog:
+
+    def test_lifecycle_is_logged_in_order(self, ride_setup):
+        ride = ride_setup['ride']
+        for name in ('ride-accept', 'ride-start', 'ride-complete'):
+            resp = ride_setup['driver_api'].post(reverse(name, kwargs={'ride_id': ride.id}))
+            assert resp.status_code == 200, resp.content
+
+        events = read_events(ride_id=ride.id)
+        assert [(e.kind, e.status) for e in events] == [
+            ('requested', 'REQUESTED'),
+            ('accepted', 'ACCEPTED'),
+            ('started', 'STARTED'),
+            ('completed', 'COMPLETED'),
+        ]
+        assert events[0].actor_id == ride_setup['client'].user_id
+        assert all(e.actor_id == ride_setup['driver'].user_id for e in events[1:])
+        assert [e.sequence for e in events] == sorted(e.sequence for e in events)
+        assert latest_sequence() == events[-1].sequence
+
+    def test_failed_transition_logs_nothing(self, ride_setup):
+        ride = ride_setup['ride']
+        before = RideEvent.objects.count()
+        resp = ride_setup['driver_api'].post(reverse('ride-complete', kwargs={'ride_id': ride.id}))
+        assert resp.status_code == 400
+        assert RideEvent.objects.count() == before
+
+    def test_dispatch_logs_assignment(self, ride_setup):
+        from apps.Rides.dispatch import DispatchEngine
+
+        # Free the driver from the fixture's ride
+        Ride.objects.filter(pk=ride_setup['ride'].pk).update(driver=None, status='CANCELLED')
+        ride = Ride.objects.create(
+            client=ride_setup['client'], pickup_location=(6.5244, 3.3792), dropoff_location=(6.55, 3.40)
+        )
+        DispatchEngine(max_pickup_km=5).tick()
+        event = RideEvent.objects.filter(ride=ride).order_by('sequence').last()
+        assert (event.kind, event.driver_id, event.actor_id) == ('assigned', ride_setup['driver'].id, None)
+
+    def test_events_are_append_only(self, ride_setup):
+        event = RideEvent.objects.filter(ride=ride_setup['ride']).first()
+        event.status = 'CANCELLED'
+        with pytest.raises(ValueError):
+            event.save()
+
+
+@pytest.mark.django_db
+class TestEventConsumer:
+
+    def make_events(self, ride, sequences):
+        return RideEvent.objects.bulk_create(
+            RideEvent(sequence=sequence, ride=ride, kind='requested', status='REQUESTED') for sequence in sequences
+        )
+
+    def test_batches_and_resumes(self, ride_setup):
+        RideEvent.objects.all().delete()
+        self.make_events(ride_setup['ride'], range(1, 6))
+        consumer = EventConsumer('analytics', batch_size=2)
+        assert [e.sequence for e in consumer.poll()] == [1, 2]
+        # Not committed: handed out again
+        assert [e.sequence for e in consumer.poll()] == [1, 2]
+        consumer.commit(2)
+
+        restarted = EventConsumer('analytics', batch_size=10)
+        assert [e.sequence for e in restarted.poll()] == [3, 4, 5]
+        assert RideEventCursor.objects.get(name='analytics').position == 2
+        assert EventConsumer('other').poll()[0].sequence == 1
+
+    def test_waits_at_gaps_until_they_expire(self, ride_setup):
+        RideEvent.objects.all().delete()
+        self.make_events(ride_setup['ride'], [1, 2, 4])
+        consumer = EventConsumer('notifications', gap_timeout=60)
+        assert [e.sequence for e in consumer.poll()] == [1, 2]
+        consumer.commit(2)
+        assert consumer.poll() == []
+
+        # Sequence 3 turns out to be a transaction that never committed
+        consumer.gap_timeout = 0
+        assert [e.sequence for e in consumer.poll()] == [4]
+
+    def test_run_hands_out_batches_until_stopped(self, ride_setup):
+        import threading
+
+        RideEvent.objects.all().delete()
+        self.make_events(ride_setup['ride'], range(1, 4))
+        consumer = EventConsumer('cache', batch_size=2)
+        stop = threading.Event()
+        seen = []
+
+        def handler(batch):
+            seen.append([e.sequence for e in batch])
+            if batch[-1].sequence == 3:
+                stop.set()
+
+        consumer.run(handler, idle_seconds=0, stop=stop)
+        assert seen == [[1, 2], [3]]
+        assert consumer.position == 3
@@ -0,0 +1,73 @@
+"""
+Tests for the sweeper that expires ride requests no driver accepted in time.
+"""
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.Rides.expiry import RideExpirySweeper
+from apps.Rides.models import Ride, RideEvent
+
+
+@pytest.fixture
+def people(make_driver, make_client):
+    return make_driver('exp_driver'), make_client('exp_client')
+
+
+def request_ride(client, driver=None, age_seconds=0):
+    ride = Ride.objects.create(client=client, driver=driver, pickup_location=(6.5244, 3.3792), dropoff_location=(6.55, 3.40))
+    if age_seconds:
+        Ride.objects.filter(pk=ride.pk).update(created_at=timezone.now() - timedelta(seconds=age_seconds))
+    return ride
+
+
+@pytest.mark.django_db
+class TestRideExpiry:
+
+    def test_expires_only_stale_requests(self, people):
+        driver, client = people
+        stale = request_ride(client, driver, age_seconds=400)
+        fresh = request_ride(client, age_seconds=100)
+        accepted = request_ride(client, age_seconds=400)
+        Ride.objects.filter(pk=accepted.pk).update(status='ACCEPTED')
+
+        result = RideExpirySweeper(timeout_seconds=300).sweep()
+        assert (result.expired, result.batches) == (1, 1)
+        assert result.seconds >= 0
+        statuses = dict(Ride.objects.values_list('pk', 'status'))
+        assert statuses == {stale.pk: 'EXPIRED', fresh.pk: 'REQUESTED', accepted.pk: 'ACCEPTED'}
+        event = RideEvent.objects.filter(ride=stale).order_by('sequence').last()
+        assert (event.kind, event.status) == ('expired', 'EXPIRED')
+
+    def test_bounded_batches(self, people):
+        _, client = people
+        for _ in range(5):
+            request_ride(client, age_seconds=600)
+        result = RideExpirySweeper(timeout_seconds=300, batch_size=2).sweep()
+        assert (result.expired, result.batches) == (5, 3)
+        assert RideExpirySweeper(timeout_seconds=300).sweep().expired == 0
+
+    def test_expired_ride_cannot_be_accepted(self, people):
+        driver, client = people
+        ride = request_ride(client, driver, age_seconds=400)
+        RideExpirySweeper(timeout_seconds=300).sweep()
+        api = APIClient()
+        api.force_authenticate(user=driver.user)
+        resp = api.post(reverse('ride-accept', kwargs={'ride_id': ride.id}))
+        assert resp.status_code == 400
+        assert resp.json()['details'] == 'Ride cannot be accepted from status EXPIRED'
+
+    def test_scan_uses_status_created_index(self):
+        plan = Ride.objects.filter(status='REQUESTED', created_at__lt=timezone.now()).order_by('created_at').explain()
+        assert 'rides_status_created_idx' in plan
+
+    def test_command_reports_run(self, people):
+        _, client = people
+        request_ride(client, age_seconds=400)
+        out = StringIO()
+        call_command('expire_rides', '--once', '--timeout', '300', stdout=out)
+        assert out.getvalue().startswith('1 rides expired in 1 batches (')
@@ -0,0 +1,76 @@
+"""
+Tests for the keyset-paginated ride history endpoint.
+"""
+from datetime import timedelta
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from apps.Rides.models import Ride
+
+
+@pytest.fixture
+def history(make_driver, make_client):
+    client = make_client('hist_client')
+    driver = make_driver('hist_driver')
+    rides = Ride.objects.bulk_create(
+        Ride(
+            driver=driver, client=client, status='COMPLETED' if i % 3 else 'CANCELLED',
+            pickup_location=(6.5244, 3.3792), dropoff_location=(6.55, 3.40),
+        )
+        for i in range(25)
+    )
+    # Spread creation times; the oldest rides share one timestamp so paging must fall back to the id
+    base = timezone.now()
+    for i, ride in enumerate(rides):
+        ride.created_at = base - timedelta(minutes=min(i, 10))
+    Ride.objects.bulk_update(rides, ['created_at'])
+    return client, driver
+
+
+def walk(api, **params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        query = dict(params, **({'cursor': cursor} if cursor else {}))
+        resp = api.get(reverse('ride history'), query)
+        assert resp.status_code == 200, resp.content
+        body = resp.json()
+        ids += [ride['id'] for ride in body['data']]
+        pages += 1
+        cursor = body['next']
+        if not cursor:
+            return ids, pages
+
+
+@pytest.mark.django_db
+class TestRideHistory:
+
+    def test_pages_cover_every_ride_once_in_order(self, history, api_for):
+        client, _ = history
+        ids, pages = walk(api_for(client.user), limit=7)
+        expected = [str(pk) for pk in Ride.objects.order_by('-created_at', '-id').values_list('id', flat=True)]
+        assert ids == expected
+        assert pages == 4
+
+    def test_status_filter(self, history, api_for):
+        _, driver = history
+        ids, _ = walk(api_for(driver.user), status='cancelled', limit=4)
+        assert len(ids) == Ride.objects.filter(status='CANCELLED').count() == 9
+
+    def test_later_pages_cost_the_same(self, history, api_for):
+        client, _ = history
+        api = api_for(client.user)
+        url = reverse('ride history')
+        first = api.get(url, {'limit': 5}).json()
+        with CaptureQueriesContext(connection) as ctx:
+            api.get(url, {'limit': 5, 'cursor': first['next']})
+        sql = ctx.captured_queries[-1]['sql']
+        assert 'OFFSET' not in sql.upper()
+        assert len(ctx.captured_queries) == 1
+
+    def test_rejects_bad_input(self, history, api_for):
+        client, _ = history
+        api = api_for(client.user)
+        assert api.get(reverse('ride history'), {'cursor': 'not-a-cursor'}).status_code == 400
+        assert api.get(reverse('ride history'), {'status': 'FLYING'}).status_code == 400
@@ -0,0 +1,191 @@
+"""
+Tests for settling a ride from its GPS track at completion: polyline
+simplification, outlier filtering, the distance of a jittery track, and the final fare,
+which only follows tracks that cover the trip.
+"""
+import math
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.Rides.models import Ride, RideTrackChunk
+from apps.Rides.tracks import ride_tracks, summarize_track
+from base.geo import haversine, simplify_polyline
+
+# About 100 m of latitude
+STEP = 0.0009
+
+
+def straight(n, start=(6.50, 3.38), at=1.76e9, interval=10.0):
+    """Points heading north every `interval` seconds, ~100 m apart (36 km/h at 10 s)"""
+    return [(start[0] + i * STEP, start[1], at + i * interval) for i in range(n)]
+
+
+class TestSimplifyPolyline:
+
+    def test_straight_line_keeps_its_ends(self):
+        assert simplify_polyline([p[:2] for p in straight(50)], 0.01).tolist() == [0, 49]
+
+    def test_keeps_corners_beyond_tolerance(self):
+        # North 1 km, then east 1 km
+        points = [(6.50 + i * STEP, 3.38) for i in range(11)] + [(6.50 + 10 * STEP, 3.38 + i * STEP) for i in range(1, 11)]
+        assert simplify_polyline(points, 0.01).tolist() == [0, 10, 20]
+
+    def test_drops_wiggles_within_tolerance(self):
+        rng = random.Random(3)
+        points = [(6.50 + i * STEP, 3.38 + rng.uniform(-2e-5, 2e-5)) for i in range(100)]
+        assert simplify_polyline(points, 0.01).tolist() == [0, 99]
+
+    def test_loop_back_to_start(self):
+        points = [(6.50, 3.38), (6.51, 3.38), (6.51, 3.39), (6.50, 3.38)]
+        assert simplify_polyline(points, 0.01).tolist() == [0, 1, 2, 3]
+
+    @pytest.mark.parametrize('n', [0, 1, 2])
+    def test_short_lines_are_kept(self, n):
+        assert simplify_polyline([(6.5, 3.38)] * n, 0.01).tolist() == list(range(n))
+
+
+class TestSummarizeTrack:
+
+    def test_distance_of_a_clean_track(self):
+        summary = summarize_track(straight(11))
+        assert summary.distance_km == pytest.approx(haversine(6.50, 3.38, 6.50 + 10 * STEP, 3.38), rel=1e-6)
+        assert (summary.points, summary.dropped) == (11, 0)
+        assert [point[:2] for point in summary.route] == [(6.50, 3.38), (6.50 + 10 * STEP, 3.38)]
+
+    def test_drops_gps_spikes_and_out_of_order_points(self):
+        points = straight(11)
+        # A 5 km jump in 10 seconds, and a repeat of an earlier fix
+        points.insert(5, (6.55, 3.38, points[4][2] + 5))
+        points.insert(8, points[2])
+        summary = summarize_track(points)
+        assert (summary.points, summary.dropped) == (11, 2)
+        assert summary.distance_km == pytest.approx(summarize_track(straight(11)).distance_km)
+
+    def test_recovers_from_a_bad_first_point(self):
+        points = [(6.60, 3.38, 1.76e9 - 10)] + straight(11)
+        summary = summarize_track(points, max_rejects=3)
+        # The first fix and the two after it are dropped before the track re-anchors
+        assert summary.dropped == 2
+        assert summary.distance_km == pytest.approx(haversine(6.50 + 2 * STEP, 3.38, 6.50 + 10 * STEP, 3.38), rel=1e-6)
+
+    def test_gps_jitter_is_not_charged(self):
+        # A two hour drive like benchmark_breadcrumbs makes, with ~3 m of noise on every fix
+        rng = random.Random(11)
+        lat, lon, heading = 6.52, 3.38, 0.0
+        true_km = 0.0
+        points = []
+        for i in range(7200):
+            heading += rng.gauss(0, 0.15)
+            step = rng.uniform(0, 16) / 111_320
+            true_km += haversine(lat, lon, lat + step * math.cos(heading), lon + step * math.sin(heading))
+            lat += step * math.cos(heading)
+            lon += step * math.sin(heading)
+            points.append((lat + rng.gauss(0, 3e-5), lon + rng.gauss(0, 3e-5), 1.76e9 + i))
+        assert summarize_track(points).distance_km == pytest.approx(true_km, rel=0.02)
+
+    def test_two_hour_trip_fits_completion_budget(self):
+        rng = random.Random(7)
+        lat, lon, heading = 6.45, 3.35, 0.0
+        points = []
+        for i in range(7200):
+            heading += rng.gauss(0, 0.1)
+            lat += 1e-4 * math.cos(heading) + rng.gauss(0, 2e-5)
+            lon += 1e-4 * math.sin(heading) + rng.gauss(0, 2e-5)
+            points.append((lat, lon, 1.76e9 + i))
+        summary = summarize_track(points)
+        assert summary.points == 7200
+        assert len(summary.route) < 7200 / 4
+        assert summary.seconds < 1.0
+
+
+@pytest.fixture
+def started_ride(make_driver, make_client):
+    driver = make_driver('route_driver', (6.50, 3.38), 'ENGAGED')
+    client = make_client('route_client', (6.50, 3.38))
+    ride = Ride.objects.create(
+        driver=driver, client=client, pickup_location=(6.50, 3.38), dropoff_location=(6.50 + 10 * STEP, 3.38),
+    )
+    Ride.objects.filter(pk=ride.pk).update(
+        status='STARTED', started_at=timezone.now() - timedelta(minutes=5), surge_multiplier=Decimal('1.50'),
+    )
+    ride.refresh_from_db()
+    return ride
+
+
+@pytest.mark.django_db
+class TestCompletionFare:
+
+    def complete(self, ride):
+        api = APIClient()
+        api.force_authenticate(user=ride.driver.user)
+        resp = api.post(reverse('ride-complete', kwargs={'ride_id': ride.id}))
+        assert resp.status_code == 200, resp.content
+        return resp.json()['data']
+
+    def test_charges_for_the_driven_distance(self, started_ride):
+        # A 2 km detour east and back on the way north
+        path = [(6.50 + i * STEP, 3.38) for i in range(6)]
+        path += [(6.50 + 5 * STEP, 3.38 + i * STEP) for i in range(1, 11)]
+        path += [(6.50 + 5 * STEP, 3.38 + i * STEP) for i in range(9, -1, -1)]
+        path += [(6.50 + i * STEP, 3.38) for i in range(6, 11)]
+        ride_tracks.add(started_ride.pk, [
+            (lat, lon, started_ride.started_at + timedelta(seconds=10 * (i + 1)))
+            for i, (lat, lon) in enumerate(path)
+        ])
+
+        data = self.complete(started_ride)
+        started_ride.refresh_from_db()
+        expected_km = summarize_track([(lat, lon, 10.0 * i) for i, (lat, lon) in enumerate(path)]).distance_km
+        assert float(started_ride.travelled_km) == pytest.approx(expected_km, abs=1e-3)
+        assert float(started_ride.travelled_km) == pytest.approx(3.0, rel=0.01)
+        assert started_ride.price == (started_ride.travelled_km * 100 * Decimal('1.50')).quantize(Decimal('0.01'))
+        assert data['price'] == str(started_ride.price)
+        assert data['travelled_km'] == str(started_ride.travelled_km)
+        assert 'route' not in data
+        route = started_ride.route_points
+        assert len(route) == 5
+        assert route[0] == pytest.approx((6.50, 3.38)) and route[-1] == pytest.approx((6.50 + 10 * STEP, 3.38))
+
+    def test_no_track_keeps_quoted_price(self, started_ride):
+        quoted = started_ride.price
+        data = self.complete(started_ride)
+        started_ride.refresh_from_db()
+        assert data['status'] == 'COMPLETED'
+        assert started_ride.price == quoted
+        assert started_ride.travelled_km is None and started_ride.route_points == []
+
+    @pytest.mark.parametrize('path', [
+        # Stops a third of the way: the rest of the pings were lost, or are still held by another process
+        [(6.50 + i * STEP, 3.38) for i in range(4)],
+        # Two fixes from the middle of the trip
+        [(6.50 + 4 * STEP, 3.38), (6.50 + 5 * STEP, 3.38)],
+    ])
+    def test_partial_track_keeps_quoted_price(self, started_ride, path):
+        quoted = started_ride.price
+        ride_tracks.add(started_ride.pk, [
+            (lat, lon, started_ride.started_at + timedelta(seconds=10 * (i + 1)))
+            for i, (lat, lon) in enumerate(path)
+        ])
+        data = self.complete(started_ride)
+        started_ride.refresh_from_db()
+        assert started_ride.price == quoted
+        assert data['price'] == str(quoted)
+        # The driven distance is still recorded
+        assert float(started_ride.travelled_km) == pytest.approx(haversine(*path[0], *path[-1]), abs=1e-3)
+
+    def test_unreadable_track_keeps_quoted_price(self, started_ride):
+        quoted = started_ride.price
+        RideTrackChunk.objects.create(
+            ride=started_ride, points=2, started_at=started_ride.started_at, ended_at=started_ride.started_at,
+            data=b'\x07damaged',
+        )
+        data = self.complete(started_ride)
+        started_ride.refresh_from_db()
+        assert data['status'] == 'COMPLETED' and data['price'] == str(quoted)
+        assert started_ride.status == 'COMPLETED' and started_ride.price == quoted
+        assert started_ride.travelled_km is None
@@ -0,0 +1,155 @@
+"""
+Tests for ride GPS tracks: the packed breadcrumb encoding, the track buffer
+that writes it in chunks, and pings of a STARTED ride landing in its track.
+"""
+import json
+import random
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.Rides.models import Ride, RideTrackChunk
+from apps.Rides.tracks import TrackBuffer, ride_tracks, track_points
+from base import breadcrumbs
+
+T0 = datetime(2026, 3, 1, 8, 0, tzinfo=dt_timezone.utc)
+
+
+def drive(n, start=(6.5244, 3.3792), at=T0):
+    rng = random.Random(n)
+    lat, lon = start
+    points = []
+    for i in range(n):
+        lat += rng.uniform(-1e-4, 1.5e-4)
+        lon += rng.uniform(-1e-4, 1.5e-4)
+        points.append((round(lat, 6), round(lon, 6), at + timedelta(seconds=i)))
+    return points
+
+
+class TestBreadcrumbEncoding:
+
+    def test_round_trip_to_the_microdegree_and_millisecond(self):
+        points = drive(500) + [(-33.868820, 151.209290, T0 + timedelta(seconds=600.25))]
+        data = breadcrumbs.encode(points)
+        decoded = list(breadcrumbs.decode(data))
+        assert breadcrumbs.count(data) == len(decoded) == len(points)
+        for (lat, lon, at), (dlat, dlon, dat) in zip(points, decoded):
+            assert dlat == pytest.approx(lat, abs=1e-6)
+            assert dlon == pytest.approx(lon, abs=1e-6)
+            assert dat == pytest.approx(at.timestamp(), abs=1e-3)
+
+    def test_much_smaller_than_json_locations(self):
+        points = drive(1000)
+        packed = len(breadcrumbs.encode(points))
+        as_json = sum(len(json.dumps({'lat': lat, 'lon': lon})) + 8 for lat, lon, _ in points)
+        assert packed / len(points) < 7
+        assert as_json / packed > 5
+
+    def test_streams_across_chunks(self):
+        points = drive(10)
+        chunks = [breadcrumbs.encode(points[:4]), breadcrumbs.encode(points[4:]), breadcrumbs.encode([])]
+        assert [p[:2] for p in breadcrumbs.iter_points(chunks)] == [p[:2] for p in points]
+
+    def test_rejects_damaged_chunks(self):
+        data = breadcrumbs.encode(drive(5))
+        with pytest.raises(breadcrumbs.BreadcrumbError):
+            list(breadcrumbs.decode(data[:-2]))
+        with pytest.raises(breadcrumbs.BreadcrumbError):
+            list(breadcrumbs.decode(b'\x07' + data[1:]))
+
+
+@pytest.fixture
+def started_ride(make_driver, make_client):
+    driver = make_driver('track_driver', (6.5244, 3.3792), 'ENGAGED')
+    client = make_client('track_client')
+    ride = Ride.objects.create(
+        driver=driver, client=client, status='STARTED', started_at=timezone.now() - timedelta(minutes=5),
+        pickup_location=(6.5244, 3.3792), dropoff_location=(6.55, 3.40),
+    )
+    return ride
+
+
+@pytest.mark.django_db
+class TestTrackBuffer:
+
+    def test_writes_full_chunks_and_forced_tails(self, started_ride):
+        buffer = TrackBuffer(chunk_points=4, background=False)
+        points = drive(10)
+        buffer.add(started_ride.pk, points[:3])
+        assert buffer.flush() == 0
+        buffer.add(started_ride.pk, points[3:])
+        assert buffer.flush() == 2
+        assert len(buffer) == 2
+        assert buffer.flush(started_ride.pk, force=True) == 1
+
+        chunks = list(RideTrackChunk.objects.filter(ride=started_ride).order_by('started_at'))
+        assert [chunk.points for chunk in chunks] == [4, 4, 2]
+        assert (chunks[0].started_at, chunks[-1].ended_at) == (points[0][2], points[-1][2])
+        decoded = list(breadcrumbs.iter_points(chunk.data for chunk in chunks))
+        assert [p[:2] for p in decoded] == [p[:2] for p in points]
+
+    def test_old_tails_are_written_without_forcing(self, started_ride):
+        buffer = TrackBuffer(chunk_points=64, max_age=0, background=False)
+        buffer.add(started_ride.pk, drive(3))
+        assert buffer.flush() == 1
+        assert len(buffer) == 0
+
+    def test_flushing_one_ride_leaves_the_others_queued(self, started_ride):
+        buffer = TrackBuffer(chunk_points=2, background=False)
+        other = uuid.uuid4()
+        buffer.add(started_ride.pk, drive(3))
+        buffer.add(other, drive(2))
+        assert buffer.flush(started_ride.pk, force=True) == 2
+        assert RideTrackChunk.objects.filter(ride=started_ride).count() == 2
+        assert [chunk.ride_id for chunk in buffer._ready] == [other]
+
+    def test_chunks_are_append_only(self, started_ride):
+        buffer = TrackBuffer(chunk_points=2, background=False)
+        buffer.add(started_ride.pk, drive(2))
+        buffer.flush()
+        chunk = RideTrackChunk.objects.get()
+        with pytest.raises(ValueError):
+            chunk.save()
+
+
+@pytest.mark.django_db
+class TestRideTrackFromPings:
+
+    def post(self, ride, pings):
+        api = APIClient()
+        api.force_authenticate(user=ride.driver.user)
+        resp = api.post(reverse('driver location'), pings, format='json')
+        assert resp.status_code == 202, resp.content
+        return resp
+
+    def test_pings_during_a_started_ride_form_its_track(self, started_ride):
+        now = timezone.now()
+        pings = [
+            {'lat': 6.5300 + i * 0.001, 'lon': 3.3800, 'recorded_at': (now - timedelta(seconds=30 - i)).isoformat()}
+            for i in range(5)
+        ]
+        # Taken before the ride started, so not part of it
+        pings.append({'lat': 6.5100, 'lon': 3.3700, 'recorded_at': (now - timedelta(minutes=10)).isoformat()})
+        self.post(started_ride, pings)
+
+        ride_tracks.flush(started_ride.pk, force=True)
+        track = list(track_points(started_ride.pk))
+        assert [(round(lat, 4), lon) for lat, lon, _ in track] == [(round(6.53 + i * 0.001, 4), 3.38) for i in range(5)]
+        assert len(ride_tracks) == 0
+
+    def test_no_track_without_a_started_ride(self, started_ride):
+        Ride.objects.filter(pk=started_ride.pk).update(status='COMPLETED')
+        self.post(started_ride, {'lat': 6.53, 'lon': 3.38})
+        assert len(ride_tracks) == 0
+        assert list(track_points(started_ride.pk)) == []
+
+
+def test_benchmark_command_reports_ratio():
+    out = StringIO()
+    call_command('benchmark_breadcrumbs', '--trips', '2', '--minutes', '10', stdout=out)
+    assert 'smaller than json rows' in out.getvalue()
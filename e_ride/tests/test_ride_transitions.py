@@ -0,0 +1,80 @@
+"""
+Tests for the compare-and-set ride transitions behind the accept, start,
+complete and cancel endpoints.
+"""
+import uuid
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from apps.Accounts.models import Driver
+from apps.Rides.transitions import ACCEPT, apply_transition
+
+
+def data_queries(queries):
+    return [q['sql'] for q in queries if q['sql'].startswith(('UPDATE', 'SELECT'))]
+
+
+@pytest.mark.django_db
+class TestRideTransitions:
+
+    def test_accept_is_two_statements(self, ride_setup):
+        url = reverse('ride-accept', kwargs={'ride_id': ride_setup['ride'].id})
+        with CaptureQueriesContext(connection) as ctx:
+            resp = ride_setup['driver_api'].post(url)
+        assert resp.status_code == 200, resp.content
+        assert resp.json()['data']['status'] == 'ACCEPTED'
+        statements = data_queries(ctx.captured_queries)
+        assert len(statements) == 2
+        assert all(sql.startswith('UPDATE') for sql in statements)
+
+    def test_second_accept_loses(self, ride_setup):
+        url = reverse('ride-accept', kwargs={'ride_id': ride_setup['ride'].id})
+        assert ride_setup['driver_api'].post(url).status_code == 200
+        resp = ride_setup['driver_api'].post(url)
+        assert resp.status_code == 400
+        assert resp.json() == {'status': 'Failed', 'details': 'Ride cannot be accepted from status ACCEPTED'}
+
+    def test_only_assigned_driver_can_accept(self, ride_setup):
+        url = reverse('ride-accept', kwargs={'ride_id': ride_setup['ride'].id})
+        resp = ride_setup['client_api'].post(url)
+        assert resp.status_code == 403
+        ride_setup['ride'].refresh_from_db()
+        assert ride_setup['ride'].status == 'REQUESTED'
+
+    def test_unknown_ride(self, ride_setup):
+        resp = ride_setup['driver_api'].post(reverse('ride-accept', kwargs={'ride_id': uuid.uuid4()}))
+        assert resp.status_code == 404
+
+    def test_driver_index_follows_availability(self, ride_setup, django_capture_on_commit_callbacks):
+        driver, ride = ride_setup['driver'], ride_setup['ride']
+        assert driver.pk in Driver.spatial_index
+        with django_capture_on_commit_callbacks(execute=True):
+            ride_setup['driver_api'].post(reverse('ride-accept', kwargs={'ride_id': ride.id}))
+        assert driver.pk not in Driver.spatial_index
+
+        with django_capture_on_commit_callbacks(execute=True):
+            ride_setup['client_api'].post(reverse('ride-cancel', kwargs={'ride_id': ride.id}))
+        driver.refresh_from_db()
+        assert driver.availability_status == 'ONLINE'
+        assert driver.pk in Driver.spatial_index
+
+    def test_rolled_back_transition_leaves_index_alone(self, ride_setup, django_capture_on_commit_callbacks):
+        driver, ride = ride_setup['driver'], ride_setup['ride']
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            with pytest.raises(RuntimeError):
+                with transaction.atomic():
+                    apply_transition(ride.id, driver.user, ACCEPT)
+                    raise RuntimeError
+        assert callbacks == []
+        assert driver.pk in Driver.spatial_index
+        ride.refresh_from_db()
+        assert ride.status == 'REQUESTED'
+
+    def test_cancel_leaves_unengaged_driver_alone(self, ride_setup):
+        driver, ride = ride_setup['driver'], ride_setup['ride']
+        Driver.objects.filter(pk=driver.pk).update(availability_status='OFFLINE')
+        resp = ride_setup['client_api'].post(reverse('ride-cancel', kwargs={'ride_id': ride.id}))
+        assert resp.status_code == 200
+        driver.refresh_from_db()
+        assert driver.availability_status == 'OFFLINE'
@@ -0,0 +1,111 @@
+"""
+Tests for the long-poll ride status endpoint and the in-process notifier
+behind it.
+"""
+import asyncio
+import time
+import uuid
+
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+from apps.Rides.notify import LocalNotifier, get_notifier
+from apps.Rides.transitions import ACCEPT, apply_transition
+
+
+def auth(user):
+    return {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+
+
+def wait(ride_id, user, **params):
+    url = reverse('ride-wait', kwargs={'ride_id': ride_id})
+    return async_to_sync(AsyncClient().get)(url, params, headers=auth(user))
+
+
+@pytest.mark.django_db
+class TestRideWait:
+
+    def test_without_version_returns_current_state(self, ride_setup):
+        resp = wait(ride_setup['ride'].id, ride_setup['client_user'])
+        assert resp.status_code == 200
+        data = resp.json()['data']
+        assert data['status'] == 'REQUESTED'
+        assert data['version'] > 0
+        assert data['changed'] is False
+
+    def test_stale_version_returns_immediately(self, ride_setup):
+        ride = ride_setup['ride']
+        version = wait(ride.id, ride_setup['client_user']).json()['data']['version']
+        apply_transition(ride.id, ride_setup['driver_user'], ACCEPT)
+        started = time.monotonic()
+        data = wait(ride.id, ride_setup['client_user'], version=version, timeout=5).json()['data']
+        assert time.monotonic() - started < 1
+        assert data['changed'] is True
+        assert data['status'] == 'ACCEPTED'
+        assert data['version'] > version
+
+    def test_times_out_unchanged(self, ride_setup):
+        ride = ride_setup['ride']
+        version = wait(ride.id, ride_setup['client_user']).json()['data']['version']
+        data = wait(ride.id, ride_setup['client_user'], version=version, timeout=0.1).json()['data']
+        assert data == {**data, 'status': 'REQUESTED', 'version': version, 'changed': False}
+
+    def test_ride_without_events_holds_at_version_zero(self, ride_setup):
+        # Rides from before the event log have no events at all
+        ride = ride_setup['ride']
+        ride.events.all().delete()
+        data = wait(ride.id, ride_setup['client_user']).json()['data']
+        assert data['version'] == 0
+        started = time.monotonic()
+        data = wait(ride.id, ride_setup['client_user'], version=0, timeout=0.3).json()['data']
+        assert time.monotonic() - started >= 0.3
+        assert data['changed'] is False and data['version'] == 0
+
+    def test_transition_wakes_waiter(self, ride_setup, django_capture_on_commit_callbacks):
+        ride = ride_setup['ride']
+        version = wait(ride.id, ride_setup['client_user']).json()['data']['version']
+        url = reverse('ride-wait', kwargs={'ride_id': ride.id})
+
+        def accept():
+            # on_commit callbacks never run inside the test transaction; run them by hand
+            with django_capture_on_commit_callbacks(execute=True):
+                apply_transition(ride.id, ride_setup['driver_user'], ACCEPT)
+
+        async def scenario():
+            request = asyncio.ensure_future(
+                AsyncClient().get(url, {'version': version, 'timeout': 10}, headers=auth(ride_setup['client_user']))
+            )
+            while not get_notifier().waiting(ride.id):
+                await asyncio.sleep(0.01)
+            await sync_to_async(accept)()
+            return await request
+
+        started = time.monotonic()
+        resp = async_to_sync(scenario)()
+        assert time.monotonic() - started < 5
+        assert resp.json()['data']['status'] == 'ACCEPTED'
+        assert resp.json()['data']['changed'] is True
+        assert get_notifier().waiting(ride.id) == 0
+
+    def test_only_participants_may_wait(self, ride_setup, django_user_model):
+        outsider = django_user_model.objects.create_user(
+            username='wait_outsider', email='wait_outsider@test.com', password='testpass123', is_active=True
+        )
+        assert wait(ride_setup['ride'].id, outsider).status_code == 403
+        assert wait(uuid.uuid4(), outsider).status_code == 404
+        url = reverse('ride-wait', kwargs={'ride_id': ride_setup['ride'].id})
+        assert async_to_sync(AsyncClient().get)(url).status_code == 401
+
+
+def test_local_notifier_wakes_only_its_key():
+    notifier = LocalNotifier()
+
+    async def scenario():
+        async with notifier.subscribe('a') as a, notifier.subscribe('b') as b:
+            notifier.publish('a')
+            return await a.wait(1), await b.wait(0.05)
+
+    assert async_to_sync(scenario)() == (True, False)
+    assert notifier.waiting('a') == notifier.waiting('b') == 0
@@ -0,0 +1,93 @@
+"""
+Tests for the memory-mapped road graph: ALT point-to-point queries and the
+one-to-many mode against plain Dijkstra on a synthetic street grid.
+"""
+import io
+import math
+import random
+import pytest
+from django.core.management import call_command
+from base.routing import RoadGraph, build_graph, dijkstra, road_distance
+
+SIZE = 20
+SPACING = 0.002  # ~220 m between intersections
+ORIGIN = (6.50, 3.35)
+
+
+def grid_network(seed=11):
+    """A SIZE x SIZE street grid with uneven travel costs and some one-way streets"""
+    rng = random.Random(seed)
+    nodes = [(ORIGIN[0] + r * SPACING, ORIGIN[1] + c * SPACING) for r in range(SIZE) for c in range(SIZE)]
+    edges = []
+    for r in range(SIZE):
+        for c in range(SIZE):
+            here = r * SIZE + c
+            for there in ([here + 1] if c + 1 < SIZE else []) + ([here + SIZE] if r + 1 < SIZE else []):
+                length = 220 * rng.uniform(1.0, 3.0)
+                edges.append((here, there, length))
+                if rng.random() > 0.15:
+                    edges.append((there, here, length))
+    return nodes, edges
+
+
+@pytest.fixture(scope='module')
+def graph(tmp_path_factory):
+    path = tmp_path_factory.mktemp('graph')
+    nodes, edges = grid_network()
+    build_graph(nodes, edges, path, landmarks=6)
+    return RoadGraph(path)
+
+
+class TestRoadGraph:
+
+    def test_alt_matches_dijkstra(self, graph):
+        rng = random.Random(5)
+        for _ in range(40):
+            source, target = rng.randrange(len(graph)), rng.randrange(len(graph))
+            expected = dijkstra(graph.offsets, graph.targets, graph.weights, source).get(target, math.inf)
+            assert graph.node_distance(source, target) == pytest.approx(expected, abs=1.0)
+
+    def test_snap(self, graph):
+        node, km = graph.snap((ORIGIN[0] + 3 * SPACING + 0.0002, ORIGIN[1] + 5 * SPACING))
+        assert node == 3 * SIZE + 5
+        assert km == pytest.approx(0.022, abs=0.001)
+        assert graph.snap((9.05, 7.49)) is None
+
+    def test_distance_includes_snap_legs(self, graph):
+        start = (ORIGIN[0] + 0.0001, ORIGIN[1])
+        end = (ORIGIN[0] + 10 * SPACING, ORIGIN[1] + 10 * SPACING)
+        snapped_start, snapped_end = graph.snap(start), graph.snap(end)
+        expected = graph.node_distance(snapped_start[0], snapped_end[0]) / 1000 + snapped_start[1] + snapped_end[1]
+        assert graph.distance(start, end) == pytest.approx(expected)
+        assert graph.distance(start, (9.05, 7.49)) is None
+
+    def test_one_to_many_matches_point_to_point(self, graph):
+        rng = random.Random(9)
+        pickup = (ORIGIN[0] + 8 * SPACING, ORIGIN[1] + 8 * SPACING)
+        drivers = [(ORIGIN[0] + rng.randrange(SIZE) * SPACING, ORIGIN[1] + rng.randrange(SIZE) * SPACING) for _ in range(15)]
+        drivers.append((9.05, 7.49))
+        result = graph.distances_to(drivers, pickup)
+        for driver, got in zip(drivers[:-1], result[:-1]):
+            assert got == pytest.approx(graph.distance(driver, pickup), abs=0.002)
+        assert math.isinf(result[-1])
+
+    def test_one_to_many_radius(self, graph):
+        pickup = (ORIGIN[0], ORIGIN[1])
+        far = (ORIGIN[0] + (SIZE - 1) * SPACING, ORIGIN[1] + (SIZE - 1) * SPACING)
+        assert math.isinf(graph.distances_to([far], pickup, max_km=1)[0])
+
+
+def test_build_command_and_fallback(tmp_path, settings):
+    nodes, edges = grid_network()
+    nodes_csv = tmp_path / 'nodes.csv'
+    edges_csv = tmp_path / 'edges.csv'
+    nodes_csv.write_text('id,lat,lon\n' + ''.join(f'n{i},{lat},{lon}\n' for i, (lat, lon) in enumerate(nodes)))
+    edges_csv.write_text('source,target,length_m,oneway\n' + ''.join(f'n{s},n{t},{m},1\n' for s, t, m in edges))
+    call_command('build_road_graph', str(nodes_csv), str(edges_csv), str(tmp_path / 'graph'), landmarks=4, stdout=io.StringIO())
+
+    start, end = ORIGIN, (ORIGIN[0] + 5 * SPACING, ORIGIN[1] + 5 * SPACING)
+    settings.ROAD_GRAPH_PATH = ''
+    straight = road_distance(start, end)
+    settings.ROAD_GRAPH_PATH = str(tmp_path / 'graph')
+    assert road_distance(start, end) == pytest.approx(RoadGraph(tmp_path / 'graph').distance(start, end))
+    assert road_distance(start, end) > straight
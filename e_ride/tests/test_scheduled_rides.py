@@ -0,0 +1,199 @@
+"""
+Tests for scheduled rides: the timer wheel on its own, booking through the
+API, and the scheduler releasing bookings to matching.
+"""
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.Rides.dispatch import DispatchEngine
+from apps.Rides.expiry import RideExpirySweeper
+from apps.Rides.models import Ride, RideEvent
+from apps.Rides.scheduling import RideScheduler
+from base.timerwheel import TimerWheel
+
+LEAD = 900
+
+
+class TestTimerWheel:
+
+    def test_fires_due_keys_in_order(self):
+        wheel = TimerWheel(tick_seconds=1, slots=10, start=100)
+        wheel.add('b', 105.5)
+        wheel.add('a', 105.2)
+        wheel.add('c', 107)
+        assert wheel.advance(104.9) == []
+        assert wheel.advance(105.0) == ['a', 'b']
+        assert len(wheel) == 1 and 'c' in wheel
+        assert wheel.advance(200) == ['c']
+        assert len(wheel) == 0
+
+    def test_refuses_times_beyond_horizon(self):
+        wheel = TimerWheel(tick_seconds=1, slots=10, start=100)
+        assert wheel.until == 110
+        assert not wheel.add('late', 110)
+        assert wheel.add('edge', 109.9)
+        wheel.advance(105)
+        assert wheel.until == 116
+        assert wheel.add('late', 110)
+
+    def test_past_times_fire_on_next_advance(self):
+        wheel = TimerWheel(tick_seconds=1, slots=10, start=100)
+        wheel.advance(103)
+        wheel.add('overdue', 50)
+        assert wheel.advance(104) == ['overdue']
+
+    def test_discard_and_reschedule(self):
+        wheel = TimerWheel(tick_seconds=1, slots=10, start=0)
+        wheel.add('a', 3)
+        wheel.add('b', 4)
+        wheel.discard('a')
+        wheel.discard('missing')
+        wheel.add('b', 8)
+        assert wheel.advance(5) == []
+        assert wheel.advance(8) == ['b']
+
+    def test_tick_cost_does_not_depend_on_waiting_keys(self):
+        wheel = TimerWheel(tick_seconds=1, slots=3600, start=0)
+        for i in range(50000):
+            wheel.add(i, 1000 + i % 2000)
+        # Only the bucket for second 1000 is touched
+        fired = wheel.advance(1000)
+        assert len(fired) == 25 and len(wheel) == 50000 - 25
+
+
+@pytest.fixture
+def people(make_driver, make_client):
+    return make_driver('sched_driver'), make_client('sched_client')
+
+
+def book(client, scheduled_for):
+    return Ride.objects.create(
+        client=client, status='SCHEDULED', scheduled_for=scheduled_for,
+        pickup_location=(6.5244, 3.3792), dropoff_location=(6.55, 3.40),
+    )
+
+
+@pytest.mark.django_db
+class TestBooking:
+
+    def post(self, client, scheduled_for):
+        api = APIClient()
+        api.force_authenticate(user=client.user)
+        return api.post(
+            reverse('ride requests'),
+            {'pickup_location': [6.5244, 3.3792], 'dropoff_location': [6.55, 3.40], 'scheduled_for': scheduled_for.isoformat()},
+            format='json',
+        )
+
+    def test_booking_starts_scheduled(self, people):
+        _, client = people
+        resp = self.post(client, timezone.now() + timedelta(hours=3))
+        assert resp.status_code == 201, resp.content
+        ride = Ride.objects.get(pk=resp.json()['data']['id'])
+        assert ride.status == 'SCHEDULED'
+        assert list(ride.events.values_list('kind', 'status')) == [('scheduled', 'SCHEDULED')]
+
+    @pytest.mark.parametrize('ahead', [timedelta(minutes=5), timedelta(days=60)])
+    def test_rejects_pickup_too_soon_or_too_far(self, people, ahead):
+        _, client = people
+        resp = self.post(client, timezone.now() + ahead)
+        assert resp.status_code == 400
+        assert not Ride.objects.exists()
+
+    def test_booking_can_be_cancelled(self, people):
+        _, client = people
+        ride = book(client, timezone.now() + timedelta(hours=3))
+        api = APIClient()
+        api.force_authenticate(user=client.user)
+        resp = api.post(reverse('ride-cancel', kwargs={'ride_id': ride.id}))
+        assert resp.status_code == 200, resp.content
+        ride.refresh_from_db()
+        assert ride.status == 'CANCELLED'
+
+
+@pytest.mark.django_db
+class TestRideScheduler:
+
+    def test_releases_lead_time_before_pickup(self, people, django_capture_on_commit_callbacks):
+        driver, client = people
+        now = timezone.now()
+        ride = book(client, now + timedelta(seconds=LEAD + 30))
+        scheduler = RideScheduler(lead_seconds=LEAD, slots=120)
+
+        result = scheduler.tick(now)
+        assert (result.loaded, result.released, result.waiting) == (1, 0, 1)
+        assert scheduler.tick(now + timedelta(seconds=29)).released == 0
+        with django_capture_on_commit_callbacks(execute=True):
+            assert scheduler.tick(now + timedelta(seconds=30)).released == 1
+
+        ride.refresh_from_db()
+        assert ride.status == 'REQUESTED'
+        assert ride.events.order_by('sequence').last().kind == 'requested'
+        DispatchEngine().tick()
+        ride.refresh_from_db()
+        assert ride.driver_id == driver.pk
+
+    def test_loads_far_bookings_as_the_wheel_turns(self, people):
+        _, client = people
+        now = timezone.now()
+        ride = book(client, now + timedelta(seconds=LEAD + 200))
+        scheduler = RideScheduler(lead_seconds=LEAD, slots=60)
+
+        assert scheduler.tick(now).waiting == 0
+        assert scheduler.tick(now + timedelta(seconds=150)).loaded == 1
+        assert scheduler.tick(now + timedelta(seconds=201)).released == 1
+        ride.refresh_from_db()
+        assert ride.status == 'REQUESTED'
+
+    def test_follows_bookings_and_cancellations_through_the_log(self, people):
+        _, client = people
+        now = timezone.now()
+        scheduler = RideScheduler(lead_seconds=LEAD, slots=120)
+        scheduler.tick(now)
+
+        kept = book(client, now + timedelta(seconds=LEAD + 10))
+        cancelled = book(client, now + timedelta(seconds=LEAD + 10))
+        cancelled.status = 'CANCELLED'
+        cancelled.save()
+        RideEvent.objects.create(ride=cancelled, kind='cancelled', status='CANCELLED')
+
+        result = scheduler.tick(now + timedelta(seconds=1))
+        assert result.waiting == 1 and kept.pk in scheduler.wheel
+        assert scheduler.tick(now + timedelta(seconds=10)).released == 1
+        assert Ride.objects.get(pk=cancelled.pk).status == 'CANCELLED'
+
+    def test_overdue_bookings_release_on_start(self, people):
+        _, client = people
+        now = timezone.now()
+        ride = book(client, now + timedelta(seconds=60))
+        assert RideScheduler(lead_seconds=LEAD).tick(now).released == 1
+        ride.refresh_from_db()
+        assert ride.status == 'REQUESTED'
+
+    def test_released_booking_expires_from_its_pickup_time(self, people):
+        _, client = people
+        now = timezone.now()
+        ride = book(client, now + timedelta(seconds=60))
+        Ride.objects.filter(pk=ride.pk).update(created_at=now - timedelta(days=2))
+        RideScheduler(lead_seconds=LEAD).tick(now)
+
+        assert RideExpirySweeper(timeout_seconds=300).sweep(now).expired == 0
+        assert RideExpirySweeper(timeout_seconds=300).sweep(now + timedelta(seconds=361)).expired == 1
+
+    def test_load_uses_status_scheduled_index(self):
+        plan = Ride.objects.filter(status='SCHEDULED', scheduled_for__lt=timezone.now()).order_by('scheduled_for').explain()
+        assert 'rides_status_scheduled_idx' in plan
+
+    def test_dispatch_command_releases_bookings(self, people):
+        _, client = people
+        ride = book(client, timezone.now() + timedelta(seconds=60))
+        out = StringIO()
+        call_command('dispatch_rides', '--once', stdout=out)
+        assert '1 scheduled rides released' in out.getvalue()
+        ride.refresh_from_db()
+        assert ride.status == 'REQUESTED'
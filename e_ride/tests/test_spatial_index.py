@@ -0,0 +1,125 @@
+"""
+Tests for the in-memory GridIndex behind find_nearest_instances.
+The index itself is exercised without a database; the Driver integration
+tests check that signals keep it in step with saves and status changes.
+"""
+import random
+import pytest
+from base.mixins import LocationMixin
+from base.spatial import GridIndex, NearestHeap
+
+
+def brute_force(origin, points, limit, max_distance_km):
+    mixin = LocationMixin()
+    dists = [(pk, mixin.haversine_distance(origin, loc)) for pk, loc in points.items()]
+    dists = [item for item in dists if item[1] <= max_distance_km]
+    return sorted(dists, key=lambda item: item[1])[:limit]
+
+
+class TestNearestHeap:
+    """The bounded heap must agree with a full stable sort sliced to the limit."""
+
+    def test_matches_sorted_slice(self):
+        rng = random.Random(3)
+        # Coarse distances so plenty of ties land on the cut-off
+        items = [(i, float(rng.randint(0, 20))) for i in range(1000)]
+        for limit in (1, 7, 50, 2000):
+            heap = NearestHeap(limit)
+            for item, dist in items:
+                heap.push(item, dist)
+            assert heap.items() == sorted(items, key=lambda x: x[1])[:limit]
+
+    def test_push_many_respects_max_distance(self):
+        heap = NearestHeap(5)
+        heap.push_many(['a', 'b', 'c'], [1.0, 11.0, 3.0], max_distance=10)
+        assert heap.items() == [('a', 1.0), ('c', 3.0)]
+        assert heap.worst == float('inf')
+
+
+class TestGridIndex:
+    """Unit tests for GridIndex ring-expansion lookups."""
+
+    @pytest.fixture
+    def index(self):
+        index = GridIndex(cell_deg=0.01)
+        index.rebuild([])
+        return index
+
+    def test_matches_brute_force(self, index):
+        rng = random.Random(7)
+        points = {
+            i: (6.45 + rng.random() * 0.2, 3.30 + rng.random() * 0.2)
+            for i in range(500)
+        }
+        index.rebuild((pk, loc, None) for pk, loc in points.items())
+        origin = (6.5244, 3.3792)
+
+        for limit, max_km in [(1, 50), (7, 50), (7, 2), (50, 5)]:
+            expected = brute_force(origin, points, limit, max_km)
+            result = index.nearest(origin, limit=limit, max_distance_km=max_km)
+            assert [pk for pk, _ in result] == [pk for pk, _ in expected]
+            for (_, got), (_, want) in zip(result, expected):
+                assert got == pytest.approx(want, abs=1e-9)
+
+    def test_sparse_index_far_away(self, index):
+        index.update('far', (7.3775, 3.9470))
+        result = index.nearest((6.5244, 3.3792), limit=3, max_distance_km=200)
+        assert [pk for pk, _ in result] == ['far']
+
+    def test_respects_max_distance(self, index):
+        index.update('far', (7.3775, 3.9470))
+        assert index.nearest((6.5244, 3.3792), limit=3, max_distance_km=20) == []
+
+    def test_inactive_status_is_not_indexed(self):
+        index = GridIndex(status_field='availability_status', active_status='ONLINE')
+        index.rebuild([])
+        index.update('a', (6.53, 3.38), 'ONLINE')
+        index.update('b', (6.53, 3.38), 'OFFLINE')
+        assert 'a' in index
+        assert 'b' not in index
+
+        index.update('a', (6.53, 3.38), 'ENGAGED')
+        assert index.nearest((6.5244, 3.3792)) == []
+
+    def test_move_between_cells(self, index):
+        index.update('a', (6.53, 3.38))
+        index.update('a', (6.90, 3.90))
+        result = index.nearest((6.90, 3.90), limit=1, max_distance_km=1)
+        assert [pk for pk, _ in result] == ['a']
+        assert index.nearest((6.53, 3.38), limit=1, max_distance_km=1) == []
+
+    def test_exclude(self, index):
+        index.update('me', (6.5244, 3.3792))
+        index.update('other', (6.5300, 3.3800))
+        result = index.nearest((6.5244, 3.3792), limit=5, exclude='me')
+        assert [pk for pk, _ in result] == ['other']
+
+
+@pytest.mark.django_db
+class TestDriverIndexSignals:
+    """Driver saves and deletes should be reflected in Driver.spatial_index."""
+
+    @pytest.fixture
+    def driver(self, make_driver):
+        return make_driver('idx_driver', (6.5300, 3.3800))
+
+    def test_status_change_updates_index(self, driver):
+        from apps.Accounts.models import Driver
+
+        assert driver.pk in Driver.spatial_index
+        driver.availability_status = 'ENGAGED'
+        driver.save()
+        assert driver.pk not in Driver.spatial_index
+
+        driver.availability_status = 'ONLINE'
+        driver.location = (6.6000, 3.4000)
+        driver.save()
+        result = Driver.spatial_index.nearest((6.6000, 3.4000), limit=1, max_distance_km=1)
+        assert result[0][0] == driver.pk
+
+    def test_delete_removes_from_index(self, driver):
+        from apps.Accounts.models import Driver
+
+        pk = driver.pk
+        driver.delete()
+        assert pk not in Driver.spatial_index
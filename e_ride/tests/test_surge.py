@@ -0,0 +1,213 @@
+"""
+Tests for the rolling ring-buffer and shared cache counters, and the surge multipliers built on them.
+"""
+from decimal import Decimal
+import pytest
+from base.counters import RingCounter, SharedCounter
+from base.spatial import geocell
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRingCounter:
+
+    def test_window_rolls_off(self):
+        clock = FakeClock()
+        counter = RingCounter(buckets=3, bucket_seconds=60, clock=clock)
+        counter.add('a')
+        clock.now += 60
+        counter.add('a', 2)
+        counter.add('b')
+        assert counter.sums() == {'a': 3, 'b': 1}
+
+        clock.now += 120  # the first bucket has left the window
+        assert counter.sums() == {'a': 2, 'b': 1}
+        clock.now += 600
+        assert counter.sums() == {}
+
+    def test_means_of_snapshots(self):
+        clock = FakeClock()
+        counter = RingCounter(buckets=4, bucket_seconds=10, clock=clock)
+        counter.replace({'a': 4, 'b': 2})
+        clock.now += 10
+        counter.replace({'a': 2})
+        assert counter.means() == {'a': 3, 'b': 1}
+
+    def test_grows_past_initial_capacity(self):
+        counter = RingCounter(buckets=2, bucket_seconds=60)
+        for key in range(100):
+            counter.add(key)
+        assert len(counter) == 100
+        assert sum(counter.sums().values()) == 100
+
+
+class TestSharedCounter:
+
+    def test_window_rolls_off(self):
+        clock = FakeClock()
+        counter = SharedCounter('test:rolls', buckets=3, bucket_seconds=60, clock=clock)
+        counter.add((1, 2))
+        clock.now += 60
+        counter.add((1, 2), 2)
+        counter.add((3, 4))
+        assert counter.sums() == {(1, 2): 3, (3, 4): 1}
+
+        clock.now += 120
+        assert counter.sums() == {(1, 2): 2, (3, 4): 1}
+        clock.now += 600
+        assert counter.sums() == {}
+
+    def test_processes_share_totals(self):
+        # Two instances over one cache stand in for two worker processes
+        clock = FakeClock()
+        first = SharedCounter('test:shared', bucket_seconds=60, clock=clock)
+        second = SharedCounter('test:shared', bucket_seconds=60, clock=clock)
+        first.add('a')
+        second.add('a')
+        second.add('b')
+        assert first.sums() == second.sums() == {'a': 2, 'b': 1}
+
+        first.clear()
+        assert second.sums() == {}
+
+
+    def test_distinct_members_and_means(self):
+        clock = FakeClock()
+        counter = SharedCounter('test:distinct', buckets=3, bucket_seconds=60, clock=clock)
+        for _ in range(3):
+            counter.add_distinct('cell', 'driver-1')
+        counter.add_distinct('cell', 'driver-2')
+        clock.now += 60
+        counter.add_distinct('cell', 'driver-1')
+        clock.now += 60
+        # Nothing counted, but observed
+        counter.touch()
+        assert counter.sums() == {'cell': 3}
+        assert counter.means() == {'cell': 1}
+
+
+@pytest.mark.django_db
+class TestSurgePricing:
+    PICKUP = (6.5244, 3.3792)
+
+    @pytest.fixture
+    def people(self, make_driver, make_client):
+        return make_driver('surge_driver'), make_client('surge_client', self.PICKUP)
+
+    def request(self, client, driver=None):
+        from apps.Rides.models import Ride
+
+        return Ride.objects.create(client=client, driver=driver, pickup_location=self.PICKUP, dropoff_location=(6.55, 3.40))
+
+    def test_multiplier_follows_demand_over_supply(self, people):
+        from apps.Rides.surge import surge_pricing
+
+        driver, client = people
+        for _ in range(5):
+            self.request(client)
+        # Not applied until the scheduled recompute
+        assert surge_pricing.multiplier(self.PICKUP) == Decimal('1.00')
+
+        surge_pricing.recompute()
+        # 5 requests for 1 driver: 1 + 0.5 * (5 - 1)
+        assert surge_pricing.multiplier(self.PICKUP) == Decimal('3.00')
+        assert surge_pricing.multiplier((9.05, 7.49)) == Decimal('1.00')
+
+    def test_price_is_locked_with_multiplier(self, people):
+        from apps.Rides.surge import surge_pricing
+
+        driver, client = people
+        for _ in range(2):
+            self.request(client)
+        surge_pricing.recompute()
+        ride = self.request(client, driver)
+        assert ride.surge_multiplier == Decimal('1.50')
+        assert ride.price == (ride.distance_km * 100 * Decimal('1.5')).quantize(Decimal('0.01'))
+
+    @pytest.fixture
+    def clock(self, monkeypatch):
+        from apps.Rides.surge import surge_pricing
+
+        clock = FakeClock()
+        clock.now = 1.8e9
+        monkeypatch.setattr(surge_pricing.demand, 'clock', clock)
+        monkeypatch.setattr(surge_pricing.supply, 'clock', clock)
+        return clock
+
+    def test_supply_from_driver_transitions(self, clock, people, django_user_model):
+        from apps.Accounts.models import Driver
+        from apps.Rides.surge import surge_pricing
+
+        driver, client = people
+        other_user = django_user_model.objects.create_user(username='surge_other', email='surge_other@test.com', password='testpass123')
+        other = Driver.objects.create(
+            user=other_user, first_name='Other', last_name='Driver', nin=1234567890,
+            availability_status='OFFLINE', location=(6.5255, 3.3795),
+        )
+        for _ in range(4):
+            self.request(client)
+        surge_pricing.recompute()
+        # 4 requests for the 1 ONLINE driver: 1 + 0.5 * (4 - 1)
+        assert surge_pricing.multiplier(self.PICKUP) == Decimal('2.50')
+
+        other.availability_status = 'ONLINE'
+        other.save()
+        surge_pricing.recompute()
+        # 4 requests for 2 drivers: 1 + 0.5 * (2 - 1)
+        assert surge_pricing.multiplier(self.PICKUP) == Decimal('1.50')
+
+    def test_offline_drivers_drop_out_of_later_buckets(self, clock, people):
+        from django.urls import reverse
+        from rest_framework.test import APIClient
+        from apps.Rides.surge import surge_pricing
+
+        driver, client = people
+        # Counted once however often they report within a bucket
+        driver.save()
+        assert surge_pricing.supply.means() == {geocell(self.PICKUP, surge_pricing.cell_deg): 1}
+        driver.availability_status = 'OFFLINE'
+        driver.save()
+
+        clock.now += surge_pricing.supply.bucket_seconds
+        driver_api = APIClient()
+        driver_api.force_authenticate(user=driver.user)
+        driver_api.post(reverse('driver location'), {'lat': 6.5250, 'lon': 3.3790}, format='json')
+        driver_api.post(reverse('driver heartbeat'), format='json')
+        # One bucket with the driver, one without
+        assert surge_pricing.supply.means() == {geocell(self.PICKUP, surge_pricing.cell_deg): 0.5}
+
+    def test_pings_place_online_drivers(self, clock, people):
+        from django.urls import reverse
+        from rest_framework.test import APIClient
+        from apps.Rides.surge import surge_pricing
+
+        driver, client = people
+        elsewhere = (6.6244, 3.4792)
+        clock.now += surge_pricing.supply.bucket_seconds
+        driver_api = APIClient()
+        driver_api.force_authenticate(user=driver.user)
+        driver_api.post(reverse('driver location'), {'lat': elsewhere[0], 'lon': elsewhere[1]}, format='json')
+        # Created at the pickup in the first bucket, pinged from elsewhere in the second
+        assert surge_pricing.supply.means() == {
+            geocell(self.PICKUP, surge_pricing.cell_deg): 0.5, geocell(elsewhere, surge_pricing.cell_deg): 0.5,
+        }
+
+    def test_demand_is_shared_between_workers(self, people):
+        from apps.Rides.surge import SurgePricing, surge_pricing
+
+        driver, client = people
+        # Another worker records two requests; this one records two more
+        other_worker = SurgePricing(background=False)
+        for _ in range(2):
+            other_worker.record_request(self.PICKUP)
+            self.request(client)
+        surge_pricing.recompute()
+        # 4 requests for 1 driver: 1 + 0.5 * (4 - 1)
+        assert surge_pricing.multiplier(self.PICKUP) == Decimal('2.50')
+        assert other_worker.recompute() == surge_pricing.recompute()
@@ -0,0 +1,55 @@
+"""
+Tests for PeriodicWorker, the background-thread loop shared by the location
+buffer, presence sweep, track buffer, surge recompute and ride expiry.
+"""
+import threading
+import pytest
+from base.worker import PeriodicWorker
+
+
+@pytest.fixture
+def runs():
+    return threading.Semaphore(0)
+
+
+class TestPeriodicWorker:
+
+    def test_runs_until_stopped(self, runs):
+        worker = PeriodicWorker(runs.release, interval=0.01, name='test-worker')
+        worker.ensure_running()
+        worker.ensure_running()
+        assert runs.acquire(timeout=2) and runs.acquire(timeout=2)
+        assert [t.name for t in threading.enumerate()].count('test-worker') == 1
+        worker.stop()
+        assert not worker.is_running()
+
+    def test_failing_run_is_logged_and_loop_continues(self, runs, caplog):
+        calls = []
+
+        def task():
+            calls.append(1)
+            runs.release()
+            if len(calls) == 1:
+                raise RuntimeError('boom')
+
+        worker = PeriodicWorker(task, interval=0.01, name='test-worker')
+        worker.ensure_running()
+        assert runs.acquire(timeout=2) and runs.acquire(timeout=2)
+        worker.stop()
+        assert 'Background task test-worker failed' in caplog.text
+
+    def test_stop_runs_final_task_once(self):
+        final = []
+        worker = PeriodicWorker(lambda: None, interval=60, name='test-worker', on_stop=lambda: final.append(1))
+        worker.ensure_running()
+        worker.stop()
+        assert final == [1]
+        assert not worker.is_running()
+
+    def test_restarts_after_stop(self, runs):
+        worker = PeriodicWorker(runs.release, interval=0.01, name='test-worker')
+        worker.ensure_running()
+        worker.stop()
+        worker.ensure_running()
+        assert runs.acquire(timeout=2)
+        worker.stop()